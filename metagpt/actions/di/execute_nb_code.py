@@ -9,7 +9,7 @@ from __future__ import annotations
 import asyncio
 import base64
 import re
-from typing import Literal, Tuple
+from typing import Literal, Optional, Tuple
 
 import nbformat
 from nbclient import NotebookClient
@@ -17,6 +17,7 @@ from nbclient.exceptions import CellExecutionComplete, CellTimeoutError, DeadKer
 from nbclient.util import ensure_async
 from nbformat import NotebookNode
 from nbformat.v4 import new_code_cell, new_markdown_cell, new_output, output_from_msg
+from pydantic import Field
 from rich.box import MINIMAL
 from rich.console import Console, Group
 from rich.live import Live
@@ -25,16 +26,11 @@ from rich.panel import Panel
 from rich.syntax import Syntax
 
 from metagpt.actions import Action
+from metagpt.actions.di.kernel_pool import INI_CODE, KernelLease, KernelPool, get_default_kernel_pool
 from metagpt.logs import logger
 from metagpt.utils.report import NotebookReporter
 
 INSTALL_KEEPLEN = 500
-INI_CODE = """import warnings
-import logging
-
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.ERROR)
-warnings.filterwarnings('ignore')"""
 
 
 class RealtimeOutputNotebookClient(NotebookClient):
@@ -74,17 +70,20 @@ class ExecuteNbCode(Action):
     console: Console
     interaction: str
     timeout: int = 600
+    kernel_pool: Optional[KernelPool] = Field(default=None, exclude=True)  # lease warm kernels instead of starting
 
-    def __init__(self, nb=nbformat.v4.new_notebook(), timeout=600):
+    def __init__(self, nb=nbformat.v4.new_notebook(), timeout=600, kernel_pool: KernelPool = None):
         super().__init__(
             nb=nb,
             timeout=timeout,
             console=Console(),
             interaction=("ipython" if self.is_ipython() else "terminal"),
+            kernel_pool=kernel_pool or get_default_kernel_pool(),
         )
         self.reporter = NotebookReporter()
         self.set_nb_client()
         self.init_called = False
+        self.kernel_lease: Optional[KernelLease] = None
 
     async def init_code(self):
         if not self.init_called:
@@ -101,6 +100,13 @@ class ExecuteNbCode(Action):
         )
 
     async def build(self):
+        if self.kernel_pool is not None:
+            if self.kernel_lease is None or not await self.kernel_lease.is_alive():
+                await self._release_kernel()
+                self.kernel_lease = await self.kernel_pool.acquire()
+            # attach the leased kernel to the nb client, which may have been replaced since the lease
+            self.nb_client.km, self.nb_client.kc = self.kernel_lease.km, self.kernel_lease.kc
+            return
         if self.nb_client.kc is None or not await self.nb_client.kc.is_alive():
             self.nb_client.create_kernel_manager()
             self.nb_client.start_new_kernel()
@@ -108,6 +114,9 @@ class ExecuteNbCode(Action):
 
     async def terminate(self):
         """kill NotebookClient"""
+        if self.kernel_lease is not None:
+            await self._release_kernel()
+            return
         if self.nb_client.km is not None and await self.nb_client.km.is_alive():
             await self.nb_client.km.shutdown_kernel(now=True)
             await self.nb_client.km.cleanup_resources()
@@ -130,11 +139,20 @@ class ExecuteNbCode(Action):
         """reset NotebookClient"""
         await self.terminate()
 
-        # sleep 1s to wait for the kernel to be cleaned up completely
-        await asyncio.sleep(1)
+        if self.kernel_pool is None:
+            # sleep 1s to wait for the kernel to be cleaned up completely
+            await asyncio.sleep(1)
         await self.build()
         self.set_nb_client()
 
+    async def _release_kernel(self):
+        """return the leased kernel to its pool, which scrubs it for the next lease"""
+        if self.kernel_lease is None:
+            return
+        lease, self.kernel_lease = self.kernel_lease, None
+        self.nb_client.km, self.nb_client.kc = None, None
+        await lease.pool.release(lease)
+
     def add_code_cell(self, code: str):
         self.nb.cells.append(new_code_cell(source=code))
 
@@ -228,6 +246,15 @@ class ExecuteNbCode(Action):
         """
         await self.reporter.async_report(cell, "content")
 
+        # the timeout of each cell is capped by the time left of the kernel lease, from `self.timeout` every time
+        timeout = self.timeout
+        remaining_time = self.kernel_lease.remaining_time() if self.kernel_lease else None
+        if remaining_time is not None:
+            if remaining_time <= 0:
+                return False, "Kernel lease timed out: the time limit of the kernel is used up, code is not executed."
+            timeout = max(1, int(min(timeout or remaining_time, remaining_time)))
+        self.nb_client.timeout = timeout
+
         try:
             await self.nb_client.async_execute_cell(cell, cell_index)
             return self.parse_outputs(self.nb.cells[-1].outputs)
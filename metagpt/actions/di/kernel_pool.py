@@ -0,0 +1,228 @@
+# -*- encoding: utf-8 -*-
+"""
+@File    :   kernel_pool.py
+@Desc    :   A pool of warm jupyter kernels leased to ExecuteNbCode, with the common libraries already imported.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional
+
+import nbformat
+from nbclient import NotebookClient
+from nbclient.util import ensure_async
+
+from metagpt.config2 import config
+from metagpt.logs import logger
+
+# imported by a kernel when it starts, the libraries stay in `sys.modules` after the namespace is scrubbed
+PRELOAD_LIBRARIES = ["numpy", "pandas", "sklearn", "scipy", "matplotlib"]
+INI_CODE = """import warnings
+import logging
+
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.ERROR)
+warnings.filterwarnings('ignore')"""
+# `%reset -f` drops the variables, functions and imported names of the last lease, but not the imported modules
+SCRUB_CODE = """%reset -f
+import os as _os
+_os.chdir({cwd!r})
+del _os"""
+# a soft limit, which can be raised up to the hard limit `_hard` again
+SET_MEMORY_LIMIT_CODE = """import resource as _resource
+_hard = _resource.getrlimit(_resource.RLIMIT_AS)[1]
+_resource.setrlimit(_resource.RLIMIT_AS, ({limit}, _hard))
+del _resource, _hard"""
+
+
+class KernelLease:
+    """A kernel leased from a pool, with the deadline of the lease if the pool limits its time"""
+
+    def __init__(self, pool: KernelPool, km, kc, deadline: Optional[float] = None):
+        self.pool = pool
+        self.km = km
+        self.kc = kc
+        self.deadline = deadline
+        self.num_leases = 0  # the times the kernel was leased
+
+    def remaining_time(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    async def is_alive(self) -> bool:
+        return self.kc is not None and await ensure_async(self.kc.is_alive())
+
+
+class KernelPool:
+    """
+    Keeps `size` kernels started, and leases them to ExecuteNbCode instead of starting a kernel for each of them.
+
+    A kernel imports PRELOAD_LIBRARIES when it starts. A returned kernel has its namespace scrubbed and its working
+    directory restored, and is shut down instead if it died or served `max_leases` leases. Each lease can be limited
+    to `memory_limit` bytes of address space (a soft RLIMIT_AS, raised again when the kernel is returned) and to
+    `lease_timeout` seconds, after which the cells of the lease are not executed.
+
+    The pool belongs to the event loop it is first used in. `shutdown` shuts down the leased kernels too, the
+    ExecuteNbCode holding one of them then fails to execute code.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        cwd: str | Path = None,
+        preload_libraries: list[str] = None,
+        memory_limit: int = None,
+        lease_timeout: float = None,
+        max_leases: int = 20,
+        startup_timeout: int = 60,
+    ):
+        self.size = size
+        self.cwd = str(cwd or config.workspace.path)  # the working directory of ExecuteNbCode by default
+        self.preload_libraries = PRELOAD_LIBRARIES if preload_libraries is None else preload_libraries
+        self.memory_limit = memory_limit
+        self.lease_timeout = lease_timeout
+        self.max_leases = max_leases
+        self.startup_timeout = startup_timeout
+        self.metrics = {"hits": 0, "misses": 0, "started": 0, "startup_time": 0.0, "scrubbed": 0, "discarded": 0}
+        self._idle: list[KernelLease] = []
+        self._starting: set[asyncio.Task] = set()
+        self._leased: set[KernelLease] = set()
+
+    async def start(self):
+        """Starts `size` kernels ahead of the first leases."""
+        self._fill()
+        await asyncio.gather(*self._starting, return_exceptions=True)
+
+    async def acquire(self) -> KernelLease:
+        lease = None
+        while self._idle and lease is None:
+            lease = self._idle.pop()
+            if not await lease.is_alive():
+                await self._discard(lease)
+                lease = None
+        if lease is not None:
+            self.metrics["hits"] += 1
+        else:
+            self.metrics["misses"] += 1
+            lease = await self._start_kernel()
+        self._fill()
+
+        if self.memory_limit:
+            await self._execute(lease, SET_MEMORY_LIMIT_CODE.format(limit=int(self.memory_limit)))
+        lease.deadline = time.monotonic() + self.lease_timeout if self.lease_timeout else None
+        lease.num_leases += 1
+        self._leased.add(lease)
+        return lease
+
+    async def release(self, lease: KernelLease):
+        """Takes back the kernel, which is scrubbed and kept for the next lease, or shut down."""
+        if lease not in self._leased:
+            return  # shut down with the pool
+        self._leased.discard(lease)
+        lease.deadline = None
+        if len(self._idle) >= self.size or lease.num_leases >= self.max_leases or not await lease.is_alive():
+            await self._discard(lease)
+            return
+        try:
+            # a kernel still running a cell, e.g. after a timeout, fails to be scrubbed in time and is shut down
+            if self.memory_limit:
+                await self._execute(lease, SET_MEMORY_LIMIT_CODE.format(limit="_hard"))
+            await self._execute(lease, SCRUB_CODE.format(cwd=self.cwd))
+        except Exception as e:
+            logger.warning(f"Failed to scrub kernel {lease.km.kernel_id}, shutting it down: {e}")
+            await self._discard(lease)
+            return
+        self.metrics["scrubbed"] += 1
+        self._idle.append(lease)
+
+    async def shutdown(self):
+        for task in list(self._starting):
+            task.cancel()
+        # the leased kernels are shut down too, instead of being left running after the pool
+        leases = self._idle + list(self._leased)
+        self._idle, self._leased = [], set()
+        for lease in leases:
+            await self._discard(lease, count=False)
+        logger.info(f"Kernel pool metrics: {self.get_metrics()}")
+
+    def get_metrics(self) -> dict:
+        metrics = dict(self.metrics)
+        leases = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / leases if leases else 0.0
+        metrics["avg_startup_time"] = metrics["startup_time"] / metrics["started"] if metrics["started"] else 0.0
+        metrics["idle"] = len(self._idle)
+        metrics["leased"] = len(self._leased)
+        return metrics
+
+    async def _start_kernel(self) -> KernelLease:
+        start_time = time.perf_counter()
+        client = NotebookClient(
+            nbformat.v4.new_notebook(),
+            resources={"metadata": {"path": self.cwd}},
+            startup_timeout=self.startup_timeout,
+        )
+        client.create_kernel_manager()
+        await client.async_start_new_kernel()
+        await client.async_start_new_kernel_client()
+        lease = KernelLease(self, client.km, client.kc)
+        imports = "\n".join(f"try:\n    import {i}\nexcept ImportError:\n    pass" for i in self.preload_libraries)
+        await self._execute(lease, f"{INI_CODE}\n{imports}", timeout=self.startup_timeout)
+        startup_time = time.perf_counter() - start_time
+        self.metrics["started"] += 1
+        self.metrics["startup_time"] += startup_time
+        logger.debug(f"Started kernel {lease.km.kernel_id} in {startup_time:.2f}s")
+        return lease
+
+    def _fill(self):
+        """Starts kernels in the background until `size` of them are idle or starting."""
+        while len(self._idle) + len(self._starting) < self.size:
+            task = asyncio.create_task(self._start_kernel())
+            self._starting.add(task)
+            task.add_done_callback(self._on_started)
+
+    def _on_started(self, task: asyncio.Task):
+        self._starting.discard(task)
+        if task.cancelled():
+            return
+        if task.exception():
+            logger.warning(f"Failed to start a pooled kernel: {task.exception()}")
+            return
+        if len(self._idle) >= self.size:  # kernels were returned while it started
+            asyncio.create_task(self._discard(task.result(), count=False))
+            return
+        self._idle.append(task.result())
+
+    async def _execute(self, lease: KernelLease, code: str, timeout: float = 30):
+        reply = await lease.kc.execute_interactive(
+            code, store_history=False, timeout=timeout, output_hook=lambda msg: None
+        )
+        if reply["content"]["status"] != "ok":
+            raise RuntimeError(f"{reply['content'].get('ename')}: {reply['content'].get('evalue')}")
+
+    async def _discard(self, lease: KernelLease, count: bool = True):
+        if count:
+            self.metrics["discarded"] += 1
+        if lease.km is None:
+            return
+        try:
+            if await ensure_async(lease.km.is_alive()):
+                await ensure_async(lease.km.shutdown_kernel(now=True))
+            await ensure_async(lease.km.cleanup_resources())
+            await ensure_async(lease.kc.stop_channels())
+        except Exception as e:
+            logger.warning(f"Failed to shut down kernel {lease.km.kernel_id}: {e}")
+        lease.km, lease.kc = None, None
+
+
+_default_pool: Optional[KernelPool] = None
+
+
+def set_default_kernel_pool(pool: Optional[KernelPool]):
+    """Sets the pool the new ExecuteNbCode instances lease their kernels from, None to start a kernel for each"""
+    global _default_pool
+    _default_pool = pool
+
+
+def get_default_kernel_pool() -> Optional[KernelPool]:
+    return _default_pool
@@ -8,8 +8,9 @@
     Implement RFC197, https://deepwisdom.feishu.cn/wiki/VyK0wfq56ivuvjklMKJcmHQknGt
 """
 
+from collections import defaultdict
 from pathlib import Path
-from typing import Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 import aiofiles
 
@@ -50,7 +51,9 @@ class RebuildClassView(Action):
         format = format if format else self.config.prompt_schema
         graph_repo_pathname = self.context.git_repo.workdir / GRAPH_REPO_FILE_REPO / self.context.git_repo.workdir.name
         self.graph_db = await DiGraphRepository.load_from(str(graph_repo_pathname.with_suffix(".json")))
-        repo_parser = RepoParser(base_directory=Path(self.i_context))
+        repo_parser = RepoParser(
+            base_directory=Path(self.i_context), index_path=graph_repo_pathname.with_suffix(".symbols.json.gz")
+        )
         # use pylint
         class_views, relationship_views, package_root = await repo_parser.rebuild_class_views(path=Path(self.i_context))
         await GraphRepository.update_graph_db_with_class_views(self.graph_db, class_views)
@@ -70,6 +73,8 @@ class RebuildClassView(Action):
         """Creates a Mermaid class diagram using data from the `graph_db` graph repository.
 
         This method utilizes information stored in the graph repository to generate a Mermaid class diagram.
+        The predicates of all classes are fetched in one pass by `_select_predicates`, instead of querying the
+        graph repository once per class and predicate.
         Returns:
             mermaid class diagram file name.
         """
@@ -83,19 +88,23 @@ class RebuildClassView(Action):
             await writer.write(content)
             # class names
             rows = await self.graph_db.select(predicate=GraphKeyword.IS, object_=GraphKeyword.CLASS)
+            class_names = list(dict.fromkeys(r.subject for r in rows))
+            class_predicates = await self._select_predicates(class_names)
             class_distinct = set()
             relationship_distinct = set()
-            for r in rows:
-                content = await self._create_mermaid_class(r.subject)
+            relationship_content = ""
+            for ns_class_name in class_names:
+                predicates = class_predicates[ns_class_name]
+                content = await self._create_mermaid_class(ns_class_name, predicates)
                 if content:
                     await writer.write(content)
-                    class_distinct.add(r.subject)
-            for r in rows:
-                content, distinct = await self._create_mermaid_relationship(r.subject)
+                    class_distinct.add(ns_class_name)
+                content, distinct = self._create_mermaid_relationship(ns_class_name, predicates)
                 if content:
                     logger.debug(content)
-                    await writer.write(content)
+                    relationship_content += content
                     relationship_distinct.update(distinct)
+            await writer.write(relationship_content)
         logger.info(f"classes: {len(class_distinct)}, relationship: {len(relationship_distinct)}")
 
         if self.i_context:
@@ -106,11 +115,30 @@ class RebuildClassView(Action):
             logger.info(f"{self.i_context} hasMermaidClassDiagramFile {filename}")
         return filename
 
-    async def _create_mermaid_class(self, ns_class_name) -> str:
+    async def _select_predicates(self, subjects: List[str]) -> Dict[str, Dict[str, List[str]]]:
+        """Returns all predicates and objects of `subjects` using a single scan of the `graph_db` graph repository.
+
+        Args:
+            subjects (List[str]): The subjects to look up.
+
+        Returns:
+            Dict[str, Dict[str, List[str]]]: A subject -> predicate -> objects index, with an entry for every subject.
+        """
+        index = {i: defaultdict(list) for i in subjects}
+        rows = await self.graph_db.select()
+        for r in rows:
+            predicates = index.get(r.subject)
+            if predicates is not None:
+                predicates[r.predicate].append(r.object_)
+        return index
+
+    async def _create_mermaid_class(self, ns_class_name: str, predicates: Dict[str, List[str]]) -> str:
         """Generates a Mermaid class diagram for a specific class using data from the `graph_db` graph repository.
 
         Args:
             ns_class_name (str): The namespace-prefixed name of the class for which the Mermaid class diagram is to be created.
+            predicates (Dict[str, List[str]]): The predicate -> objects index of the class, updated with the
+                relationships inserted into `graph_db`.
 
         Returns:
             str: A Mermaid code block object in markdown representing the class diagram.
@@ -120,39 +148,41 @@ class RebuildClassView(Action):
             # Ignore sub-class
             return ""
 
-        rows = await self.graph_db.select(subject=ns_class_name, predicate=GraphKeyword.HAS_DETAIL)
-        if not rows:
+        details = predicates.get(GraphKeyword.HAS_DETAIL)
+        if not details:
             return ""
-        dot_class_info = DotClassInfo.model_validate_json(rows[0].object_)
+        dot_class_info = DotClassInfo.model_validate_json(details[0])
         class_view = UMLClassView.load_dot_class_info(dot_class_info)
 
         # update uml view
         await self.graph_db.insert(ns_class_name, GraphKeyword.HAS_CLASS_VIEW, class_view.model_dump_json())
         # update uml isCompositeOf
+        predicate = GraphKeyword.IS + COMPOSITION + GraphKeyword.OF
         for c in dot_class_info.compositions:
-            await self.graph_db.insert(
-                subject=ns_class_name,
-                predicate=GraphKeyword.IS + COMPOSITION + GraphKeyword.OF,
-                object_=concat_namespace("?", c),
-            )
+            object_ = concat_namespace("?", c)
+            await self.graph_db.insert(subject=ns_class_name, predicate=predicate, object_=object_)
+            predicates[predicate].append(object_)
 
         # update uml isAggregateOf
+        predicate = GraphKeyword.IS + AGGREGATION + GraphKeyword.OF
         for a in dot_class_info.aggregations:
-            await self.graph_db.insert(
-                subject=ns_class_name,
-                predicate=GraphKeyword.IS + AGGREGATION + GraphKeyword.OF,
-                object_=concat_namespace("?", a),
-            )
+            object_ = concat_namespace("?", a)
+            await self.graph_db.insert(subject=ns_class_name, predicate=predicate, object_=object_)
+            predicates[predicate].append(object_)
 
         content = class_view.get_mermaid(align=1)
         logger.debug(content)
         return content
 
-    async def _create_mermaid_relationship(self, ns_class_name: str) -> Tuple[Optional[str], Optional[Set]]:
-        """Generates a Mermaid class relationship diagram for a specific class using data from the `graph_db` graph repository.
+    @staticmethod
+    def _create_mermaid_relationship(
+        ns_class_name: str, predicates: Dict[str, List[str]]
+    ) -> Tuple[Optional[str], Optional[Set]]:
+        """Generates a Mermaid class relationship diagram for a specific class.
 
         Args:
             ns_class_name (str): The namespace-prefixed class name for which the Mermaid relationship diagram is to be created.
+            predicates (Dict[str, List[str]]): The predicate -> objects index of the class.
 
         Returns:
             Tuple[str, Set]: A tuple containing the relationship diagram as a string and a set of deduplication.
@@ -162,7 +192,7 @@ class RebuildClassView(Action):
             # Ignore sub-class
             return None, None
 
-        predicates = {GraphKeyword.IS + v + GraphKeyword.OF: v for v in [GENERALIZATION, COMPOSITION, AGGREGATION]}
+        relationships = {GraphKeyword.IS + v + GraphKeyword.OF: v for v in [GENERALIZATION, COMPOSITION, AGGREGATION]}
         mappings = {
             GENERALIZATION: " <|-- ",
             COMPOSITION: " *-- ",
@@ -170,10 +200,9 @@ class RebuildClassView(Action):
         }
         content = ""
         distinct = set()
-        for p, v in predicates.items():
-            rows = await self.graph_db.select(subject=ns_class_name, predicate=p)
-            for r in rows:
-                o_fields = split_namespace(r.object_)
+        for p, v in relationships.items():
+            for object_ in dict.fromkeys(predicates.get(p, [])):
+                o_fields = split_namespace(object_)
                 if len(o_fields) > 2:
                     # Ignore sub-class
                     continue
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : compiled maze of the StanfordTown env, parsed from the maze csv assets once and cached as a `.npz`
+
+import hashlib
+import json
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+from metagpt.logs import logger
+from metagpt.utils.common import read_csv_to_list, read_json_file
+
+MAZE_CACHE_VERSION = 1
+MAZE_CACHE_FILENAME = "maze_cache.npz"
+
+# the layers of a compiled maze, `collision` keeps the raw block ids, the others index the names of their blocks
+LAYERS = ["collision", "sector", "arena", "game_object", "spawning_location"]
+BLOCK_FILES = {
+    "sector": "sector_blocks.csv",
+    "arena": "arena_blocks.csv",
+    "game_object": "game_object_blocks.csv",
+    "spawning_location": "spawning_location_blocks.csv",
+}
+MAZE_FILES = {
+    "collision": "collision_maze.csv",
+    "sector": "sector_maze.csv",
+    "arena": "arena_maze.csv",
+    "game_object": "game_object_maze.csv",
+    "spawning_location": "spawning_location_maze.csv",
+}
+
+
+class CompiledMaze:
+    """
+    The maze as NumPy arrays: a (layer, y, x) array of the LAYERS, the block names of each layer, and the address
+    table of the tiles in CSR form.
+    """
+
+    def __init__(self, meta_info: dict, world: str, layers: np.ndarray, names: dict[str, list[str]], addresses: dict):
+        self.meta_info = meta_info
+        self.world = world
+        self.layers = layers
+        self.names = names
+        self.addresses = addresses  # {"names": [...], "offsets": (n + 1,), "tiles": (m, 2) of (x, y)}
+
+    @property
+    def maze_width(self) -> int:
+        return self.layers.shape[2]
+
+    @property
+    def maze_height(self) -> int:
+        return self.layers.shape[1]
+
+    def get_collision_maze(self) -> list[list[str]]:
+        return self.layers[0].astype(str).tolist()
+
+    def get_address_tiles(self) -> dict[str, set[tuple[int, int]]]:
+        names, offsets, tiles = self.addresses["names"], self.addresses["offsets"], self.addresses["tiles"].tolist()
+        return {name: set(map(tuple, tiles[offsets[i] : offsets[i + 1]])) for i, name in enumerate(names)}
+
+    def get_tile(self, x: int, y: int) -> dict:
+        """Builds the tile detail dictionary of (x, y), with the default event of its game object."""
+        tile_details = {"world": self.world}
+        for layer_idx, layer in enumerate(LAYERS[1:], start=1):
+            tile_details[layer] = self.names[layer][self.layers[layer_idx, y, x]]
+        tile_details["collision"] = bool(self.layers[0, y, x] != 0)
+        tile_details["events"] = set()
+        if tile_details["game_object"]:
+            tile_details["events"].add((self.get_object_name(x, y), None, None, None))
+        return tile_details
+
+    def get_object_name(self, x: int, y: int) -> str:
+        return ":".join([self.world] + [self.names[i][self.layers[LAYERS.index(i), y, x]] for i in LAYERS[1:4]])
+
+    def iter_default_events(self) -> Iterator[tuple[tuple[int, int], tuple]]:
+        """Yields the tile and the default event of every tile with a game object."""
+        for y, x in zip(*np.nonzero(self.layers[LAYERS.index("game_object")])):
+            yield (int(x), int(y)), (self.get_object_name(x, y), None, None, None)
+
+
+class MazeTiles(Sequence):
+    """
+    Rows of the tile detail dictionaries of a compiled maze, accessed as `tiles[y][x]` like the nested lists. A tile
+    dictionary is only built on its first access, and is kept afterwards so that its events can be changed.
+    """
+
+    def __init__(self, maze: CompiledMaze):
+        self.maze = maze
+        self.materialized: dict[tuple[int, int], dict] = {}
+        self._rows = [MazeTileRow(self, y) for y in range(maze.maze_height)]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    def get_tile(self, x: int, y: int) -> dict:
+        tile_details = self.materialized.get((x, y))
+        if tile_details is None:
+            tile_details = self.materialized[(x, y)] = self.maze.get_tile(x, y)
+        return tile_details
+
+    def to_list(self) -> list[list[dict]]:
+        """The nested lists of the tile detail dictionaries, e.g. to be serialized, the untouched tiles are not kept."""
+        return [
+            [self.materialized.get((x, y)) or self.maze.get_tile(x, y) for x in range(self.maze.maze_width)]
+            for y in range(self.maze.maze_height)
+        ]
+
+    def iter_events(self) -> Iterator[tuple[tuple[int, int], tuple]]:
+        """Yields the tile and the event of every event, without building the untouched tiles."""
+        for tile, event in self.maze.iter_default_events():
+            if tile not in self.materialized:
+                yield tile, event
+        for tile, tile_details in self.materialized.items():
+            for event in tile_details["events"]:
+                yield tile, event
+
+
+class MazeTileRow(Sequence):
+    def __init__(self, tiles: MazeTiles, y: int):
+        self.tiles = tiles
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.tiles.maze.maze_width
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.tiles.get_tile(x, self.y) for x in range(len(self))[index]]
+        x = range(len(self))[index]
+        return self.tiles.get_tile(x, self.y)
+
+
+def load_compiled_maze(maze_asset_path: Path) -> CompiledMaze:
+    """
+    Loads the compiled maze of the assets. The csv assets are only parsed if the cache of the same assets digest does
+    not exist, and the compiled maze is cached then.
+    """
+    maze_matrix_path = Path(maze_asset_path).joinpath("matrix")
+    digest = _get_assets_digest(maze_matrix_path)
+    cache_path = maze_matrix_path.joinpath(MAZE_CACHE_FILENAME)
+    maze = _load_cache(cache_path, digest)
+    if maze is None:
+        maze = _compile_maze(maze_matrix_path)
+        _save_cache(cache_path, digest, maze)
+    return maze
+
+
+def _get_assets_digest(maze_matrix_path: Path) -> str:
+    md5 = hashlib.md5(str(MAZE_CACHE_VERSION).encode())
+    files = ["maze_meta_info.json", "special_blocks/world_blocks.csv"]
+    files += [f"special_blocks/{i}" for i in BLOCK_FILES.values()] + [f"maze/{i}" for i in MAZE_FILES.values()]
+    for filename in files:
+        md5.update(maze_matrix_path.joinpath(filename).read_bytes())
+    return md5.hexdigest()
+
+
+def _compile_maze(maze_matrix_path: Path) -> CompiledMaze:
+    meta_info = read_json_file(maze_matrix_path.joinpath("maze_meta_info.json"))
+    maze_width = int(meta_info["maze_width"])
+
+    # READING IN SPECIAL BLOCKS
+    # Special blocks are those that are colored in the Tiled map.
+    # Here is an example row for the arena block file:
+    # e.g, "25331, Double Studio, Studio, Bedroom 2, Painting"
+    blocks_folder = maze_matrix_path.joinpath("special_blocks")
+    world = read_csv_to_list(blocks_folder.joinpath("world_blocks.csv"), header=False)[0][-1]
+
+    # Reading in the matrices. They are single row matrices with the length of width x height of the maze, taken
+    # directly from the json exports of Tiled maps, e.g. ['0', '0', ... '25309', '0',...]
+    maze_folder = maze_matrix_path.joinpath("maze")
+    raw_layers = {
+        layer: np.asarray(read_csv_to_list(maze_folder.joinpath(filename), header=False)[0])
+        for layer, filename in MAZE_FILES.items()
+    }
+
+    layers = np.zeros((len(LAYERS), len(raw_layers["collision"]) // maze_width, maze_width), dtype=np.int32)
+    layers[0] = raw_layers["collision"].astype(np.int64).reshape(-1, maze_width)
+    names = {}
+    for layer_idx, layer in enumerate(LAYERS[1:], start=1):
+        block_dict = dict()
+        for i in read_csv_to_list(blocks_folder.joinpath(BLOCK_FILES[layer]), header=False):
+            block_dict[i[0]] = i[-1]
+        names[layer] = [""] + sorted(set(block_dict.values()))
+        name_idx = {name: idx for idx, name in enumerate(names[layer])}
+        codes, inverse = np.unique(raw_layers[layer], return_inverse=True)
+        code_idx = np.asarray([name_idx[block_dict[code]] if code in block_dict else 0 for code in codes])
+        layers[layer_idx] = code_idx[inverse].reshape(-1, maze_width)
+
+    return CompiledMaze(meta_info, world, layers, names, _compile_addresses(world, layers, names))
+
+
+def _compile_addresses(world: str, layers: np.ndarray, names: dict[str, list[str]]) -> dict:
+    """
+    Groups the tiles by their string addresses, e.g.
+        '<spawn_loc>bedroom-2-a' -> {(58, 9)}
+        'double studio:recreation:pool table' -> {(29, 14), (31, 11), (30, 14), (32, 11), ...}
+    """
+    sector, arena, game_object, spawning_location = (layers[LAYERS.index(i)] for i in LAYERS[1:])
+    address_tiles: dict[str, list[np.ndarray]] = {}
+
+    def _group(mask: np.ndarray, keys: list[np.ndarray], to_address):
+        ys, xs = np.nonzero(mask)
+        combos = np.stack([key[ys, xs] for key in keys], axis=1)
+        uniques, inverse = np.unique(combos, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        tiles = np.stack([xs, ys], axis=1)
+        for idx, combo in enumerate(uniques):
+            address_tiles.setdefault(to_address(*combo), []).append(tiles[inverse == idx])
+
+    _group(sector != 0, [sector], lambda s: f"{world}:{names['sector'][s]}")
+    _group(arena != 0, [sector, arena], lambda s, a: f"{world}:{names['sector'][s]}:{names['arena'][a]}")
+    _group(
+        game_object != 0,
+        [sector, arena, game_object],
+        lambda s, a, g: f"{world}:{names['sector'][s]}:{names['arena'][a]}:{names['game_object'][g]}",
+    )
+    _group(spawning_location != 0, [spawning_location], lambda s: f"<spawn_loc>{names['spawning_location'][s]}")
+
+    address_names = list(address_tiles)
+    tiles = [np.concatenate(address_tiles[name]) for name in address_names]
+    offsets = np.cumsum([0] + [len(i) for i in tiles])
+    return {
+        "names": address_names,
+        "offsets": offsets,
+        "tiles": np.concatenate(tiles) if tiles else np.zeros((0, 2), dtype=np.int64),
+    }
+
+
+def _load_cache(cache_path: Path, digest: str) -> Optional[CompiledMaze]:
+    if not cache_path.exists():
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            header = json.loads(str(cache["header"]))
+            if header["digest"] != digest:
+                return None
+            addresses = {"names": header["addresses"], "offsets": cache["offsets"], "tiles": cache["address_tiles"]}
+            return CompiledMaze(header["meta_info"], header["world"], cache["layers"], header["names"], addresses)
+    except Exception as exp:
+        logger.warning(f"load maze cache {cache_path} failed, exp: {exp}, will recompile it.")
+        return None
+
+
+def _save_cache(cache_path: Path, digest: str, maze: CompiledMaze):
+    header = {
+        "digest": digest,
+        "meta_info": maze.meta_info,
+        "world": maze.world,
+        "names": maze.names,
+        "addresses": maze.addresses["names"],
+    }
+    tmp_path = cache_path.with_name(f".{cache_path.name}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                header=np.asarray(json.dumps(header, ensure_ascii=False)),
+                layers=maze.layers,
+                offsets=maze.addresses["offsets"],
+                address_tiles=maze.addresses["tiles"],
+            )
+        tmp_path.replace(cache_path)
+    except OSError as exp:
+        # e.g. read-only assets, the maze is compiled again next time
+        logger.warning(f"save maze cache {cache_path} failed, exp: {exp}")
@@ -5,9 +5,9 @@
 
 import math
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Union
 
-from pydantic import ConfigDict, Field, model_validator
+from pydantic import ConfigDict, Field, PrivateAttr, field_serializer, model_validator
 
 from metagpt.environment.base_env import ExtEnv, mark_as_readable, mark_as_writeable
 from metagpt.environment.stanford_town.env_space import (
@@ -19,7 +19,9 @@ from metagpt.environment.stanford_town.env_space import (
     get_action_space,
     get_observation_space,
 )
-from metagpt.utils.common import read_csv_to_list, read_json_file
+from metagpt.environment.stanford_town.maze_cache import MazeTiles, load_compiled_maze
+
+EVENT_BUCKET_SIZE = 8  # the side length in tiles of the grid buckets of the event index
 
 
 class StanfordTownExtEnv(ExtEnv):
@@ -32,10 +34,16 @@ class StanfordTownExtEnv(ExtEnv):
     special_constraint: str = Field(
         default="", description="a string description of any relevant special constraints " "the world might have"
     )
-    tiles: list[list[dict]] = Field(default=[])
+    tiles: Union[MazeTiles, list[list[dict]]] = Field(default=[])
     address_tiles: dict[str, set] = Field(default=dict())
     collision_maze: list[list] = Field(default=[])
 
+    # spatial event index, maintained by the event actions
+    _event_tiles: dict[tuple, set[tuple[int, int]]] = PrivateAttr(default_factory=dict)  # event -> tiles
+    _subject_tiles: dict[str, set[tuple[int, int]]] = PrivateAttr(default_factory=dict)  # event subject -> tiles
+    # (x // EVENT_BUCKET_SIZE, y // EVENT_BUCKET_SIZE) -> tiles with events
+    _event_buckets: dict[tuple[int, int], set[tuple[int, int]]] = PrivateAttr(default_factory=dict)
+
     @model_validator(mode="before")
     @classmethod
     def _init_maze(cls, values):
@@ -43,8 +51,9 @@ class StanfordTownExtEnv(ExtEnv):
         assert maze_asset_path
         maze_asset_path = Path(maze_asset_path)
 
-        maze_matrix_path = maze_asset_path.joinpath("matrix")
-        meta_info = read_json_file(maze_matrix_path.joinpath("maze_meta_info.json"))
+        # The maze csv assets are compiled into NumPy arrays once and cached, see `maze_cache`.
+        maze = load_compiled_maze(maze_asset_path)
+        meta_info = maze.meta_info
 
         maze_width = int(meta_info["maze_width"])
         maze_height = int(meta_info["maze_height"])
@@ -53,121 +62,10 @@ class StanfordTownExtEnv(ExtEnv):
         values["sq_tile_size"] = int(meta_info["sq_tile_size"])
         values["special_constraint"] = meta_info["special_constraint"]
 
-        # READING IN SPECIAL BLOCKS
-        # Special blocks are those that are colored in the Tiled map.
-        # Here is an example row for the arena block file:
-        # e.g, "25331, Double Studio, Studio, Bedroom 2, Painting"
-
-        blocks_folder = maze_matrix_path.joinpath("special_blocks")
-
-        _wb = blocks_folder.joinpath("world_blocks.csv")
-        wb_rows = read_csv_to_list(_wb, header=False)
-        wb = wb_rows[0][-1]
-
-        _sb = blocks_folder.joinpath("sector_blocks.csv")
-        sb_rows = read_csv_to_list(_sb, header=False)
-        sb_dict = dict()
-        for i in sb_rows:
-            sb_dict[i[0]] = i[-1]
-
-        _ab = blocks_folder.joinpath("arena_blocks.csv")
-        ab_rows = read_csv_to_list(_ab, header=False)
-        ab_dict = dict()
-        for i in ab_rows:
-            ab_dict[i[0]] = i[-1]
-
-        _gob = blocks_folder.joinpath("game_object_blocks.csv")
-        gob_rows = read_csv_to_list(_gob, header=False)
-        gob_dict = dict()
-        for i in gob_rows:
-            gob_dict[i[0]] = i[-1]
-
-        _slb = blocks_folder.joinpath("spawning_location_blocks.csv")
-        slb_rows = read_csv_to_list(_slb, header=False)
-        slb_dict = dict()
-        for i in slb_rows:
-            slb_dict[i[0]] = i[-1]
-
-        # [SECTION 3] Reading in the matrices
-        # This is your typical two dimensional matrices. It's made up of 0s and
-        # the number that represents the color block from the blocks folder.
-        maze_folder = maze_matrix_path.joinpath("maze")
-
-        _cm = maze_folder.joinpath("collision_maze.csv")
-        collision_maze_raw = read_csv_to_list(_cm, header=False)[0]
-        _sm = maze_folder.joinpath("sector_maze.csv")
-        sector_maze_raw = read_csv_to_list(_sm, header=False)[0]
-        _am = maze_folder.joinpath("arena_maze.csv")
-        arena_maze_raw = read_csv_to_list(_am, header=False)[0]
-        _gom = maze_folder.joinpath("game_object_maze.csv")
-        game_object_maze_raw = read_csv_to_list(_gom, header=False)[0]
-        _slm = maze_folder.joinpath("spawning_location_maze.csv")
-        spawning_location_maze_raw = read_csv_to_list(_slm, header=False)[0]
-
-        # Loading the maze. The mazes are taken directly from the json exports of
-        # Tiled maps. They should be in csv format.
-        # Importantly, they are "not" in a 2-d matrix format -- they are single
-        # row matrices with the length of width x height of the maze. So we need
-        # to convert here.
-        # example format: [['0', '0', ... '25309', '0',...], ['0',...]...]
-        # 25309 is the collision bar number right now.
-        collision_maze = []
-        sector_maze = []
-        arena_maze = []
-        game_object_maze = []
-        spawning_location_maze = []
-        for i in range(0, len(collision_maze_raw), maze_width):
-            tw = maze_width
-            collision_maze += [collision_maze_raw[i : i + tw]]
-            sector_maze += [sector_maze_raw[i : i + tw]]
-            arena_maze += [arena_maze_raw[i : i + tw]]
-            game_object_maze += [game_object_maze_raw[i : i + tw]]
-            spawning_location_maze += [spawning_location_maze_raw[i : i + tw]]
-        values["collision_maze"] = collision_maze
-
-        tiles = []
-        for i in range(maze_height):
-            row = []
-            for j in range(maze_width):
-                tile_details = dict()
-                tile_details["world"] = wb
-
-                tile_details["sector"] = ""
-                if sector_maze[i][j] in sb_dict:
-                    tile_details["sector"] = sb_dict[sector_maze[i][j]]
-
-                tile_details["arena"] = ""
-                if arena_maze[i][j] in ab_dict:
-                    tile_details["arena"] = ab_dict[arena_maze[i][j]]
-
-                tile_details["game_object"] = ""
-                if game_object_maze[i][j] in gob_dict:
-                    tile_details["game_object"] = gob_dict[game_object_maze[i][j]]
-
-                tile_details["spawning_location"] = ""
-                if spawning_location_maze[i][j] in slb_dict:
-                    tile_details["spawning_location"] = slb_dict[spawning_location_maze[i][j]]
-
-                tile_details["collision"] = False
-                if collision_maze[i][j] != "0":
-                    tile_details["collision"] = True
-
-                tile_details["events"] = set()
-
-                row += [tile_details]
-            tiles += [row]
-        values["tiles"] = tiles
-
-        # Each game object occupies an event in the tile. We are setting up the
-        # default event value here.
-        for i in range(maze_height):
-            for j in range(maze_width):
-                if tiles[i][j]["game_object"]:
-                    object_name = ":".join(
-                        [tiles[i][j]["world"], tiles[i][j]["sector"], tiles[i][j]["arena"], tiles[i][j]["game_object"]]
-                    )
-                    go_event = (object_name, None, None, None)
-                    tiles[i][j]["events"].add(go_event)
+        values["collision_maze"] = maze.get_collision_maze()
+        # The tile detail dictionaries are built on their first access, each game object
+        # occupies a default event in its tiles.
+        values["tiles"] = MazeTiles(maze)
 
         # Reverse tile access.
         # <address_tiles> -- given a string address, we return a set of all
@@ -177,40 +75,31 @@ class StanfordTownExtEnv(ExtEnv):
         # address_tiles['<spawn_loc>bedroom-2-a'] == {(58, 9)}
         # address_tiles['double studio:recreation:pool table']
         #   == {(29, 14), (31, 11), (30, 14), (32, 11), ...},
-        address_tiles = dict()
-        for i in range(maze_height):
-            for j in range(maze_width):
-                addresses = []
-                if tiles[i][j]["sector"]:
-                    add = f'{tiles[i][j]["world"]}:'
-                    add += f'{tiles[i][j]["sector"]}'
-                    addresses += [add]
-                if tiles[i][j]["arena"]:
-                    add = f'{tiles[i][j]["world"]}:'
-                    add += f'{tiles[i][j]["sector"]}:'
-                    add += f'{tiles[i][j]["arena"]}'
-                    addresses += [add]
-                if tiles[i][j]["game_object"]:
-                    add = f'{tiles[i][j]["world"]}:'
-                    add += f'{tiles[i][j]["sector"]}:'
-                    add += f'{tiles[i][j]["arena"]}:'
-                    add += f'{tiles[i][j]["game_object"]}'
-                    addresses += [add]
-                if tiles[i][j]["spawning_location"]:
-                    add = f'<spawn_loc>{tiles[i][j]["spawning_location"]}'
-                    addresses += [add]
-
-                for add in addresses:
-                    if add in address_tiles:
-                        address_tiles[add].add((j, i))
-                    else:
-                        address_tiles[add] = set([(j, i)])
-        values["address_tiles"] = address_tiles
+        values["address_tiles"] = maze.get_address_tiles()
 
         values["action_space"] = get_action_space((maze_width, maze_height))
         values["observation_space"] = get_observation_space()
         return values
 
+    @field_serializer("tiles")
+    def _serialize_tiles(self, tiles: Union[MazeTiles, list[list[dict]]]) -> list[list[dict]]:
+        return tiles.to_list() if isinstance(tiles, MazeTiles) else tiles
+
+    @model_validator(mode="after")
+    def _init_event_index(self):
+        if isinstance(self.tiles, MazeTiles):
+            tile_events = self.tiles.iter_events()
+        else:
+            tile_events = (
+                ((x, y), event)
+                for y, row in enumerate(self.tiles)
+                for x, tile_details in enumerate(row)
+                for event in tile_details["events"]
+            )
+        for tile, event in tile_events:
+            self._index_event(event, tile)
+        return self
+
     def reset(
         self,
         *,
@@ -245,6 +134,12 @@ class StanfordTownExtEnv(ExtEnv):
             obs = self.get_tile_path(tile=obs_params.coord, level=obs_params.level)
         elif obs_type == EnvObsType.TILE_NBR:
             obs = self.get_nearby_tiles(tile=obs_params.coord, vision_r=obs_params.vision_radius)
+        elif obs_type == EnvObsType.TILE_NBR_DETAIL:
+            obs = self.get_nearby_tiles_detail(tile=obs_params.coord, vision_r=obs_params.vision_radius)
+        elif obs_type == EnvObsType.NBR_EVENTS:
+            obs = self.get_nearby_events(
+                tile=obs_params.coord, vision_r=obs_params.vision_radius, level=obs_params.level or None
+            )
         return obs
 
     def step(self, action: EnvAction) -> tuple[dict[str, EnvObsValType], float, bool, bool, dict[str, Any]]:
@@ -370,27 +265,79 @@ class StanfordTownExtEnv(ExtEnv):
         OUTPUT:
           nearby_tiles: a list of tiles that are within the radius.
         """
-        left_end = 0
-        if tile[0] - vision_r > left_end:
-            left_end = tile[0] - vision_r
+        left_end, right_end, top_end, bottom_end = self._get_nearby_bounds(tile, vision_r)
+        return [(i, j) for i in range(left_end, right_end) for j in range(top_end, bottom_end)]
+
+    @mark_as_readable
+    def get_nearby_tiles_detail(self, tile: tuple[int, int], vision_r: int) -> list[dict]:
+        """
+        Returns the tile detail dictionaries of `get_nearby_tiles` at once, in the same order.
+        """
+        return [self.tiles[j][i] for i, j in self.get_nearby_tiles(tile, vision_r)]
 
-        right_end = self.maze_width - 1
-        if tile[0] + vision_r + 1 < right_end:
-            right_end = tile[0] + vision_r + 1
+    @mark_as_readable
+    def get_nearby_events(
+        self, tile: tuple[int, int], vision_r: int, level: Optional[str] = None
+    ) -> list[tuple[tuple[int, int], set]]:
+        """
+        Returns the tiles with events within the radius of `get_nearby_tiles`, and their events. Only the tiles with
+        events are visited, through the grid buckets of the event index.
 
-        bottom_end = self.maze_height - 1
-        if tile[1] + vision_r + 1 < bottom_end:
-            bottom_end = tile[1] + vision_r + 1
+        INPUT:
+          tile: The tile coordinate of our interest in (x, y) form.
+          vision_r: The radius of the persona's vision.
+          level: If given, e.g. "arena", only the tiles in the same `level` address as `tile` are returned.
+        OUTPUT:
+          A list of (tile, events) in the order of `get_nearby_tiles`.
+        """
+        left_end, right_end, top_end, bottom_end = self._get_nearby_bounds(tile, vision_r)
+        curr_path = self.get_tile_path(tile, level) if level else None
+        nearby_events = []
+        for bx in range(left_end // EVENT_BUCKET_SIZE, (right_end - 1) // EVENT_BUCKET_SIZE + 1):
+            for by in range(top_end // EVENT_BUCKET_SIZE, (bottom_end - 1) // EVENT_BUCKET_SIZE + 1):
+                for x, y in self._event_buckets.get((bx, by), ()):
+                    if not (left_end <= x < right_end and top_end <= y < bottom_end):
+                        continue
+                    if curr_path is not None and self.get_tile_path((x, y), level) != curr_path:
+                        continue
+                    nearby_events.append(((x, y), self.tiles[y][x]["events"]))
+        nearby_events.sort(key=lambda i: i[0])
+        return nearby_events
 
-        top_end = 0
-        if tile[1] - vision_r > top_end:
-            top_end = tile[1] - vision_r
+    @mark_as_readable
+    def get_event_tiles(self, event: tuple) -> set[tuple[int, int]]:
+        """Returns the tiles where `event` takes place."""
+        return set(self._event_tiles.get(event, ()))
 
-        nearby_tiles = []
-        for i in range(left_end, right_end):
-            for j in range(top_end, bottom_end):
-                nearby_tiles += [(i, j)]
-        return nearby_tiles
+    @mark_as_readable
+    def get_subject_tiles(self, subject: str) -> set[tuple[int, int]]:
+        """Returns the tiles with events of `subject`, e.g. "Isabella Rodriguez"."""
+        return set(self._subject_tiles.get(subject, ()))
+
+    def _get_nearby_bounds(self, tile: tuple[int, int], vision_r: int) -> tuple[int, int, int, int]:
+        """Returns the [left, right) x range and [top, bottom) y range of `get_nearby_tiles`."""
+        left_end = max(0, tile[0] - vision_r)
+        right_end = min(self.maze_width - 1, tile[0] + vision_r + 1)
+        top_end = max(0, tile[1] - vision_r)
+        bottom_end = min(self.maze_height - 1, tile[1] + vision_r + 1)
+        return int(left_end), int(right_end), int(top_end), int(bottom_end)
+
+    def _index_event(self, event: tuple, tile: tuple[int, int]):
+        tile = (int(tile[0]), int(tile[1]))
+        self._event_tiles.setdefault(event, set()).add(tile)
+        self._subject_tiles.setdefault(event[0], set()).add(tile)
+        bucket = (tile[0] // EVENT_BUCKET_SIZE, tile[1] // EVENT_BUCKET_SIZE)
+        self._event_buckets.setdefault(bucket, set()).add(tile)
+
+    def _unindex_event(self, event: tuple, tile: tuple[int, int]):
+        """Removes `event`, which was just removed from the events of `tile`, from the index."""
+        tile = (int(tile[0]), int(tile[1]))
+        events = self.tiles[tile[1]][tile[0]]["events"]
+        _discard_from_index(self._event_tiles, event, tile)
+        if not any(i[0] == event[0] for i in events):
+            _discard_from_index(self._subject_tiles, event[0], tile)
+        if not events:
+            _discard_from_index(self._event_buckets, (tile[0] // EVENT_BUCKET_SIZE, tile[1] // EVENT_BUCKET_SIZE), tile)
 
     @mark_as_writeable
     def add_event_from_tile(self, curr_event: tuple[str], tile: tuple[int, int]) -> None:
@@ -406,6 +353,7 @@ class StanfordTownExtEnv(ExtEnv):
           None
         """
         self.tiles[tile[1]][tile[0]]["events"].add(curr_event)
+        self._index_event(curr_event, tile)
 
     @mark_as_writeable
     def remove_event_from_tile(self, curr_event: tuple[str], tile: tuple[int, int]) -> None:
@@ -420,19 +368,20 @@ class StanfordTownExtEnv(ExtEnv):
         OUPUT:
           None
         """
-        curr_tile_ev_cp = self.tiles[tile[1]][tile[0]]["events"].copy()
-        for event in curr_tile_ev_cp:
-            if event == curr_event:
-                self.tiles[tile[1]][tile[0]]["events"].remove(event)
+        events = self.tiles[tile[1]][tile[0]]["events"]
+        if curr_event in events:
+            events.remove(curr_event)
+            self._unindex_event(curr_event, tile)
 
     @mark_as_writeable
     def turn_event_from_tile_idle(self, curr_event: tuple[str], tile: tuple[int, int]) -> None:
-        curr_tile_ev_cp = self.tiles[tile[1]][tile[0]]["events"].copy()
-        for event in curr_tile_ev_cp:
-            if event == curr_event:
-                self.tiles[tile[1]][tile[0]]["events"].remove(event)
-                new_event = (event[0], None, None, None)
-                self.tiles[tile[1]][tile[0]]["events"].add(new_event)
+        events = self.tiles[tile[1]][tile[0]]["events"]
+        if curr_event in events:
+            events.remove(curr_event)
+            self._unindex_event(curr_event, tile)
+            new_event = (curr_event[0], None, None, None)
+            events.add(new_event)
+            self._index_event(new_event, tile)
 
     @mark_as_writeable
     def remove_subject_events_from_tile(self, subject: str, tile: tuple[int, int]) -> None:
@@ -445,7 +394,15 @@ class StanfordTownExtEnv(ExtEnv):
         OUPUT:
           None
         """
-        curr_tile_ev_cp = self.tiles[tile[1]][tile[0]]["events"].copy()
-        for event in curr_tile_ev_cp:
-            if event[0] == subject:
-                self.tiles[tile[1]][tile[0]]["events"].remove(event)
+        events = self.tiles[tile[1]][tile[0]]["events"]
+        for event in [i for i in events if i[0] == subject]:
+            events.remove(event)
+            self._unindex_event(event, tile)
+
+
+def _discard_from_index(index: dict, key, tile: tuple[int, int]):
+    tiles = index.get(key)
+    if tiles is not None:
+        tiles.discard(tile)
+        if not tiles:
+            del index[key]
@@ -1,5 +1,6 @@
 """Experience Manager."""
 
+import json
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
 
@@ -106,17 +107,22 @@ class ExperienceManager(BaseModel):
         if not self.is_readable:
             return []
 
-        nodes = await self.storage.aretrieve(req)
-        exps: list[Experience] = [node.metadata["obj"] for node in nodes]
-
-        # TODO: filter by metadata
-        if tag:
-            exps = [exp for exp in exps if exp.tag == tag]
+        filters = {"tag": tag} if tag else {}
 
         if query_type == QueryType.EXACT:
-            exps = [exp for exp in exps if exp.req == req]
+            filters["req_hash"] = Experience.req_hash(req)
+            nodes = self.storage.get_nodes_by_metadata(filters)
+            exps: list[Experience] = [node.metadata["obj"] for node in nodes]
+
+            # Guard against hash collisions.
+            return [exp for exp in exps if exp.req == req]
 
-        return exps
+        if filters:
+            nodes = await self.storage.aretrieve_with_filters(req, filters)
+        else:
+            nodes = await self.storage.aretrieve(req)
+
+        return [node.metadata["obj"] for node in nodes]
 
     @handle_exception
     def delete_all_exps(self):
@@ -185,6 +191,7 @@ class ExperienceManager(BaseModel):
             retriever_configs=retriever_configs,
             ranker_configs=ranker_configs,
         )
+        self._backfill_metadata(storage)
 
         return storage
 
@@ -214,9 +221,24 @@ class ExperienceManager(BaseModel):
         ranker_configs = self._get_ranker_configs()
 
         storage = SimpleEngine.from_objs(retriever_configs=retriever_configs, ranker_configs=ranker_configs)
+        self._backfill_metadata(storage)
 
         return storage
 
+    def _backfill_metadata(self, storage: "SimpleEngine"):
+        """Experiences persisted before metadata prefiltering lack the filterable fields, add them from `obj_json`."""
+
+        num_updated = storage.retriever.backfill_metadata(self._get_missing_metadata)
+        if num_updated:
+            logger.info(f"Backfilled the filterable metadata of {num_updated} experiences.")
+
+    @staticmethod
+    def _get_missing_metadata(metadata: dict) -> dict:
+        if not metadata.get("is_obj", False) or "req_hash" in metadata:
+            return {}
+
+        return Experience(**json.loads(metadata["obj_json"])).rag_metadata()
+
     def _get_ranker_configs(self):
         """Returns ranker configurations based on the configuration.
 
@@ -1,4 +1,5 @@
 """Experience schema."""
+import hashlib
 import time
 from enum import Enum
 from typing import Optional
@@ -74,3 +75,11 @@ class Experience(BaseModel):
 
     def rag_key(self):
         return self.req
+
+    def rag_metadata(self) -> dict:
+        """Filterable fields, used to prefilter retrieval by tag and to look up exact queries by req hash."""
+        return {"tag": self.tag, "req_hash": self.req_hash(self.req)}
+
+    @staticmethod
+    def req_hash(req: str) -> str:
+        return hashlib.md5(req.encode("utf-8")).hexdigest()
@@ -3,15 +3,21 @@ import json
 import os
 from abc import ABC, abstractmethod
 from datetime import datetime
-from pathlib import Path
-from typing import Any, Callable, List, Tuple
+from typing import Any, Callable, List, Optional, Tuple
 
 import aiofiles
-import pandas as pd
 from tqdm.asyncio import tqdm_asyncio
 
+from metagpt.ext.aflow.benchmark.cache import EvaluationCacheScope
+from metagpt.ext.aflow.benchmark.log_writer import (
+    LOG_FILENAME,
+    AsyncLineWriter,
+    append_lines,
+    open_line_writer,
+    to_csv_row,
+    to_jsonl,
+)
 from metagpt.logs import logger
-from metagpt.utils.common import write_json_file
 
 
 class BaseBenchmark(ABC):
@@ -19,6 +25,7 @@ class BaseBenchmark(ABC):
         self.name = name
         self.file_path = file_path
         self.log_path = log_path
+        self._log_writer: Optional[AsyncLineWriter] = None  # opened by `run_evaluation`
 
     PASS = "PASS"
     FAIL = "FAIL"
@@ -34,14 +41,15 @@ class BaseBenchmark(ABC):
         return data
 
     def save_results_to_csv(self, results: List[Tuple[Any, ...]], columns: List[str]):
-        df = pd.DataFrame(results, columns=columns)
-        avg_score = df["score"].mean()
-        t_cost = df["cost"].max()
-        a_cost = t_cost / len(df) if len(df) > 0 else 0
-        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+        """Summarizes the results, and writes them in the order of the problems to a csv named by the average score."""
+        scores = [row[columns.index("score")] for row in results]
+        avg_score = sum(scores) / len(scores) if scores else float("nan")
+        t_cost = max((row[columns.index("cost")] for row in results), default=float("nan"))
+        a_cost = t_cost / len(results) if len(results) > 0 else 0
+        current_time = datetime.now().strftime("%Y%m%d_%H%M%S_%f")  # concurrent evaluations end in the same second
         filename = f"{avg_score:.5f}_{current_time}.csv"
         output_file = os.path.join(self.log_path, filename)
-        df.to_csv(output_file, index=False)
+        append_lines(output_file, [to_csv_row(columns)] + [to_csv_row(row) for row in results])
         logger.info(f"Results saved to {output_file}")
         return avg_score, a_cost, t_cost
 
@@ -60,17 +68,10 @@ class BaseBenchmark(ABC):
             "extracted_output": extracted_output,
             "extract_answer_code": extract_answer_code,
         }
-        log_file = Path(self.log_path) / "log.json"
-        if log_file.exists():
-            with log_file.open("r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
+        if self._log_writer:
+            self._log_writer.write(log_data)
         else:
-            data = []
-        data.append(log_data)
-        write_json_file(log_file, data, encoding="utf-8", indent=4)
+            append_lines(os.path.join(self.log_path, LOG_FILENAME), [to_jsonl(log_data)])
 
     @abstractmethod
     async def evaluate_problem(self, problem: dict, graph: Callable) -> Tuple[Any, ...]:
@@ -84,21 +85,65 @@ class BaseBenchmark(ABC):
     def get_result_columns(self) -> List[str]:
         pass
 
-    async def evaluate_all_problems(self, data: List[dict], graph: Callable, max_concurrent_tasks: int = 50):
-        semaphore = asyncio.Semaphore(max_concurrent_tasks)
+    async def evaluate_all_problems(
+        self,
+        data: List[dict],
+        graph: Callable,
+        max_concurrent_tasks: int = 50,
+        semaphore: asyncio.Semaphore = None,
+        cache: Optional[EvaluationCacheScope] = None,
+        results_writer: Optional[AsyncLineWriter] = None,
+    ):
+        # a semaphore shared by concurrent evaluations caps the problems evaluated by all of them
+        semaphore = semaphore or asyncio.Semaphore(max_concurrent_tasks)
+        columns = self.get_result_columns()
 
         async def sem_evaluate(problem):
-            async with semaphore:
-                return await self.evaluate_problem(problem, graph)
+            result = cache.get(problem, columns) if cache else None
+            if result is None:
+                async with semaphore:
+                    result = await self.evaluate_problem(problem, graph)
+                if cache:
+                    cache.put(problem, result, columns)
+            if results_writer:
+                results_writer.write(result)
+            return result
 
-        tasks = [sem_evaluate(problem) for problem in data]
-        return await tqdm_asyncio.gather(*tasks, desc=f"Evaluating {self.name} problems", total=len(data))
+        tasks = [asyncio.create_task(sem_evaluate(problem)) for problem in data]
+        try:
+            return await tqdm_asyncio.gather(*tasks, desc=f"Evaluating {self.name} problems", total=len(data))
+        finally:
+            # a failed problem does not stop the others, which would keep writing after the writer is closed
+            for task in tasks:
+                task.cancel()
 
-    async def run_evaluation(self, graph: Callable, va_list: List[int], max_concurrent_tasks: int = 50):
+    async def run_evaluation(
+        self,
+        graph: Callable,
+        va_list: List[int],
+        max_concurrent_tasks: int = 50,
+        semaphore: asyncio.Semaphore = None,
+        cache: Optional[EvaluationCacheScope] = None,
+    ):
         data = await self.load_data(va_list)
-        results = await self.evaluate_all_problems(data, graph, max_concurrent_tasks)
         columns = self.get_result_columns()
-        average_score, average_cost, total_cost = self.save_results_to_csv(results, columns)
+        # the rows are streamed to a partial file as the problems complete, to show the progress of the evaluation,
+        # and the csv is written in the order of the problems at last, so that the csv files of the runs compare
+        csv_path = os.path.join(self.log_path, f".{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.csv.part")
+        try:
+            async with open_line_writer(os.path.join(self.log_path, LOG_FILENAME)) as self._log_writer:
+                async with open_line_writer(csv_path, to_csv_row) as results_writer:
+                    results_writer.write(columns)
+                    results = await self.evaluate_all_problems(
+                        data, graph, max_concurrent_tasks, semaphore, cache, results_writer
+                    )
+        finally:
+            self._log_writer = None
+            if os.path.exists(csv_path):
+                os.remove(csv_path)
+        if cache and cache.hits:
+            logger.info(f"Replayed {cache.hits}/{len(data)} cached results on {self.name} dataset")
+        average_score, average_cost, total_cost = await asyncio.to_thread(self.save_results_to_csv, results, columns)
         logger.info(f"Average score on {self.name} dataset: {average_score:.5f}")
         logger.info(f"Total Cost: {total_cost:.5f}")
         return average_score, average_cost, total_cost
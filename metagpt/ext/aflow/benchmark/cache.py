@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# @Desc    : cache of the evaluated problems, keyed by the workflow, the problem and the execute llm
+
+import hashlib
+import json
+import os
+from typing import Any, List, Optional, Tuple
+
+from metagpt.ext.common.llm_cache import SQLiteCache, hash_llm_config, hash_text
+from metagpt.logs import logger
+
+CACHE_FILENAME = "eval_cache.db"
+WORKFLOW_FILES = ["graph.py", "prompt.py"]
+
+
+def hash_workflow(workflow_path: str) -> Optional[str]:
+    """Hashes the `graph.py` and the `prompt.py` of a round, None if there is no `graph.py`."""
+    if not os.path.exists(os.path.join(workflow_path, "graph.py")):
+        return None
+    md5 = hashlib.md5()
+    for filename in WORKFLOW_FILES:
+        file_path = os.path.join(workflow_path, filename)
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as f:
+                md5.update(f.read())
+        md5.update(b"\0")
+    return md5.hexdigest()
+
+
+def hash_problem(problem: dict) -> str:
+    return hash_text(json.dumps(problem, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class EvaluationCache:
+    """
+    The results of `BaseBenchmark.evaluate_problem`, stored in SQLite by (workflow hash, problem hash, execute llm
+    hash, sample index).
+
+    The sample index tells apart the repeated evaluations of a workflow, e.g. the i-th validation round replays the
+    i-th stored sample, so that the repetitions stay independent samples while re-evaluating a workflow is replayed.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._store = SQLiteCache(cache_path, table="results", value_column="result")
+
+    def scope(
+        self, workflow_path: str, llm_config: Any, sample_index: int = 0, resample: bool = False
+    ) -> Optional["EvaluationCacheScope"]:
+        """The cache of an evaluation of the workflow of `workflow_path`, None if the workflow can not be hashed."""
+        workflow_hash = hash_workflow(workflow_path)
+        if workflow_hash is None:
+            return None
+        prefix = f"{workflow_hash}:{hash_llm_config(llm_config)}:{sample_index}"
+        return EvaluationCacheScope(self, prefix, resample)
+
+    def get(self, key: str) -> Optional[list]:
+        result = self._store.get(key)
+        return json.loads(result) if result is not None else None
+
+    def put(self, key: str, result: list):
+        try:
+            result = json.dumps(result, ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Failed to cache the evaluation result: {e}")
+            return
+        self._store.put(key, result)
+
+    def close(self):
+        self._store.close()
+
+
+class EvaluationCacheScope:
+    def __init__(self, cache: EvaluationCache, prefix: str, resample: bool = False):
+        self.cache = cache
+        self.prefix = prefix
+        self.resample = resample  # evaluate the problems again and overwrite the stored results
+        self.hits = 0
+
+    def get(self, problem: dict, columns: List[str]) -> Optional[Tuple[Any, ...]]:
+        """Returns the stored result of the problem, whose cost is 0 as no llm is called."""
+        if self.resample:
+            return None
+        result = self.cache.get(f"{self.prefix}:{hash_problem(problem)}")
+        if result is None:
+            return None
+        self.hits += 1
+        if "cost" in columns:
+            result[columns.index("cost")] = 0.0
+        return tuple(result)
+
+    def put(self, problem: dict, result: Tuple[Any, ...], columns: List[str]):
+        # the failed problems cost nothing, and are evaluated again next time
+        if "cost" in columns and not result[columns.index("cost")]:
+            return
+        self.cache.put(f"{self.prefix}:{hash_problem(problem)}", list(result))
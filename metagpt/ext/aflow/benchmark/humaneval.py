@@ -1,11 +1,15 @@
 import asyncio
-import threading
 import time
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Callable, List, Tuple
 
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
 from metagpt.ext.aflow.benchmark.benchmark import BaseBenchmark
+from metagpt.ext.aflow.scripts.sandbox import (
+    SandboxTimeoutError,
+    get_sandbox,
+    run_check,
+)
 from metagpt.logs import logger
 from metagpt.utils.sanitize import sanitize
 
@@ -14,48 +18,9 @@ class HumanEvalBenchmark(BaseBenchmark):
     def __init__(self, name: str, file_path: str, log_path: str):
         super().__init__(name, file_path, log_path)
 
-    class TimeoutError(Exception):
-        pass
-
-    def run_with_timeout(self, func, args, timeout):
-        result = []
-        stop_event = threading.Event()
-
-        def target():
-            try:
-                result.append(func(*args))
-            except Exception as e:
-                result.append(e)
-            finally:
-                stop_event.set()
-
-        thread = threading.Thread(target=target)
-        thread.start()
-        is_timeout = not stop_event.wait(timeout)
-
-        if is_timeout:
-            raise self.TimeoutError("Function execution timed out")
-
-        if not result:
-            return None
-        if isinstance(result[0], Exception):
-            raise result[0]
-        return result[0]
-
-    def check_solution(self, solution, test, entry_point):
+    async def check_solution(self, solution, test, entry_point):
         solution = sanitize(code=solution, entrypoint=entry_point)
         try:
-            global_dict = {
-                "math": __import__("math"),
-                "hashlib": __import__("hashlib"),
-                "re": __import__("re"),
-                "List": List,
-                "Dict": Dict,
-                "Tuple": Tuple,
-                "Optional": Optional,
-                "Any": Any,
-            }
-
             # Add handling for special cases
             if entry_point == "decode_cyclic":
                 solution = (
@@ -74,21 +39,12 @@ class HumanEvalBenchmark(BaseBenchmark):
                     + solution
                 )
 
-            exec(solution, global_dict)
-
-            if entry_point not in global_dict:
-                raise ValueError(f"Function {entry_point} is not defined in the solution.")
-
-            exec(test, global_dict)
-
-            check = global_dict["check"]
-
-            result = self.run_with_timeout(check, (global_dict[entry_point],), 15)
+            result = await get_sandbox().run(run_check, solution, test, entry_point, timeout=15)
 
             if result is None:
                 result = (self.PASS, "The solution passed all test cases.")
 
-        except self.TimeoutError:
+        except SandboxTimeoutError:
             result = (
                 self.FAIL,
                 "Execution timed out. Please check if your solution contains infinite loops or overly time-consuming operations.",
@@ -122,7 +78,7 @@ class HumanEvalBenchmark(BaseBenchmark):
             prediction, cost = await self._generate_output(graph, input_text, data["entry_point"])
 
             # Check the solution
-            ret = self.check_solution(prediction, data["test"], data["entry_point"])
+            ret = await self.check_solution(prediction, data["test"], data["entry_point"])
             test_case_details = ret[1]
             expected_output = test_case_details + expected_output
 
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# @Desc    : append-only writers of the mismatch logs and the result rows of the aflow benchmarks
+
+import asyncio
+import csv
+import io
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from metagpt.logs import logger
+
+LOG_FILENAME = "log.jsonl"
+LEGACY_LOG_FILENAME = "log.json"  # a json list, rewritten on every record by the previous versions
+
+
+def to_jsonl(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+def to_csv_row(row: Any) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(row)
+    return buffer.getvalue()
+
+
+def append_lines(path: str, lines: List[str]):
+    """Appends the lines with a single write, so that the lines of the writers of the same file do not interleave."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+class AsyncLineWriter:
+    """
+    Appends lines to a file from a single background task. `write` only queues the record, and the task appends the
+    queued records in batches of up to `batch_size` lines in a thread, so the event loop is not blocked by the file.
+    """
+
+    def __init__(self, path: str, to_line: Callable[[Any], str] = to_jsonl, batch_size: int = 100):
+        self.path = path
+        self.to_line = to_line
+        self.batch_size = batch_size
+        self.refs = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def write(self, record: Any):
+        if self._task is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait(self.to_line(record))
+
+    async def close(self):
+        """Flushes the queued records and stops the task."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        stopped = False
+        while not stopped:
+            lines = [await self._queue.get()]
+            while len(lines) < self.batch_size and not self._queue.empty():
+                lines.append(self._queue.get_nowait())
+            if lines[-1] is None:
+                stopped = True
+                lines.pop()
+            if not lines:
+                continue
+            try:
+                await asyncio.to_thread(append_lines, self.path, lines)
+            except OSError as exp:
+                logger.error(f"Failed to write {len(lines)} lines to {self.path}: {exp}")
+
+
+_writers: Dict[str, AsyncLineWriter] = {}
+
+
+@asynccontextmanager
+async def open_line_writer(path: str, to_line: Callable[[Any], str] = to_jsonl):
+    """
+    Opens the writer of `path`, which is shared by the concurrent users of the same file, e.g. the evaluations of the
+    same round, and closed when the last of them exits.
+    """
+    key = os.path.abspath(path)
+    writer = _writers.get(key)
+    if writer is None:
+        writer = _writers[key] = AsyncLineWriter(path, to_line)
+    writer.refs += 1
+    try:
+        yield writer
+    finally:
+        writer.refs -= 1
+        if writer.refs == 0:
+            _writers.pop(key, None)
+            await writer.close()
+
+
+def read_log(log_path: str) -> List[dict]:
+    """
+    Reads the mismatch records under the directory `log_path`, or next to the log file `log_path`, from both the
+    legacy `log.json` and `log.jsonl`.
+    """
+    log_dir = log_path if os.path.isdir(log_path) else os.path.dirname(log_path)
+    data = []
+    legacy_path = os.path.join(log_dir, LEGACY_LOG_FILENAME)
+    if os.path.exists(legacy_path):
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            try:
+                legacy_data = json.load(f)
+            except json.JSONDecodeError:
+                legacy_data = []
+        data.extend(legacy_data if isinstance(legacy_data, list) else [legacy_data])
+
+    jsonl_path = os.path.join(log_dir, LOG_FILENAME)
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    data.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass  # e.g. the last line of a crashed run
+    return data
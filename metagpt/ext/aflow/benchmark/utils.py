@@ -11,7 +11,7 @@ import os
 
 import numpy as np
 
-from metagpt.utils.common import read_json_file, write_json_file
+from metagpt.ext.aflow.benchmark.log_writer import LOG_FILENAME, append_lines, to_jsonl
 
 
 def generate_random_indices(n, n_samples, test=False):
@@ -50,18 +50,4 @@ def log_mismatch(problem, expected_output, prediction, predicted_number, path):
         "extracted_output": predicted_number,
     }
 
-    log_file = os.path.join(path, "log.json")
-
-    # Check if the log file already exists
-    if os.path.exists(log_file):
-        # If it exists, load the existing log data
-        data = read_json_file(log_file)
-    else:
-        # If it does not exist, create a new log list
-        data = []
-
-    # Add the new log entry
-    data.append(log_data)
-
-    # Write the data back to log.json file
-    write_json_file(log_file, data, encoding="utf-8", indent=4)
+    append_lines(os.path.join(path, LOG_FILENAME), [to_jsonl(log_data)])
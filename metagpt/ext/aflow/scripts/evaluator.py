@@ -3,9 +3,11 @@
 # @Author  : all
 # @Desc    : Evaluation for different datasets
 
-from typing import Dict, Literal, Tuple
+import asyncio
+from typing import Dict, Literal, Optional, Tuple
 
 from metagpt.ext.aflow.benchmark.benchmark import BaseBenchmark
+from metagpt.ext.aflow.benchmark.cache import EvaluationCache
 from metagpt.ext.aflow.benchmark.drop import DROPBenchmark
 from metagpt.ext.aflow.benchmark.gsm8k import GSM8KBenchmark
 from metagpt.ext.aflow.benchmark.hotpotqa import HotpotQABenchmark
@@ -34,8 +36,24 @@ class Evaluator:
         }
 
     async def graph_evaluate(
-        self, dataset: DatasetType, graph, params: dict, path: str, is_test: bool = False
+        self,
+        dataset: DatasetType,
+        graph,
+        params: dict,
+        path: str,
+        is_test: bool = False,
+        semaphore: asyncio.Semaphore = None,
+        cache: Optional[EvaluationCache] = None,
+        sample_index: int = 0,
+        resample: bool = False,
     ) -> Tuple[float, float, float]:
+        """
+        Args:
+            cache: Replays the results of the problems already evaluated with the same `graph.py` and `prompt.py`
+                under `path` and the same execute llm.
+            sample_index: Which sample of the repeated evaluations of the graph this is, each has its own results.
+            resample: Evaluates the problems again instead of replaying the cached results, which are overwritten.
+        """
         if dataset not in self.dataset_configs:
             raise ValueError(f"Unsupported dataset: {dataset}")
 
@@ -49,7 +67,8 @@ class Evaluator:
             va_list = None  # For test data, generally use None to test all
         else:
             va_list = None  # Use None to test all Validation data, or set va_list (e.g., [1, 2, 3]) to use partial data
-        return await benchmark.run_evaluation(configured_graph, va_list)
+        cache_scope = cache.scope(path, params.get("llm_config", {}), sample_index, resample) if cache else None
+        return await benchmark.run_evaluation(configured_graph, va_list, semaphore=semaphore, cache=cache_scope)
 
     async def _configure_graph(self, dataset, graph, params: dict):
         # Here you can configure the graph based on params
@@ -4,12 +4,12 @@
 # @Desc    : optimizer for graph
 
 import asyncio
-import time
 from typing import List, Literal
 
 from pydantic import BaseModel, Field
 
 from metagpt.actions.action_node import ActionNode
+from metagpt.ext.aflow.benchmark.cache import CACHE_FILENAME, EvaluationCache
 from metagpt.ext.aflow.scripts.evaluator import DatasetType
 from metagpt.ext.aflow.scripts.optimizer_utils.convergence_utils import ConvergenceUtils
 from metagpt.ext.aflow.scripts.optimizer_utils.data_utils import DataUtils
@@ -43,7 +43,23 @@ class Optimizer:
         initial_round: int = 1,
         max_rounds: int = 20,
         validation_rounds: int = 5,
+        parallel_validation: bool = False,
+        candidates_per_round: int = 1,
+        max_concurrent_tasks: int = 50,
+        use_eval_cache: bool = True,
+        resample: bool = False,
     ) -> None:
+        """
+        Args:
+            parallel_validation: Run the `validation_rounds` evaluations of a graph concurrently.
+            candidates_per_round: The number of candidate graphs generated and evaluated concurrently in each
+                optimization round, each of them is saved as a round of its own.
+            max_concurrent_tasks: The cap of the problems evaluated concurrently by all the evaluations.
+            use_eval_cache: Replay the results of the problems already evaluated with the same workflow and execute
+                llm, from `{optimized_path}/{dataset}/eval_cache.db`. The i-th of the repeated evaluations of a
+                workflow replays its i-th results, so the validation rounds stay independent samples.
+            resample: Evaluate the problems again instead of replaying the cached results, which are overwritten.
+        """
         self.optimize_llm_config = opt_llm_config
         self.optimize_llm = create_llm_instance(self.optimize_llm_config)
         self.execute_llm_config = exec_llm_config
@@ -61,6 +77,12 @@ class Optimizer:
         self.round = initial_round
         self.max_rounds = max_rounds
         self.validation_rounds = validation_rounds
+        self.parallel_validation = parallel_validation
+        self.candidates_per_round = candidates_per_round
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.semaphore = None  # shared by the evaluations, created in the event loop of `optimize`
+        self.eval_cache = EvaluationCache(f"{self.root_path}/{CACHE_FILENAME}") if use_eval_cache else None
+        self.resample = resample
 
         self.graph_utils = GraphUtils(self.root_path)
         self.data_utils = DataUtils(self.root_path)
@@ -69,24 +91,28 @@ class Optimizer:
         self.convergence_utils = ConvergenceUtils(self.root_path)
 
     def optimize(self, mode: OptimizerType = "Graph"):
+        # all the rounds run in a single event loop
         if mode == "Test":
             test_n = 3  # validation datasets's execution number
-            for i in range(test_n):
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                score = loop.run_until_complete(self.test())
+            asyncio.run(self._test_rounds(test_n))
             return None
 
-        for opt_round in range(self.max_rounds):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        asyncio.run(self._optimize_rounds())
+
+    async def _test_rounds(self, test_n: int):
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        for i in range(test_n):
+            await self.test()
 
+    async def _optimize_rounds(self):
+        self.semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        for opt_round in range(self.max_rounds):
             retry_count = 0
             max_retries = 1
 
             while retry_count < max_retries:
                 try:
-                    score = loop.run_until_complete(self._optimize_graph())
+                    score = await self._optimize_graph()
                     break
                 except Exception as e:
                     retry_count += 1
@@ -96,13 +122,9 @@ class Optimizer:
                         score = None
 
                     wait_time = 5 * retry_count
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
 
-                if retry_count < max_retries:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-
-            self.round += 1
+            self.round += self.candidates_per_round
             logger.info(f"Score for round {self.round}: {score}")
 
             converged, convergence_round, final_round = self.convergence_utils.check_convergence(top_k=3)
@@ -115,8 +137,6 @@ class Optimizer:
                 self.convergence_utils.print_results()
                 break
 
-            time.sleep(5)
-
     async def _optimize_graph(self):
         validation_n = self.validation_rounds  # validation datasets's execution number
         graph_path = f"{self.root_path}/workflows"
@@ -128,9 +148,27 @@ class Optimizer:
             self.graph = self.graph_utils.load_graph(self.round, graph_path)
             avg_score = await self.evaluation_utils.evaluate_graph(self, directory, validation_n, data, initial=True)
 
+        # Generate and evaluate the candidates of the round concurrently, each of them as a round of its own
+        rounds = range(self.round + 1, self.round + 1 + self.candidates_per_round)
+        accepted_modifications = set()
+        results = await asyncio.gather(
+            *[self._optimize_candidate(i, graph_path, data, validation_n, accepted_modifications) for i in rounds],
+            return_exceptions=True,
+        )
+        errors = [i for i in results if isinstance(i, Exception)]
+        for error in errors:
+            logger.info(f"Error occurred in a candidate of the round: {error}")
+        scores = [i for i in results if not isinstance(i, Exception)]
+        if not scores:
+            raise errors[0]
+        return max(scores)
+
+    async def _optimize_candidate(
+        self, round_number: int, graph_path: str, data: list, validation_n: int, accepted_modifications: set
+    ):
         # Create a loop until the generated graph meets the check conditions
         while True:
-            directory = self.graph_utils.create_round_directory(graph_path, self.round + 1)
+            directory = self.graph_utils.create_round_directory(graph_path, round_number)
 
             top_rounds = self.data_utils.get_top_rounds(self.sample)
             sample = self.data_utils.select_round(top_rounds)
@@ -154,25 +192,31 @@ class Optimizer:
 
             response = await self.graph_utils.get_graph_optimize_response(graph_optimize_node)
 
-            # Check if the modification meets the conditions
+            # Check if the modification meets the conditions, and is not a modification of another candidate
             check = self.experience_utils.check_modification(
                 processed_experience, response["modification"], sample["round"]
             )
+            check = check and (sample["round"], response["modification"]) not in accepted_modifications
 
             # If `check` is True, break the loop; otherwise, regenerate the graph
             if check:
+                accepted_modifications.add((sample["round"], response["modification"]))
                 break
 
         # Save the graph and evaluate
-        self.graph_utils.write_graph_files(directory, response, self.round + 1, self.dataset)
+        self.graph_utils.write_graph_files(directory, response, round_number, self.dataset)
 
         experience = self.experience_utils.create_experience_data(sample, response["modification"])
 
-        self.graph = self.graph_utils.load_graph(self.round + 1, graph_path)
+        graph = self.graph_utils.load_graph(round_number, graph_path)
+        if self.candidates_per_round == 1:
+            self.graph = graph
 
         logger.info(directory)
 
-        avg_score = await self.evaluation_utils.evaluate_graph(self, directory, validation_n, data, initial=False)
+        avg_score = await self.evaluation_utils.evaluate_graph(
+            self, directory, validation_n, data, graph=graph, cur_round=round_number
+        )
 
         self.experience_utils.update_experience(directory, experience, avg_score)
 
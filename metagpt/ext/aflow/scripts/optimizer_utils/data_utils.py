@@ -6,6 +6,7 @@ import random
 import numpy as np
 import pandas as pd
 
+from metagpt.ext.aflow.benchmark.log_writer import read_log
 from metagpt.logs import logger
 from metagpt.utils.common import read_json_file, write_json_file
 
@@ -90,20 +91,15 @@ class DataUtils:
 
     def load_log(self, cur_round, path=None, mode: str = "Graph"):
         if mode == "Graph":
-            log_dir = os.path.join(self.root_path, "workflows", f"round_{cur_round}", "log.json")
+            log_dir = os.path.join(self.root_path, "workflows", f"round_{cur_round}")
         else:
-            log_dir = path
+            log_dir = path if os.path.isdir(path) else os.path.dirname(path)  # the log file or its directory
 
         # 检查文件是否存在
         if not os.path.exists(log_dir):
             return ""  # 如果文件不存在，返回空字符串
         logger.info(log_dir)
-        data = read_json_file(log_dir, encoding="utf-8")
-
-        if isinstance(data, dict):
-            data = [data]
-        elif not isinstance(data, list):
-            data = list(data)
+        data = read_log(log_dir)
 
         if not data:
             return ""
@@ -1,3 +1,5 @@
+import asyncio
+
 from metagpt.ext.aflow.scripts.evaluator import Evaluator
 
 
@@ -17,6 +19,9 @@ class EvaluationUtils:
                 {"dataset": optimizer.dataset, "llm_config": optimizer.execute_llm_config},
                 directory,
                 is_test=False,
+                cache=optimizer.eval_cache,
+                sample_index=i,
+                resample=optimizer.resample,
             )
 
             new_data = optimizer.data_utils.create_result_data(optimizer.round, score, avg_cost, total_cost)
@@ -27,25 +32,41 @@ class EvaluationUtils:
 
         return data
 
-    async def evaluate_graph(self, optimizer, directory, validation_n, data, initial=False):
+    async def evaluate_graph(self, optimizer, directory, validation_n, data, initial=False, graph=None, cur_round=None):
+        """
+        Evaluates the graph `validation_n` times, concurrently if `optimizer.parallel_validation`, and returns the
+        average score. `graph` and `cur_round` default to the graph and the round of the optimizer.
+        """
         evaluator = Evaluator(eval_path=directory)
-        sum_score = 0
+        graph = graph or optimizer.graph
+        if cur_round is None:
+            cur_round = optimizer.round + 1 if initial is False else optimizer.round
+        result_path = optimizer.data_utils.get_results_file_path(f"{optimizer.root_path}/workflows")
 
-        for i in range(validation_n):
-            score, avg_cost, total_cost = await evaluator.graph_evaluate(
+        async def _evaluate(sample_index: int):
+            return await evaluator.graph_evaluate(
                 optimizer.dataset,
-                optimizer.graph,
+                graph,
                 {"dataset": optimizer.dataset, "llm_config": optimizer.execute_llm_config},
                 directory,
                 is_test=False,
+                semaphore=optimizer.semaphore,
+                cache=optimizer.eval_cache,
+                sample_index=sample_index,
+                resample=optimizer.resample,
             )
 
-            cur_round = optimizer.round + 1 if initial is False else optimizer.round
+        if optimizer.parallel_validation:
+            evaluations = asyncio.as_completed([_evaluate(i) for i in range(validation_n)])
+        else:
+            evaluations = (_evaluate(i) for i in range(validation_n))
+
+        sum_score = 0
+        for evaluation in evaluations:
+            score, avg_cost, total_cost = await evaluation
 
             new_data = optimizer.data_utils.create_result_data(cur_round, score, avg_cost, total_cost)
             data.append(new_data)
-
-            result_path = optimizer.data_utils.get_results_file_path(f"{optimizer.root_path}/workflows")
             optimizer.data_utils.save_results(result_path, data)
 
             sum_score += score
@@ -60,4 +81,7 @@ class EvaluationUtils:
             {"dataset": optimizer.dataset, "llm_config": optimizer.execute_llm_config},
             directory,
             is_test=is_test,
+            semaphore=optimizer.semaphore,
+            cache=optimizer.eval_cache,
+            resample=optimizer.resample,
         )
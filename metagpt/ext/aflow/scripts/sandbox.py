@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+# @Desc    : sandboxed process pool which executes the generated code of the aflow operators and benchmarks
+
+import asyncio
+import importlib
+import math
+import multiprocessing
+import os
+import sys
+import traceback
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metagpt.logs import logger
+
+# imported by every worker before it takes tasks, so that the generated code does not pay for them
+PRELOAD_MODULES = ["math", "hashlib", "re", "typing", "numpy"]
+DEFAULT_MEMORY_LIMIT = 2 * 1024**3  # bytes of address space of a worker
+# a single BLAS thread keeps the address space of numpy under the memory limit, its thread pool is sized on import
+BLAS_THREADS_ENV = ["OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"]
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+DISALLOWED_IMPORTS = [
+    "os",
+    "sys",
+    "subprocess",
+    "multiprocessing",
+    "matplotlib",
+    "seaborn",
+    "plotly",
+    "bokeh",
+    "ggplot",
+    "pylab",
+    "tkinter",
+    "PyQt5",
+    "wx",
+    "pyglet",
+]
+
+
+class SandboxError(Exception):
+    """An exception raised by the code executed in the sandbox, or the exit of its worker."""
+
+    def __init__(self, message: str, exc_type: str = "", tb_str: str = ""):
+        super().__init__(message)
+        self.exc_type = exc_type
+        self.tb_str = tb_str
+
+
+class SandboxTimeoutError(SandboxError):
+    pass
+
+
+def get_default_globals() -> dict:
+    """The globals the generated code is executed with."""
+    return {
+        "math": __import__("math"),
+        "hashlib": __import__("hashlib"),
+        "re": __import__("re"),
+        "List": List,
+        "Dict": Dict,
+        "Tuple": Tuple,
+        "Optional": Optional,
+        "Any": Any,
+    }
+
+
+def run_code(code: str) -> Tuple[str, str]:
+    """Executes the code, which defines a `solve` function, and returns the status and the output of `solve()`."""
+    try:
+        # Create a new global namespace
+        global_namespace = {}
+
+        # Check for prohibited imports
+        for lib in DISALLOWED_IMPORTS:
+            if f"import {lib}" in code or f"from {lib}" in code:
+                logger.info(f"Detected prohibited import: {lib}")
+                return "Error", f"Prohibited import: {lib} and graphing functionalities"
+
+        # Use exec to execute the code
+        exec(code, global_namespace)
+        # Assume the code defines a function named 'solve'
+        if "solve" in global_namespace and callable(global_namespace["solve"]):
+            result = global_namespace["solve"]()
+            return "Success", str(result)
+        else:
+            return "Error", "Function 'solve' not found"
+    except Exception as e:
+        exc_type, exc_value, exc_traceback = sys.exc_info()
+        tb_str = traceback.format_exception(exc_type, exc_value, exc_traceback)
+        return "Error", f"Execution error: {str(e)}\n{''.join(tb_str)}"
+
+
+def run_check(solution: str, test: str, entry_point: str, pass_candidate: bool = True) -> Any:
+    """Executes the solution and the test which defines `check`, and calls `check(entry_point)` or `check()`."""
+    global_dict = get_default_globals()
+    exec(solution, global_dict)
+    if entry_point not in global_dict:
+        raise ValueError(f"Function {entry_point} is not defined in the solution.")
+    exec(test, global_dict)
+    check = global_dict["check"]
+    return check(global_dict[entry_point]) if pass_candidate else check()
+
+
+def run_test_code(test_code: str):
+    """Executes a test script, which raises if the test fails."""
+    exec(test_code, get_default_globals())
+
+
+def _limit_memory(memory_limit: int):
+    try:
+        import resource
+    except ImportError:  # e.g. Windows
+        return
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _limit_cpu_time(timeout: float):
+    """Limits the CPU time of the task, the worker is killed by SIGXCPU if it keeps running after the timeout."""
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime + math.ceil(timeout)) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _unshare_network() -> bool:
+    """
+    Moves the worker into new user and network namespaces, which only have a loopback interface that is down, so the
+    worker can not reach any host whatever the code does. Returns False where it is not possible, e.g. not Linux, or
+    unprivileged user namespaces are disabled. Must be called before the worker starts any thread.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    uid, gid = os.getuid(), os.getgid()
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.unshare(CLONE_NEWUSER | CLONE_NEWNET) != 0:
+            return False
+    except (OSError, AttributeError):
+        return False
+    # keep the ids of the worker in the new user namespace, so that it accesses the files as before
+    for name, content in [("uid_map", f"{uid} {uid} 1"), ("setgroups", "deny"), ("gid_map", f"{gid} {gid} 1")]:
+        try:
+            with open(f"/proc/self/{name}", "w") as f:
+                f.write(content)
+        except OSError:
+            pass
+    return True
+
+
+def _disable_network():
+    """
+    Disables the network access of the worker. It is enforced by the OS if the worker can be moved into a new network
+    namespace, see `_unshare_network`. Otherwise the `socket` module is patched, which is only best-effort: code that
+    uses the `_socket` extension module or a subprocess directly still reaches the network.
+    """
+    if _unshare_network():
+        return
+    logger.warning("Network namespaces are not available, the sandbox disables the network by patching `socket`")
+    import socket
+
+    def _blocked(*args, **kwargs):
+        raise PermissionError("Network access is disabled in the sandbox")
+
+    for name in ["connect", "connect_ex", "bind", "sendto"]:
+        setattr(socket.socket, name, _blocked)
+    socket.create_connection = _blocked
+    socket.getaddrinfo = _blocked
+
+
+@contextmanager
+def _single_blas_thread():
+    """
+    Sets BLAS_THREADS_ENV for the processes started in the context, i.e. the forkserver which preloads numpy, or the
+    spawned workers, and restores the environment of the current process afterwards.
+    """
+    prev_env = {name: os.environ.get(name) for name in BLAS_THREADS_ENV}
+    for name in BLAS_THREADS_ENV:
+        os.environ.setdefault(name, "1")
+    try:
+        yield
+    finally:
+        for name, value in prev_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+
+
+def _worker_main(conn, memory_limit: int):
+    _disable_network()  # before any thread is started, which the new namespaces require
+    _limit_memory(memory_limit)
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    while True:
+        try:
+            func, args, timeout = conn.recv()
+        except (EOFError, OSError):
+            return
+        _limit_cpu_time(timeout)
+        try:
+            result = ("ok", func(*args))
+        except BaseException as exp:
+            result = ("error", (str(exp), type(exp).__name__, "".join(traceback.format_exception(*sys.exc_info()))))
+        try:
+            conn.send(result)
+        except Exception as exp:
+            conn.send(("error", (f"Unpicklable result: {exp}", type(exp).__name__, "")))
+
+
+class _SandboxWorker:
+    def __init__(self, ctx, memory_limit: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    async def call(self, func: Callable, args: tuple, timeout: float):
+        self.conn.send((func, args, timeout))
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = self.conn.fileno()
+        try:
+            loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        except NotImplementedError:  # e.g. the proactor event loop of Windows
+            return await asyncio.to_thread(self.conn.recv)
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+        return self.conn.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    A pool of long-lived worker processes which execute untrusted code, shared by the operators and the benchmarks.
+
+    The workers are forked from a server process which has imported PRELOAD_MODULES, and each of them runs with a
+    limit of address space and CPU time and without network access, see `_disable_network`. A worker which times out
+    or dies is killed and replaced, the others are reused.
+    """
+
+    def __init__(self, max_workers: int = None, memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.memory_limit = memory_limit
+        self._ctx = None
+        self._idle: list[_SandboxWorker] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        """Forks the workers, which are otherwise forked on the first `run`."""
+        if self._ctx is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._ctx = multiprocessing.get_context("forkserver")
+                self._ctx.set_forkserver_preload(PRELOAD_MODULES + [__name__])
+            else:
+                self._ctx = multiprocessing.get_context("spawn")
+            self._idle = [self._start_worker() for _ in range(self.max_workers)]
+
+    async def run(self, func: Callable, *args, timeout: float = 30) -> Any:
+        """
+        Runs `func(*args)` in a worker, `func` and `args` must be picklable.
+
+        Raises:
+            SandboxTimeoutError: `func` did not return in `timeout` seconds.
+            SandboxError: `func` raised, or the worker died, e.g. by the memory limit.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # the semaphore is bound to the event loop, e.g. a new one of `asyncio.run`
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        async with self._semaphore:
+            worker = self._idle.pop() if self._idle else self._start_worker()
+            try:
+                status, result = await asyncio.wait_for(worker.call(func, args, timeout), timeout)
+            except asyncio.TimeoutError:
+                self._recycle(worker)
+                raise SandboxTimeoutError(f"Code execution timed out after {timeout}s")
+            except (EOFError, OSError) as exp:
+                self._recycle(worker)
+                raise SandboxError(f"Sandbox worker exited, exp: {exp!r}")
+            except BaseException:
+                self._recycle(worker)
+                raise
+            self._idle.append(worker)
+
+        if status == "error":
+            raise SandboxError(*result)
+        return result
+
+    def shutdown(self):
+        for worker in self._idle:
+            worker.kill()
+        self._idle = []
+
+    def _start_worker(self) -> _SandboxWorker:
+        with _single_blas_thread():
+            return _SandboxWorker(self._ctx, self.memory_limit)
+
+    def _recycle(self, worker: _SandboxWorker):
+        try:
+            worker.kill()
+        except Exception as exp:
+            logger.warning(f"kill sandbox worker failed, exp: {exp}")
+        self._idle.append(self._start_worker())
+
+
+_sandbox: Optional[SandboxPool] = None
+
+
+def get_sandbox() -> SandboxPool:
+    global _sandbox
+    if _sandbox is None:
+        _sandbox = SandboxPool()
+    return _sandbox
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# @Desc    : the key-value store and the key hashing shared by the caches of llm outputs, e.g. of aflow and spo
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Optional
+
+from metagpt.logs import logger
+
+# the fields of the llm config which change the outputs, the others such as the api key do not
+LLM_CONFIG_FIELDS = ["api_type", "model", "base_url", "temperature", "top_p", "max_token"]
+
+
+def hash_text(text: str) -> str:
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def hash_llm_config(llm_config: Any) -> str:
+    """Hashes the fields of the llm config, a dict or an `LLMConfig`, which change the outputs."""
+    if isinstance(llm_config, dict):
+        fields = {key: llm_config.get(key) for key in LLM_CONFIG_FIELDS}
+    else:
+        fields = {key: getattr(llm_config, key, None) for key in LLM_CONFIG_FIELDS}
+    return hash_text(json.dumps(fields, sort_keys=True, default=str))
+
+
+class SQLiteCache:
+    """A persistent `key -> text` store in a SQLite table, a failed write is logged instead of raised."""
+
+    def __init__(self, cache_path: str, table: str = "cache", value_column: str = "value"):
+        os.makedirs(os.path.dirname(str(cache_path)) or ".", exist_ok=True)
+        self.cache_path = cache_path
+        self.table = table
+        self.value_column = value_column
+        self._conn = sqlite3.connect(cache_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {value_column} TEXT)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(f"SELECT {self.value_column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str):
+        try:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, {self.value_column}) VALUES (?, ?)", (key, value)
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to cache under {self.cache_path}: {e}")
+
+    def close(self):
+        self._conn.close()
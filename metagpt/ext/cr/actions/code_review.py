@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 # @Desc   :
 
+import asyncio
 import json
 import re
 from pathlib import Path
+from typing import Awaitable, Callable, Optional
 
 import aiofiles
-from unidiff import PatchSet
+from pydantic import Field
+from unidiff import PatchedFile, PatchSet
 
 from metagpt.actions.action import Action
 from metagpt.ext.cr.utils.cleaner import (
@@ -91,6 +94,7 @@ Note: Your output should only be `True` or `False` without any explanations.
 
 class CodeReview(Action):
     name: str = "CodeReview"
+    max_concurrency: int = Field(default=8, description="Maximum number of concurrent LLM calls.")
 
     def format_comments(self, comments: list[dict], points: list[Point], patch: PatchSet):
         new_comments = []
@@ -129,88 +133,124 @@ class CodeReview(Action):
         logger.debug(f"new_comments: {new_comments}")
         return new_comments
 
-    async def confirm_comments(self, patch: PatchSet, comments: list[dict], points: list[Point]) -> list[dict]:
+    async def confirm_comments(
+        self,
+        patch: PatchSet,
+        comments: list[dict],
+        points: list[Point],
+        on_confirmed: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ) -> list[dict]:
+        """Confirms the comments concurrently, keeping the order of `comments`.
+
+        Args:
+            patch: The patch the comments refer to.
+            comments: The formatted comments to confirm.
+            points: The points referenced by the comments.
+            on_confirmed: Optional callback invoked with each confirmed comment, in order, as soon as it and all the
+                comments before it are settled.
+        """
         points_dict = {point.id: point for point in points}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.create_task(self._confirm_comment(patch, cmt, points_dict, semaphore)) for cmt in comments]
         new_comments = []
-        for cmt in comments:
-            try:
-                point = points_dict[cmt.get("point_id")]
+        try:
+            for cmt, task in zip(comments, tasks):
+                if await task:
+                    new_comments.append(cmt)
+                    if on_confirmed:
+                        await on_confirmed(cmt)
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.info(f"original comments num: {len(comments)}, confirmed comments num: {len(new_comments)}")
+        return new_comments
 
-                code_start_line = cmt.get("code_start_line")
-                code_end_line = cmt.get("code_end_line")
-                # 如果代码位置为空的话，那么就将这条记录丢弃掉
-                if not code_start_line or not code_end_line:
-                    logger.info("False")
-                    continue
+    async def _confirm_comment(
+        self, patch: PatchSet, cmt: dict, points_dict: dict[int, Point], semaphore: asyncio.Semaphore
+    ) -> bool:
+        try:
+            point = points_dict[cmt.get("point_id")]
 
-                # 代码增加上下文，提升confirm的准确率
+            code_start_line = cmt.get("code_start_line")
+            code_end_line = cmt.get("code_end_line")
+            # 如果代码位置为空的话，那么就将这条记录丢弃掉
+            if not code_start_line or not code_end_line:
+                logger.info("False")
+                return False
+
+            # 代码增加上下文，提升confirm的准确率
+            code = get_code_block_from_patch(patch, str(max(1, int(code_start_line) - 3)), str(int(code_end_line) + 3))
+            pattern = r"^[ \t\n\r(){}[\];,]*$"
+            if re.match(pattern, code):
                 code = get_code_block_from_patch(
-                    patch, str(max(1, int(code_start_line) - 3)), str(int(code_end_line) + 3)
+                    patch, str(max(1, int(code_start_line) - 5)), str(int(code_end_line) + 5)
                 )
-                pattern = r"^[ \t\n\r(){}[\];,]*$"
-                if re.match(pattern, code):
-                    code = get_code_block_from_patch(
-                        patch, str(max(1, int(code_start_line) - 5)), str(int(code_end_line) + 5)
-                    )
+            code_language = "Java"
+            code_file_ext = cmt.get("commented_file", ".java").split(".")[-1]
+            if code_file_ext == ".java":
                 code_language = "Java"
-                code_file_ext = cmt.get("commented_file", ".java").split(".")[-1]
-                if code_file_ext == ".java":
-                    code_language = "Java"
-                elif code_file_ext == ".py":
-                    code_language = "Python"
-                prompt = CODE_REVIEW_COMFIRM_TEMPLATE.format(
-                    code=code,
-                    comment=cmt.get("comment"),
-                    desc=point.text,
-                    example=point.yes_example + "\n" + point.no_example,
-                )
-                system_prompt = [CODE_REVIEW_COMFIRM_SYSTEM_PROMPT.format(code_language=code_language)]
+            elif code_file_ext == ".py":
+                code_language = "Python"
+            prompt = CODE_REVIEW_COMFIRM_TEMPLATE.format(
+                code=code,
+                comment=cmt.get("comment"),
+                desc=point.text,
+                example=point.yes_example + "\n" + point.no_example,
+            )
+            system_prompt = [CODE_REVIEW_COMFIRM_SYSTEM_PROMPT.format(code_language=code_language)]
+            async with semaphore:
                 resp = await self.llm.aask(prompt, system_msgs=system_prompt)
-                if "True" in resp or "true" in resp:
-                    new_comments.append(cmt)
-            except Exception:
-                logger.info("False")
-        logger.info(f"original comments num: {len(comments)}, confirmed comments num: {len(new_comments)}")
-        return new_comments
+            return "True" in resp or "true" in resp
+        except Exception:
+            logger.info("False")
+            return False
 
     async def cr_by_points(self, patch: PatchSet, points: list[Point]):
-        comments = []
-        valid_patch_count = 0
+        """Reviews every (patched file, group of 3 points) pair concurrently, the comments keep the patch order."""
+        jobs = []
         for patched_file in patch:
             if not patched_file:
                 continue
             if patched_file.path.endswith(".py"):
-                points = [p for p in points if p.language == "Python"]
-                valid_patch_count += 1
+                file_points = [p for p in points if p.language == "Python"]
             elif patched_file.path.endswith(".java"):
-                points = [p for p in points if p.language == "Java"]
-                valid_patch_count += 1
+                file_points = [p for p in points if p.language == "Java"]
             else:
                 continue
-            group_points = [points[i : i + 3] for i in range(0, len(points), 3)]
-            for group_point in group_points:
-                points_str = "id description\n"
-                points_str += "\n".join([f"{p.id} {p.text}" for p in group_point])
-                prompt = CODE_REVIEW_PROMPT_TEMPLATE.format(patch=str(patched_file), points=points_str)
-                resp = await self.llm.aask(prompt)
-                json_str = parse_json_code_block(resp)[0]
-                comments_batch = json.loads(json_str)
-                if comments_batch:
-                    patched_file_path = patched_file.path
-                    for c in comments_batch:
-                        c["commented_file"] = patched_file_path
-                    comments.extend(comments_batch)
-
-        if valid_patch_count == 0:
+            group_points = [file_points[i : i + 3] for i in range(0, len(file_points), 3)]
+            jobs.extend((patched_file, group_point) for group_point in group_points)
+            if not group_points:
+                jobs.append((patched_file, None))
+
+        if not jobs:
             raise ValueError("Only code reviews for Python and Java languages are supported.")
 
-        return comments
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        comments_batches = await asyncio.gather(
+            *[self._cr_by_point_group(patched_file, group_point, semaphore) for patched_file, group_point in jobs]
+        )
+        return [c for comments_batch in comments_batches for c in comments_batch]
+
+    async def _cr_by_point_group(
+        self, patched_file: PatchedFile, group_point: Optional[list[Point]], semaphore: asyncio.Semaphore
+    ) -> list[dict]:
+        if not group_point:
+            return []
+        points_str = "id description\n"
+        points_str += "\n".join([f"{p.id} {p.text}" for p in group_point])
+        prompt = CODE_REVIEW_PROMPT_TEMPLATE.format(patch=str(patched_file), points=points_str)
+        async with semaphore:
+            resp = await self.llm.aask(prompt)
+        json_str = parse_json_code_block(resp)[0]
+        comments_batch = json.loads(json_str) or []
+        for c in comments_batch:
+            c["commented_file"] = patched_file.path
+        return comments_batch
 
     async def run(self, patch: PatchSet, points: list[Point], output_file: str):
         patch: PatchSet = rm_patch_useless_part(patch)
         patch: PatchSet = add_line_num_on_patch(patch)
 
-        result = []
         async with EditorReporter(enable_llm_stream=True) as reporter:
             log_cr_output_path = Path(output_file).with_suffix(".log")
             await reporter.async_report(
@@ -222,21 +262,34 @@ class CodeReview(Action):
                 await f.write(json.dumps(comments, ensure_ascii=False, indent=2))
             await reporter.async_report(log_cr_output_path)
 
-        if len(comments) != 0:
-            comments = self.format_comments(comments, points, patch)
-            comments = await self.confirm_comments(patch=patch, comments=comments, points=points)
-            for comment in comments:
-                if comment["code"]:
-                    if not (comment["code"].isspace()):
-                        result.append(comment)
-
         async with EditorReporter() as reporter:
             src_path = output_file
             cr_output_path = Path(output_file)
             await reporter.async_report(
                 {"type": "CodeReview", "src_path": src_path, "filename": cr_output_path.name}, "meta"
             )
+            # Stream the confirmed comments into a JSON array, so that the output grows while confirming.
             async with aiofiles.open(cr_output_path, "w", encoding="utf-8") as f:
-                await f.write(json.dumps(comments, ensure_ascii=False, indent=2))
+                n_written = 0
+
+                async def _write_comment(comment: dict):
+                    nonlocal n_written
+                    separator = "[\n" if n_written == 0 else ",\n"
+                    await f.write(separator + json.dumps(comment, ensure_ascii=False, indent=2))
+                    await f.flush()
+                    n_written += 1
+
+                if len(comments) != 0:
+                    comments = self.format_comments(comments, points, patch)
+                    comments = await self.confirm_comments(
+                        patch=patch, comments=comments, points=points, on_confirmed=_write_comment
+                    )
+                await f.write("\n]" if n_written else "[]")
             await reporter.async_report(cr_output_path)
+
+        result = []
+        for comment in comments:
+            if comment["code"]:
+                if not (comment["code"].isspace()):
+                    result.append(comment)
         return result
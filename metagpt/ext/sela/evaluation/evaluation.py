@@ -1,6 +1,9 @@
+import functools
+import os
 from pathlib import Path
 
 import numpy as np
+import pandas as pd
 from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, roc_auc_score
 
 
@@ -26,9 +29,21 @@ def evaluate_score(pred, gt, metric):
         raise ValueError(f"Metric {metric} not supported")
 
 
+@functools.lru_cache(maxsize=32)
+def _load_target(gt_path, mtime):
+    target = pd.read_csv(gt_path)["target"].to_numpy()
+    target.setflags(write=False)  # shared by all the evaluations of the split
+    return target
+
+
+def load_target(gt_path):
+    """The `target` column of a ground truth csv, cached in memory until the file changes"""
+    return _load_target(os.path.abspath(gt_path), os.path.getmtime(gt_path))
+
+
 def node_evaluate_score_sela(node):
     preds = node.get_and_move_predictions("test")["target"]
-    gt = node.get_gt("test")["target"]
+    gt = load_target(node.state["datasets_dir"]["test_target"])
     metric = node.state["dataset_config"]["metric"]
     return evaluate_score(preds, gt, metric)
 
@@ -8,6 +8,7 @@ from pydantic import model_validator
 
 from metagpt.actions.di.write_analysis_code import WriteAnalysisCode
 from metagpt.const import SERDESER_PATH
+from metagpt.ext.sela.kernel_snapshot import save_kernel_snapshot
 from metagpt.ext.sela.utils import mcts_logger, save_notebook
 from metagpt.roles.di.data_interpreter import DataInterpreter
 from metagpt.schema import Message, Task, TaskResult
@@ -66,6 +67,7 @@ class Experimenter(DataInterpreter):
     state_saved: bool = False
     role_dir: str = SERDESER_PATH.joinpath("team", "environment", "roles", "Experimenter")
     role_timeout: int = 1000
+    kernel_snapshot: bool = False  # snapshot the kernel namespace after the task of the saved state
 
     def get_node_name(self):
         return f"Node-{self.node_id}"
@@ -147,10 +149,20 @@ class Experimenter(DataInterpreter):
             # fe_id = current_task.dependent_task_ids
             self.save_state()
             save_notebook(role=self, save_dir=self.role_dir, name=self.get_node_name(), save_to_depth=True)
+            # the children restore the kernel of the saved state, the later tasks of the node are never restored
+            if self.kernel_snapshot and is_success:
+                await self.save_kernel_snapshot(current_task, code)
         else:
             save_notebook(role=self, save_dir=self.role_dir, name=self.get_node_name())
         return task_result
 
+    async def save_kernel_snapshot(self, current_task: Task, code: str):
+        """Snapshots the kernel namespace, which the code of the previous tasks and of the current task built"""
+        tasks = self.planner.plan.tasks
+        index = next(i for i, task in enumerate(tasks) if task.task_id == current_task.task_id)
+        codes = [task.code for task in tasks[:index] if task.code] + [code]
+        await save_kernel_snapshot(self.execute_code, self.role_dir, self.node_id, current_task.task_id, codes)
+
     def get_solution(self):
         codes = [task.code for task in self.planner.plan.tasks]
         results = [task.result for task in self.planner.plan.tasks]
@@ -0,0 +1,185 @@
+"""
+Snapshots of the notebook kernel namespace of the SELA roles, so that a node restores the namespace its parent had
+after a task instead of executing the code of all the previous tasks again.
+
+A snapshot is saved under `{role_dir}/Node-{node_id}-snapshots/task-{task_id}/` after the task whose state the node
+saves, which is the only task its children and its own simulations restore from. The modules are saved by name, and
+the other objects are pickled together in a single dict (by dill if the kernel has it, which also pickles the functions
+and classes defined in the notebook), so that the objects shared by several names or containers are still shared
+after the restore. The dataframes of the namespace are saved as Parquet files, and pickled as references to them. A
+snapshot with an object that can not be serialized is incomplete, and is never restored.
+"""
+import hashlib
+import json
+import os
+from typing import Optional
+
+from metagpt.logs import logger
+
+SNAPSHOTS_DIRNAME = "Node-{node_id}-snapshots"
+META_FILENAME = "meta.json"
+
+# executed in the kernel, the names starting with "_" are not snapshotted
+SNAPSHOT_CODE = '''
+def _metagpt_snapshot(snapshot_dir, meta):
+    import io, json, os, pickle, shutil, types
+    try:
+        import dill as _pickler
+    except ImportError:
+        _pickler = pickle
+    ip = get_ipython()
+    tmp_dir = snapshot_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    modules, values, dataframes, failed = {}, {}, {}, []
+    for name, value in list(ip.user_ns.items()):
+        if name.startswith("_") or name in ip.user_ns_hidden:
+            continue
+        if isinstance(value, types.ModuleType):
+            modules[name] = value.__name__
+            continue
+        if _pickler is pickle and getattr(value, "__module__", None) == "__main__":
+            failed.append(f"{name}: defined in the notebook, which needs dill to be pickled")
+            continue
+        if type(value).__module__.startswith("pandas") and type(value).__name__ == "DataFrame":
+            if id(value) not in dataframes:
+                try:
+                    value.to_parquet(os.path.join(tmp_dir, f"{name}.parquet"))
+                    dataframes[id(value)] = name
+                except Exception:
+                    pass  # e.g. no pyarrow, or non-string column names, pickled as the other objects
+        values[name] = value
+
+    class _Pickler(_pickler.Pickler):
+        def persistent_id(self, obj):
+            # the dataframe, wherever it is referenced, is restored from its Parquet file
+            return dataframes.get(id(obj))
+
+    try:
+        with open(os.path.join(tmp_dir, "objects.pkl"), "wb") as f:
+            _Pickler(f).dump(values)
+    except Exception as e:
+        error = repr(e)
+        for name, value in values.items():  # find the objects which can not be pickled
+            try:
+                _Pickler(io.BytesIO()).dump(value)
+            except Exception as exp:
+                failed.append(f"{name}: {exp!r}")
+        if not failed:
+            failed.append(error)
+    meta.update(modules=modules, dataframes=sorted(dataframes.values()), failed=failed, complete=not failed)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    os.replace(tmp_dir, snapshot_dir)
+    return failed
+'''
+
+RESTORE_CODE = '''
+def _metagpt_restore(snapshot_dir):
+    import importlib, json, os, pickle
+    try:
+        import dill as _pickler
+    except ImportError:
+        _pickler = pickle
+    with open(os.path.join(snapshot_dir, "meta.json")) as f:
+        meta = json.load(f)
+    dataframes = {}
+
+    class _Unpickler(_pickler.Unpickler):
+        def persistent_load(self, pid):
+            if pid not in dataframes:
+                import pandas as pd
+                dataframes[pid] = pd.read_parquet(os.path.join(snapshot_dir, f"{pid}.parquet"))
+            return dataframes[pid]
+
+    namespace = {name: importlib.import_module(module) for name, module in meta["modules"].items()}
+    with open(os.path.join(snapshot_dir, "objects.pkl"), "rb") as f:
+        namespace.update(_Unpickler(f).load())
+    get_ipython().user_ns.update(namespace)
+'''
+
+def hash_codes(codes: list[str]) -> str:
+    md5 = hashlib.md5()
+    for code in codes:
+        md5.update(code.encode("utf-8"))
+        md5.update(b"\0")
+    return md5.hexdigest()
+
+
+def get_snapshots_dir(role_dir: str, node_id: str) -> str:
+    return os.path.join(role_dir, SNAPSHOTS_DIRNAME.format(node_id=node_id))
+
+
+async def _execute(executor, code: str, timeout: float) -> dict:
+    """Executes the code in the kernel of the executor, without adding it to the notebook"""
+    await executor.build()
+    reply = await executor.nb_client.kc.execute_interactive(
+        code, store_history=False, timeout=timeout, output_hook=lambda msg: None
+    )
+    return reply["content"]
+
+
+async def save_kernel_snapshot(executor, role_dir: str, node_id: str, task_id: str, codes: list[str], timeout=600):
+    """Snapshots the kernel namespace of the executor, which has executed `codes`"""
+    snapshot_dir = get_snapshots_dir(role_dir, node_id)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_dir = os.path.abspath(os.path.join(snapshot_dir, f"task-{task_id}"))
+    meta = {"node_id": node_id, "task_id": task_id, "num_codes": len(codes), "codes_hash": hash_codes(codes)}
+    code = f"{SNAPSHOT_CODE}\n_metagpt_failed = _metagpt_snapshot({snapshot_dir!r}, {meta!r})\ndel _metagpt_snapshot"
+    try:
+        content = await _execute(executor, code, timeout)
+    except Exception as e:
+        logger.warning(f"Failed to snapshot the kernel of node {node_id} at task {task_id}: {e}")
+        return
+    if content["status"] != "ok":
+        logger.warning(f"Failed to snapshot the kernel of node {node_id} at task {task_id}: {content.get('evalue')}")
+
+
+def find_kernel_snapshot(role_dir: str, node_id: str, codes: list[str]) -> Optional[dict]:
+    """
+    Finds the complete snapshot of the node or its ancestors which executed the most of the leading `codes`.
+    """
+    node_ids = ["-".join(node_id.split("-")[:i]) for i in range(len(node_id.split("-")), 0, -1)]
+    best_meta = None
+    for snapshot_node_id in node_ids:
+        snapshots_dir = get_snapshots_dir(role_dir, snapshot_node_id)
+        if not os.path.isdir(snapshots_dir):
+            continue
+        for name in os.listdir(snapshots_dir):
+            meta_path = os.path.join(snapshots_dir, name, META_FILENAME)
+            if name.endswith(".tmp") or not os.path.exists(meta_path):
+                continue
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            num_codes = meta["num_codes"]
+            if not meta.get("complete") or num_codes > len(codes):
+                continue
+            if meta["codes_hash"] != hash_codes(codes[:num_codes]):
+                continue
+            if best_meta is None or num_codes > best_meta["num_codes"]:
+                best_meta = {**meta, "path": os.path.abspath(os.path.join(snapshots_dir, name))}
+    return best_meta
+
+
+async def restore_kernel_snapshot(executor, role_dir: str, node_id: str, codes: list[str], timeout=600) -> int:
+    """
+    Restores the kernel namespace of the executor from the best snapshot for `codes`, and returns the number of the
+    leading codes it covers, which need not be executed again. Returns 0 if there is no snapshot or the restore
+    fails, in which case the kernel namespace is reset for all the codes to be executed.
+    """
+    meta = find_kernel_snapshot(role_dir, node_id, codes)
+    if meta is None:
+        return 0
+    code = f"{RESTORE_CODE}\n_metagpt_restore({meta['path']!r})\ndel _metagpt_restore"
+    try:
+        content = await _execute(executor, code, timeout)
+        if content["status"] == "ok":
+            logger.info(f"Node {node_id} restored the snapshot of node {meta['node_id']} at task {meta['task_id']}")
+            return meta["num_codes"]
+        logger.warning(f"Failed to restore the kernel snapshot {meta['path']}: {content.get('evalue')}")
+        await _execute(executor, "%reset -f", timeout)
+    except Exception as e:
+        logger.warning(f"Failed to restore the kernel snapshot {meta['path']}: {e}")
+        await executor.reset()
+    return 0
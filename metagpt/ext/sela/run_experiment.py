@@ -1,6 +1,7 @@
 import argparse
 import asyncio
 
+from metagpt.actions.di.kernel_pool import KernelPool, set_default_kernel_pool
 from metagpt.ext.sela.data.custom_task import get_mle_is_lower_better, get_mle_task_id
 from metagpt.ext.sela.runner.autogluon import GluonRunner
 from metagpt.ext.sela.runner.autosklearn import AutoSklearnRunner
@@ -20,6 +21,9 @@ def get_args(cmd=True):
         choices=["mcts", "rs", "base", "custom", "greedy", "autogluon", "random", "autosklearn"],
     )
     parser.add_argument("--role_timeout", type=int, default=1000)
+    parser.add_argument(
+        "--kernel_pool_size", type=int, default=0, help="Number of warm notebook kernels, 0 to disable"
+    )
     get_di_args(parser)
     get_mcts_args(parser)
     get_rs_exp_args(parser)
@@ -42,6 +46,16 @@ def get_mcts_args(parser):
     parser.add_argument("--no_load_tree", dest="load_tree", action="store_false")
     parser.set_defaults(load_tree=False)
     parser.add_argument("--rollouts", type=int, default=5)
+    parser.add_argument(
+        "--parallel_rollouts", type=int, default=1, help="Number of rollouts run concurrently, with virtual loss"
+    )
+    parser.add_argument(
+        "--kernel_snapshot",
+        dest="kernel_snapshot",
+        action="store_true",
+        help="Restore the kernel namespace of the parent node instead of executing its code again",
+    )
+    parser.set_defaults(kernel_snapshot=False)
     parser.add_argument("--use_fixed_insights", dest="use_fixed_insights", action="store_true")
     parser.set_defaults(use_fixed_insights=False)
     parser.add_argument("--start_task_id", type=int, default=2)
@@ -68,6 +82,9 @@ def get_di_args(parser):
     parser.add_argument("--reflection", dest="reflection", action="store_true")
     parser.add_argument("--no_reflection", dest="reflection", action="store_false")
     parser.add_argument("--num_experiments", type=int, default=1)
+    parser.add_argument(
+        "--num_workers", type=int, default=1, help="Number of experiments run concurrently, each in its own directory"
+    )
     parser.add_argument("--special_instruction", type=str, default=None, choices=["ag", "stacking", "text", "image"])
     parser.set_defaults(reflection=True)
 
@@ -91,7 +108,18 @@ async def main(args):
         runner = AutoSklearnRunner(args)
     else:
         raise ValueError(f"Invalid exp_mode: {args.exp_mode}")
-    await runner.run_experiment()
+
+    kernel_pool = None
+    if args.kernel_pool_size > 0:
+        kernel_pool = KernelPool(size=args.kernel_pool_size)
+        set_default_kernel_pool(kernel_pool)
+        await kernel_pool.start()
+    try:
+        await runner.run_experiment()
+    finally:
+        if kernel_pool is not None:
+            await kernel_pool.shutdown()
+            set_default_kernel_pool(None)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,6 @@
-import os
-
 import pandas as pd
 
-from metagpt.ext.sela.evaluation.evaluation import evaluate_score
+from metagpt.ext.sela.evaluation.evaluation import evaluate_score, load_target
 from metagpt.ext.sela.runner.runner import Runner
 from metagpt.ext.sela.search.tree_search import create_initial_state
 
@@ -47,8 +45,7 @@ class CustomRunner(Runner):
 
     def evaluate_predictions(self, preds, split):
         metric = self.state["dataset_config"]["metric"]
-        gt_path = os.path.join(self.state["datasets_dir"][f"{split}_target"])
-        gt = pd.read_csv(gt_path)["target"]
+        gt = load_target(self.state["datasets_dir"][f"{split}_target"])
         score = evaluate_score(preds, gt, metric)
         return score
 
@@ -1,3 +1,5 @@
+from functools import partial
+
 from metagpt.ext.sela.experimenter import Experimenter
 from metagpt.ext.sela.insights.instruction_generator import InstructionGenerator
 from metagpt.ext.sela.runner.runner import Runner
@@ -32,22 +34,21 @@ class RandomSearchRunner(Runner):
         else:
             raise ValueError(f"Invalid mode: {self.args.rs_mode}")
 
-        results = []
-        for i in range(self.args.num_experiments):
+        async def run(i):
             di = Experimenter(node_id=str(i), use_reflection=self.args.reflection, role_timeout=self.args.role_timeout)
             di.role_dir = f"{di.role_dir}_{self.args.task}"
             requirement = user_requirement + EXPS_PROMPT.format(experience=exps[i])
             print(requirement)
-            score_dict = await self.run_di(di, requirement, run_idx=i)
-            results.append(
-                {
-                    "idx": i,
-                    "score_dict": score_dict,
-                    "rs_mode": self.args.rs_mode,
-                    "insights": exps[i],
-                    "user_requirement": requirement,
-                    "args": vars(self.args),
-                }
-            )
+            score_dict = await self.run_di(di, self.isolate_output_dir(requirement, i), run_idx=i)
+            return {
+                "idx": i,
+                "score_dict": score_dict,
+                "rs_mode": self.args.rs_mode,
+                "insights": exps[i],
+                "user_requirement": requirement,
+                "args": vars(self.args),
+            }
+
+        results = await self.run_concurrently([partial(run, i) for i in range(self.args.num_experiments)])
         results = self.summarize_results(results)
         self.save_result(results)
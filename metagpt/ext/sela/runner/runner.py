@@ -1,11 +1,14 @@
+import asyncio
 import datetime
 import json
 import os
+import re
+from functools import partial
 
 import numpy as np
 import pandas as pd
 
-from metagpt.ext.sela.evaluation.evaluation import evaluate_score
+from metagpt.ext.sela.evaluation.evaluation import evaluate_score, load_target
 from metagpt.ext.sela.experimenter import Experimenter
 from metagpt.ext.sela.search.tree_search import create_initial_state
 from metagpt.ext.sela.utils import DATA_CONFIG, save_notebook
@@ -35,7 +38,7 @@ class Runner:
             try:
                 await di.run(user_requirement)
                 score_dict = await di.get_score()
-                score_dict = self.evaluate(score_dict, self.state)
+                score_dict = self.evaluate(score_dict, self.state, run_idx)
                 run_finished = True
             except Exception as e:
                 print(f"Error: {e}")
@@ -80,36 +83,70 @@ class Runner:
     async def run_experiment(self):
         state = self.state
         user_requirement = state["requirement"]
-        results = []
 
-        for i in range(self.args.num_experiments):
-            di = Experimenter(node_id="0", use_reflection=self.args.reflection, role_timeout=self.args.role_timeout)
-            score_dict = await self.run_di(di, user_requirement, run_idx=i)
-            results.append(
-                {"idx": i, "score_dict": score_dict, "user_requirement": user_requirement, "args": vars(self.args)}
-            )
-            self.save_result(results)  # save intermediate results
+        async def run(i):
+            di = Experimenter(node_id=str(i), use_reflection=self.args.reflection, role_timeout=self.args.role_timeout)
+            score_dict = await self.run_di(di, self.isolate_output_dir(user_requirement, i), run_idx=i)
+            return {"idx": i, "score_dict": score_dict, "user_requirement": user_requirement, "args": vars(self.args)}
+
+        results = await self.run_concurrently([partial(run, i) for i in range(self.args.num_experiments)])
         results = self.summarize_results(results)
 
         self.save_result(results)
 
-    def evaluate_prediction(self, split, state):
-        pred_path = os.path.join(state["work_dir"], state["task"], f"{split}_predictions.csv")
+    async def run_concurrently(self, runs):
+        """
+        Runs the experiments `args.num_workers` at a time, and saves the results sorted by "idx" as each of them
+        completes.
+        """
+        semaphore = asyncio.Semaphore(max(self.get_num_workers(), 1))
+
+        async def run_with_semaphore(run):
+            async with semaphore:
+                return await run()
+
+        tasks = [asyncio.ensure_future(run_with_semaphore(run)) for run in runs]  # started in the order of the runs
+        results = []
+        for future in asyncio.as_completed(tasks):
+            results.append(await future)
+            results.sort(key=lambda result: result["idx"])
+            self.save_result(results)  # save intermediate results
+        return results
+
+    def get_num_workers(self):
+        return getattr(self.args, "num_workers", 1)
+
+    def get_output_dir(self, run_idx=None):
+        """The directory a run saves its predictions in, of the run itself if the runs are concurrent"""
+        output_dir = f"{self.state['work_dir']}/{self.state['task']}"
+        if run_idx is not None and self.get_num_workers() > 1:
+            output_dir = f"{output_dir}/run-{run_idx}"
+        return output_dir
+
+    def isolate_output_dir(self, text, run_idx):
+        """Replaces the output directory of the task in the text with the one of the run"""
+        output_dir = self.get_output_dir(run_idx)
+        os.makedirs(output_dir, exist_ok=True)
+        return re.sub(re.escape(self.get_output_dir()) + r"(?!/run-)", lambda _: output_dir, text)
+
+    def evaluate_prediction(self, split, state, run_idx=None):
+        pred_path = os.path.join(self.get_output_dir(run_idx), f"{split}_predictions.csv")
         os.makedirs(state["node_dir"], exist_ok=True)
-        pred_node_path = os.path.join(state["node_dir"], f"{self.start_time}-{split}_predictions.csv")
-        gt_path = os.path.join(state["datasets_dir"][f"{split}_target"])
+        isolated = self.get_output_dir(run_idx) != self.get_output_dir()
+        prefix = f"{self.start_time}-{run_idx}" if isolated else self.start_time
+        pred_node_path = os.path.join(state["node_dir"], f"{prefix}-{split}_predictions.csv")
         preds = pd.read_csv(pred_path)
         preds = preds[preds.columns.tolist()[-1]]
         preds.to_csv(pred_node_path, index=False)
-        gt = pd.read_csv(gt_path)["target"]
+        gt = load_target(state["datasets_dir"][f"{split}_target"])
         metric = state["dataset_config"]["metric"]
         os.remove(pred_path)
         return evaluate_score(preds, gt, metric)
 
-    def evaluate(self, score_dict, state):
+    def evaluate(self, score_dict, state, run_idx=None):
         scores = {
-            "dev_score": self.evaluate_prediction("dev", state),
-            "test_score": self.evaluate_prediction("test", state),
+            "dev_score": self.evaluate_prediction("dev", state, run_idx),
+            "test_score": self.evaluate_prediction("test", state, run_idx),
         }
         score_dict.update(scores)
         return score_dict
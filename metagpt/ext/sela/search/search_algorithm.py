@@ -22,9 +22,11 @@ class Random(BaseTreeSearch):
 class MCTS(BaseTreeSearch):
     def best_child(self):
         def uct(node: Node):
-            n_visits = node.visited if node.visited else self.c_unvisited
-            avg_value = node.avg_value() if node.visited else node.value / self.c_unvisited
-            return avg_value + self.c_explore * np.sqrt(np.log(node.parent.visited) / n_visits)
+            # the in-flight rollouts through a node count as visits with no reward, i.e. the virtual loss
+            n_visits = (node.visited if node.visited else self.c_unvisited) + self.virtual_loss.get(node.id, 0)
+            avg_value = node.value / n_visits
+            parent_visits = node.parent.visited + self.virtual_loss.get(node.parent.id, 0)
+            return avg_value + self.c_explore * np.sqrt(np.log(parent_visits) / n_visits)
 
         if len(self.children) == 0:
             return self.root_node
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import os
 import pickle
+import re
 import shutil
 
 import numpy as np
@@ -14,7 +16,7 @@ from metagpt.ext.sela.data.dataset import (
     generate_task_requirement,
     get_split_dataset_path,
 )
-from metagpt.ext.sela.evaluation.evaluation import evaluate_score
+from metagpt.ext.sela.evaluation.evaluation import evaluate_score, load_target
 from metagpt.ext.sela.experimenter import Experimenter, TimeoutException
 from metagpt.ext.sela.insights.instruction_generator import InstructionGenerator
 from metagpt.ext.sela.utils import get_exp_pool_path, load_execute_notebook, mcts_logger
@@ -41,6 +43,7 @@ def initialize_di_root_node(state: dict, reflection: bool = True):
             - role_timeout (int): The timeout for the role.
             - external_eval (bool): Whether to use external evaluation.
             - custom_dataset_dir (str): The directory of the custom dataset.
+            - kernel_snapshot (bool): Whether to snapshot the kernel namespace of the saved state of each node.
         reflection (bool, optional): Whether to use reflection. Defaults to True.
 
     Returns:
@@ -52,6 +55,7 @@ def initialize_di_root_node(state: dict, reflection: bool = True):
         use_reflection=reflection,
         role_dir=state["node_dir"],
         role_timeout=state["role_timeout"],
+        kernel_snapshot=state.get("kernel_snapshot", False),
     )
     return role, Node(parent=None, state=state, action=None, value=0)
 
@@ -106,6 +110,9 @@ def create_initial_state(task: str, start_task_id: int, data_config: dict, args)
         "role_timeout": args.role_timeout,
         "external_eval": external_eval,
         "custom_dataset_dir": args.custom_dataset_dir,
+        # the concurrent rollouts save their predictions in the output directories of their own nodes
+        "isolate_output_dir": getattr(args, "parallel_rollouts", 1) > 1,
+        "kernel_snapshot": getattr(args, "kernel_snapshot", False),
     }
     os.makedirs(initial_state["node_dir"], exist_ok=True)
     return initial_state
@@ -146,8 +153,10 @@ class Node:
 
     def save_node(self):
         os.makedirs(self.state["node_dir"], exist_ok=True)
-        with open(os.path.join(self.state["node_dir"], f"Node-{self.id}.pkl"), "wb") as f:
+        node_path = os.path.join(self.state["node_dir"], f"Node-{self.id}.pkl")
+        with open(f"{node_path}.tmp", "wb") as f:
             pickle.dump(self, f)
+        os.replace(f"{node_path}.tmp", node_path)  # a crash never leaves a truncated pickle
 
     def load_node(self):
         with open(os.path.join(self.state["node_dir"], f"Node-{self.id}.pkl"), "rb") as f:
@@ -241,9 +250,28 @@ class Node:
     def get_predictions_path(self, split):
         return os.path.join(self.state["node_dir"], f"Node-{self.id}-{split}_predictions.csv")
 
+    def get_output_dir(self):
+        """The directory the role saves its predictions in, of the node itself if `isolate_output_dir`"""
+        output_dir = f"{self.state['work_dir']}/{self.state['task']}"
+        if self.state.get("isolate_output_dir"):
+            output_dir = f"{output_dir}/Node-{self.id}"
+        return output_dir
+
+    def isolate_output_dir(self, text: str) -> str:
+        """Replaces the output directory of the task, or of another node, in the text with the one of the node"""
+        pattern = re.escape(f"{self.state['work_dir']}/{self.state['task']}") + r"(/Node-[\d-]+)?"
+        return re.sub(pattern, lambda _: self.get_output_dir(), text)
+
+    def isolate_role_output_dir(self, role: Experimenter):
+        os.makedirs(self.get_output_dir(), exist_ok=True)
+        plan = role.planner.plan
+        plan.goal = self.isolate_output_dir(plan.goal)
+        for task in plan.tasks:
+            task.instruction = self.isolate_output_dir(task.instruction)
+
     def get_and_move_predictions(self, split):
         if not os.path.exists(self.get_predictions_path(split)):
-            pred_path = os.path.join(self.state["work_dir"], self.state["task"], f"{split}_predictions.csv")
+            pred_path = os.path.join(self.get_output_dir(), f"{split}_predictions.csv")
             shutil.copy(pred_path, self.get_predictions_path(split))
             os.remove(pred_path)
         return pd.read_csv(self.get_predictions_path(split))
@@ -254,7 +282,7 @@ class Node:
 
     def evaluate_prediction(self, split):
         preds = self.get_and_move_predictions(split)["target"]
-        gt = self.get_gt(split)["target"]
+        gt = load_target(self.state["datasets_dir"][f"{split}_target"])
         metric = self.state["dataset_config"]["metric"]
         return evaluate_score(preds, gt, metric)
 
@@ -280,10 +308,16 @@ class Node:
             try:
                 if not role:
                     role = self.load_role()
+                    if self.state.get("isolate_output_dir"):
+                        self.isolate_role_output_dir(role)
                     await load_execute_notebook(role)  # execute previous notebook's code
                     await role.run(with_message="continue")
                 else:
-                    await role.run(with_message=self.state["requirement"])
+                    requirement = self.state["requirement"]
+                    if self.state.get("isolate_output_dir"):
+                        os.makedirs(self.get_output_dir(), exist_ok=True)
+                        requirement = self.isolate_output_dir(requirement)
+                    await role.run(with_message=requirement)
                 score_dict = await role.get_score()
                 score_dict = self.evaluate_simulation(score_dict)
                 self.raw_reward = score_dict
@@ -330,6 +364,10 @@ class BaseTreeSearch:
         self.root_node = root_node
         self.max_depth = max_depth
         self.use_fixed_insights = use_fixed_insights
+        # the number of in-flight rollouts through each node id, counted as visits with no reward by `best_child`
+        self.virtual_loss: dict[str, int] = {}
+        self.expand_locks: dict[str, asyncio.Lock] = {}
+        self.simulations: dict[str, asyncio.Task] = {}  # the running simulations by node id
 
     def select(self, node: Node):
         node = self.best_child()
@@ -340,21 +378,46 @@ class BaseTreeSearch:
         raise NotImplementedError
 
     async def expand(self, node: Node, max_children=5):
-        await node.expand(max_children, self.instruction_generator)
+        # a node selected by concurrent rollouts is expanded once
+        async with self.expand_locks.setdefault(node.id, asyncio.Lock()):
+            await node.expand(max_children, self.instruction_generator)
         if node not in self.children or not self.children[node]:
             self.children[node] = node.children
         return node.children
 
     async def simulate(self, node: Node, role=None):
-        "Returns the reward for a random simulation (to completion) of `node`"
+        """
+        Returns the reward for a random simulation (to completion) of `node`, or None if the node is being simulated by
+        another rollout, which backpropagates the reward, so that it is not counted twice.
+        """
         mcts_logger.log("MCTS", f"Start simulating node {node.id}:")
         while node.children:
-            node = np.random.choice(node.children)
-        reward, result_dict = await node.run_node(role)
+            node = self.choose_child(node.children)
+        if node.id in self.simulations:
+            mcts_logger.log("MCTS", f"Node {node.id} is being simulated by another rollout, wait for it to finish")
+            await asyncio.shield(self.simulations[node.id])
+            return None
+        self.simulations[node.id] = asyncio.ensure_future(node.run_node(role))
+        try:
+            reward, result_dict = await self.simulations[node.id]
+        finally:
+            self.simulations.pop(node.id, None)
         mcts_logger.log("MCTS", f"Simulated node's reward: {reward}")
         # TODO: add new insights
         return reward
 
+    def choose_child(self, children: list):
+        """Randomly chooses a child, the ones which no concurrent rollout is running through first"""
+        idle_children = [
+            child for child in children if child.id not in self.simulations and not self.virtual_loss.get(child.id)
+        ]
+        return np.random.choice(idle_children or children)
+
+    def add_virtual_loss(self, node: Node, count: int = 1):
+        while node is not None:
+            self.virtual_loss[node.id] = self.virtual_loss.get(node.id, 0) + count
+            node = node.parent
+
     def backpropagate(self, node: Node, reward: dict):
         child_node = node
         node.update(reward)
@@ -391,8 +454,10 @@ class BaseTreeSearch:
 
     def save_node_order(self, node_id: str):
         self.node_order.append(node_id)
-        with open(os.path.join(self.root_node.state["node_dir"], "node_order.json"), "w") as f:
+        node_order_path = os.path.join(self.root_node.state["node_dir"], "node_order.json")
+        with open(f"{node_order_path}.tmp", "w") as f:
             json.dump(self.node_order, f)
+        os.replace(f"{node_order_path}.tmp", node_order_path)
 
     def load_node_order(self):
         with open(os.path.join(self.root_node.state["node_dir"], "node_order.json"), "r") as f:
@@ -415,6 +480,7 @@ class BaseTreeSearch:
         load_tree = args.load_tree
         rollouts = args.rollouts
         from_scratch = args.from_scratch
+        parallel_rollouts = getattr(args, "parallel_rollouts", 1)
         role, root = initialize_di_root_node(state, reflection=reflection)
         self.root_node = root
         self.instruction_generator = InstructionGenerator(
@@ -443,29 +509,63 @@ class BaseTreeSearch:
             root = self.root_node
             self.load_node_order()
 
-        for _ in range(rollouts):  # number of rollouts
-            mcts_logger.log("MCTS", f"Start the next rollout {_+1}")
-            node = self.select(root)
-            if node.is_terminal():
-                if node.raw_value == 0:
-                    reward = await self.simulate(node)
-                else:
-                    reward = {"test_score": node.raw_value, "score": node.raw_reward["score"]}
+        if parallel_rollouts > 1:
+            await self.run_parallel_rollouts(root, rollouts, parallel_rollouts)
+        else:
+            for _ in range(rollouts):  # number of rollouts
+                mcts_logger.log("MCTS", f"Start the next rollout {_+1}")
+                node = await self.rollout(self.select(root))
+                self.save_node_order(node.id)
+        return self.best_path(root)
+
+    async def rollout(self, node: Node):
+        """Simulates the selected node, or a new child of it, and returns the simulated node"""
+        if node.is_terminal():
+            if node.raw_value == 0:
+                reward = await self.simulate(node)
+            else:
+                reward = {"test_score": node.raw_value, "score": node.raw_reward["score"]}
+            if reward is not None:
                 mcts_logger.log("MCTS", f"Terminal node's reward: {reward}")
                 self.backpropagate(node, reward)
-            else:
-                node, reward = await self.expand_and_simulate(node)
-                # self.backpropagate(node, reward)
-            self.save_node_order(node.id)
-        return self.best_path(root)
+        else:
+            node, reward = await self.expand_and_simulate(node)
+            # self.backpropagate(node, reward)
+        return node
+
+    async def run_parallel_rollouts(self, root: Node, rollouts: int, parallel_rollouts: int):
+        """
+        Runs the rollouts `parallel_rollouts` at a time. A selected node and its ancestors take a virtual loss until its
+        rollout is backpropagated, so the concurrent rollouts select other paths, and each simulation runs a role of
+        its own, with its own notebook kernel and output directory. The rewards are backpropagated as they arrive.
+        """
+        semaphore = asyncio.Semaphore(parallel_rollouts)
+
+        async def _rollout(rollout_id: int):
+            async with semaphore:
+                mcts_logger.log("MCTS", f"Start the next rollout {rollout_id + 1}")
+                # select and take the virtual loss without yielding, so the next rollout sees it
+                selected_node = self.select(root)
+                self.add_virtual_loss(selected_node)
+                try:
+                    node = await self.rollout(selected_node)
+                finally:
+                    self.add_virtual_loss(selected_node, -1)
+                self.save_node_order(node.id)
+
+        results = await asyncio.gather(*[_rollout(i) for i in range(rollouts)], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                mcts_logger.error(f"Rollout failed: {result}")
 
     async def expand_and_simulate(self, node: Node):
         # Expand and randomly select a child node, then simulate it
         if node.visited > 0:
             children = await self.expand(node)
-            node = np.random.choice(children)
+            node = self.choose_child(children)
         reward = await self.simulate(node)
-        self.backpropagate(node, reward)
+        if reward is not None:
+            self.backpropagate(node, reward)
         return node, reward
 
     def load_tree(self):
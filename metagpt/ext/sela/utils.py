@@ -9,6 +9,7 @@ from loguru import logger as _logger
 from nbclient import NotebookClient
 from nbformat.notebooknode import NotebookNode
 
+from metagpt.ext.sela.kernel_snapshot import restore_kernel_snapshot
 from metagpt.roles.role import Role
 
 
@@ -113,7 +114,12 @@ async def load_execute_notebook(role):
     executor.nb = nbformat.v4.new_notebook()
     executor.nb_client = NotebookClient(executor.nb, timeout=role.role_timeout)
     # await executor.build()
-    for code in codes:
+    num_restored = 0
+    if getattr(role, "kernel_snapshot", False):
+        num_restored = await restore_kernel_snapshot(executor, role.role_dir, role.node_id, codes)
+        # keep the restored code in the notebook of the node, without its outputs
+        executor.nb.cells.extend(nbformat.v4.new_code_cell(code) for code in codes[:num_restored])
+    for code in codes[num_restored:]:
         outputs, success = await executor.run(code)
         print(f"Execution success: {success}, Output: {outputs}")
     print("Finish executing the loaded notebook")
@@ -134,6 +134,8 @@ def main():
         st.subheader("Optimizer Settings")
         initial_round = st.number_input("Initial Round", 1, 100, 1)
         max_rounds = st.number_input("Maximum Rounds", 1, 100, 10)
+        num_candidates = st.number_input("Candidates per Round", 1, 16, 1)
+        pipeline_rounds = st.checkbox("Pipeline Rounds", value=False)
 
     # Main content area
     st.header("Template Configuration")
@@ -230,6 +232,8 @@ def main():
                     optimized_path="workspace",
                     initial_round=initial_round,
                     max_rounds=max_rounds,
+                    num_candidates=num_candidates,
+                    pipeline_rounds=pipeline_rounds,
                     template=f"{template_name}.yaml",
                     name=template_name,
                 )
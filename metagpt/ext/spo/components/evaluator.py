@@ -4,10 +4,11 @@
 # @Desc    : Evaluation for different datasets
 import asyncio
 import random
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from metagpt.ext.spo.prompts.evaluate_prompt import EVALUATE_PROMPT
 from metagpt.ext.spo.utils import load
+from metagpt.ext.spo.utils.answer_cache import AnswerCache
 from metagpt.ext.spo.utils.llm_client import SPO_LLM, RequestType, extract_content
 from metagpt.logs import logger
 
@@ -17,18 +18,29 @@ class QuickExecute:
     Execute Prompt
     """
 
-    def __init__(self, prompt: str):
+    def __init__(self, prompt: str, cache: Optional[AnswerCache] = None):
         self.prompt = prompt
         self.llm = SPO_LLM.get_instance()
+        self.cache = cache  # answers of the prompts executed before, by the same execute llm
 
-    async def prompt_execute(self) -> tuple[Any]:
-        _, _, qa, _ = load.load_meta_data()
+    async def prompt_execute(self, qa: Optional[List[dict]] = None) -> tuple[Any]:
+        """Answers the questions of `qa`, of a random sample of the template if None, concurrently"""
+        if qa is None:
+            _, _, qa, _ = load.load_meta_data()
         answers = []
 
+        llm_config = getattr(getattr(self.llm, "execute_llm", None), "config", None)
+
         async def fetch_answer(q: str) -> Dict[str, Any]:
+            if self.cache is not None:
+                answer = self.cache.get(self.prompt, q, llm_config)
+                if answer is not None:
+                    return {"question": q, "answer": answer}
             messages = [{"role": "user", "content": f"{self.prompt}\n\n{q}"}]
             try:
                 answer = await self.llm.responser(request_type=RequestType.EXECUTE, messages=messages)
+                if self.cache is not None:
+                    self.cache.put(self.prompt, q, llm_config, answer)
                 return {"question": q, "answer": answer}
             except Exception as e:
                 return {"question": q, "answer": str(e)}
@@ -5,10 +5,12 @@
 
 import asyncio
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
+from metagpt.ext.spo.components.evaluator import QuickExecute
 from metagpt.ext.spo.prompts.optimize_prompt import PROMPT_OPTIMIZE_PROMPT
 from metagpt.ext.spo.utils import load
+from metagpt.ext.spo.utils.answer_cache import ANSWER_CACHE_FILENAME, AnswerCache
 from metagpt.ext.spo.utils.data_utils import DataUtils
 from metagpt.ext.spo.utils.evaluation_utils import EvaluationUtils
 from metagpt.ext.spo.utils.llm_client import SPO_LLM, RequestType, extract_content
@@ -24,6 +26,9 @@ class PromptOptimizer:
         max_rounds: int = 10,
         name: str = "",
         template: str = "",
+        num_candidates: int = 1,
+        pipeline_rounds: bool = False,
+        use_answer_cache: bool = True,
     ) -> None:
         self.name = name
         self.root_path = Path(optimized_path) / self.name
@@ -31,21 +36,51 @@ class PromptOptimizer:
         self.round = initial_round
         self.max_rounds = max_rounds
         self.template = template
+        self.num_candidates = num_candidates  # the candidate prompts generated and evaluated per round
+        self.pipeline_rounds = pipeline_rounds  # generate the next candidates during the evaluation of a round
 
         self.prompt_utils = PromptUtils(self.root_path)
         self.data_utils = DataUtils(self.root_path)
         self.evaluation_utils = EvaluationUtils(self.root_path)
         self.llm = SPO_LLM.get_instance()
+        self.answer_cache = (
+            AnswerCache(self.root_path / "prompts" / ANSWER_CACHE_FILENAME) if use_answer_cache else None
+        )
 
     def optimize(self):
-        for opt_round in range(self.max_rounds):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self._optimize_prompt())
-            self.round += 1
+        # a single loop for all the rounds, which keeps the connections of the llm clients
+        asyncio.run(self.optimize_async())
 
+        if self.answer_cache is not None:
+            logger.info(f"Answer cache: {self.answer_cache.hits} hits, {self.answer_cache.misses} misses")
         self.show_final_result()
 
+    async def optimize_async(self):
+        if self.num_candidates <= 1 and not self.pipeline_rounds:
+            for opt_round in range(self.max_rounds):
+                await self._optimize_prompt()
+                self.round += 1
+            return
+
+        last_round = self.round + self.max_rounds - 1
+        if self.round == 1:
+            await self._optimize_prompt()
+            self.round += 1
+
+        next_candidates = None
+        try:
+            while self.round <= last_round:
+                candidates = await (next_candidates or self._generate_candidates(self.round))
+                next_candidates = None
+                if self.pipeline_rounds and self.round < last_round:
+                    # from the best round before this one, as this round is still being evaluated
+                    next_candidates = asyncio.ensure_future(self._generate_candidates(self.round + 1))
+                await self._evaluate_candidates(candidates)
+                self.round += 1
+        finally:
+            if next_candidates is not None:
+                next_candidates.cancel()
+
     def show_final_result(self):
         best_round = self.data_utils.get_best_round()
 
@@ -90,11 +125,12 @@ class PromptOptimizer:
         )
         self.prompt_utils.write_answers(directory, answers=answers)
 
-    async def _generate_optimized_prompt(self):
+    async def _generate_optimized_prompt(self, round_number: Optional[int] = None):
+        round_number = round_number or self.round
         _, requirements, qa, count = load.load_meta_data()
         samples = self.data_utils.get_best_round()
 
-        logger.info(f"\n🚀Round {self.round} OPTIMIZATION STARTING 🚀\n")
+        logger.info(f"\n🚀Round {round_number} OPTIMIZATION STARTING 🚀\n")
         logger.info(f"\nSelecting prompt for round {samples['round']} and advancing to the iteration phase\n")
 
         golden_answer = self.data_utils.list_to_markdown(qa)
@@ -113,7 +149,7 @@ class PromptOptimizer:
         )
 
         modification = extract_content(response, "modification")
-        logger.info(f"Modification of {self.round} round: {modification}")
+        logger.info(f"Modification of {round_number} round: {modification}")
 
         prompt = extract_content(response, "prompt")
         return prompt if prompt else ""
@@ -131,6 +167,47 @@ class PromptOptimizer:
         self.prompt_utils.write_answers(directory, answers=answers)
         return success, answers
 
+    async def _generate_candidates(self, round_number: int) -> List[str]:
+        load.set_file_name(self.template)
+        prompts = await asyncio.gather(
+            *(self._generate_optimized_prompt(round_number) for _ in range(self.num_candidates))
+        )
+        return [prompt for prompt in prompts if prompt] or prompts[:1]
+
+    async def _evaluate_candidates(self, prompts: List[str]):
+        """
+        Executes the candidate prompts of the round on the same questions concurrently, picks the best of them by a
+        tournament, and evaluates it against the best round as a single round.
+        """
+        prompt_path = self.root_path / "prompts"
+        directory = self.prompt_utils.create_round_directory(prompt_path, self.round)
+        _, _, qa, _ = load.load_meta_data()
+
+        logger.info(f"\n⚡ RUNNING {len(prompts)} OPTIMIZED PROMPTS ⚡\n")
+        executors = [QuickExecute(prompt=prompt, cache=self.answer_cache) for prompt in prompts]
+        answers = await asyncio.gather(*(executor.prompt_execute(qa) for executor in executors))
+        candidates = []
+        for i, (prompt, candidate_answers) in enumerate(zip(prompts, answers)):
+            candidate_directory = directory / f"candidate_{i}"
+            candidate_directory.mkdir(parents=True, exist_ok=True)
+            self.prompt_utils.write_prompt(candidate_directory, prompt=prompt)
+            self.prompt_utils.write_answers(candidate_directory, answers=candidate_answers)
+            candidates.append({"round": self.round, "answers": candidate_answers, "prompt": prompt})
+
+        logger.info("\n📊 EVALUATING OPTIMIZED PROMPTS 📊\n")
+        new_samples = await self.evaluation_utils.run_tournament(candidates)
+        self.prompt = new_samples["prompt"]
+        logger.info(f"\nRound {self.round} Prompt: {self.prompt}\n")
+        self.prompt_utils.write_prompt(directory, prompt=self.prompt)
+
+        samples = self.data_utils.get_best_round()
+        data = self.data_utils.load_results(prompt_path)
+        success, answers = await self.evaluation_utils.evaluate_prompt(
+            self, samples, new_samples, path=prompt_path, data=data, initial=False
+        )
+        self.prompt_utils.write_answers(directory, answers=answers)
+        self._log_optimization_result(success)
+
     def _log_optimization_result(self, success):
         logger.info("\n🎯 OPTIMIZATION RESULT 🎯\n")
         logger.info(f"\nRound {self.round} Optimization: {'✅ SUCCESS' if success else '❌ FAILED'}\n")
@@ -0,0 +1,37 @@
+from pathlib import Path
+from typing import Any, Optional
+
+from metagpt.ext.common.llm_cache import SQLiteCache, hash_llm_config, hash_text
+
+ANSWER_CACHE_FILENAME = "answers.db"
+
+
+class AnswerCache:
+    """
+    The answers of the execute llm, stored in SQLite by (prompt hash, question hash, execute llm config hash), so that
+    a prompt executed in an earlier round, or an earlier run, is not executed again.
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self.hits = 0
+        self.misses = 0
+        self._store = SQLiteCache(str(self.cache_path), table="answers", value_column="answer")
+
+    @staticmethod
+    def get_key(prompt: str, question: str, llm_config: Any) -> str:
+        return f"{hash_text(prompt)}:{hash_text(question)}:{hash_llm_config(llm_config)}"
+
+    def get(self, prompt: str, question: str, llm_config: Any) -> Optional[str]:
+        answer = self._store.get(self.get_key(prompt, question, llm_config))
+        if answer is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return answer
+
+    def put(self, prompt: str, question: str, llm_config: Any, answer: str):
+        self._store.put(self.get_key(prompt, question, llm_config), answer)
+
+    def close(self):
+        self._store.close()
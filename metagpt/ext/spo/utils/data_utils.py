@@ -1,9 +1,7 @@
 import datetime
 import json
 from pathlib import Path
-from typing import Dict, List, Union
-
-import pandas as pd
+from typing import Dict, List, Optional, Union
 
 from metagpt.logs import logger
 
@@ -12,6 +10,10 @@ class DataUtils:
     def __init__(self, root_path: Path):
         self.root_path = root_path
         self.top_scores = []
+        # the index of `prompts/results.json`, reloaded only when the file changes
+        self._scores_stat = None
+        self._rounds: Dict[int, dict] = {}
+        self._best_round: Optional[dict] = None
 
     def load_results(self, path: Path) -> list:
         result_path = self.get_results_file_path(path)
@@ -24,12 +26,11 @@ class DataUtils:
 
     def get_best_round(self):
         self._load_scores()
+        return self._best_round
 
-        for entry in self.top_scores:
-            if entry["succeed"]:
-                return entry
-
-        return None
+    def get_round(self, round_number: int) -> Optional[dict]:
+        self._load_scores()
+        return self._rounds.get(round_number)
 
     def get_results_file_path(self, prompt_path: Path) -> Path:
         return prompt_path / "results.json"
@@ -41,31 +42,43 @@ class DataUtils:
     def save_results(self, json_file_path: Path, data: Union[List, Dict]):
         json_path = json_file_path
         json_path.write_text(json.dumps(data, default=str, indent=4))
+        if json_path == self._get_scores_file_path() and isinstance(data, list):
+            self._index_scores(data)
+            self._scores_stat = self._stat(json_path)
+
+    def _get_scores_file_path(self) -> Path:
+        return self.get_results_file_path(self.root_path / "prompts")
+
+    @staticmethod
+    def _stat(path: Path):
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _index_scores(self, data: List[dict]):
+        self.top_scores = [
+            {"round": row["round"], "succeed": row["succeed"], "prompt": row["prompt"], "answers": row["answers"]}
+            for row in data
+        ]
+        self.top_scores.sort(key=lambda x: x["round"], reverse=True)
+        self._rounds = {entry["round"]: entry for entry in self.top_scores}
+        self._best_round = next((entry for entry in self.top_scores if entry["succeed"]), None)
 
     def _load_scores(self):
-        rounds_dir = self.root_path / "prompts"
-        result_file = rounds_dir / "results.json"
-        self.top_scores = []
+        result_file = self._get_scores_file_path()
+        if self._scores_stat is not None and result_file.exists() and self._stat(result_file) == self._scores_stat:
+            return self.top_scores
+        self._scores_stat = None
+        self._index_scores([])
 
         try:
             if not result_file.exists():
                 logger.warning(f"Results file not found at {result_file}")
                 return self.top_scores
 
+            stat = self._stat(result_file)
             data = json.loads(result_file.read_text(encoding="utf-8"))
-            df = pd.DataFrame(data)
-
-            for index, row in df.iterrows():
-                self.top_scores.append(
-                    {
-                        "round": row["round"],
-                        "succeed": row["succeed"],
-                        "prompt": row["prompt"],
-                        "answers": row["answers"],
-                    }
-                )
-
-            self.top_scores.sort(key=lambda x: x["round"], reverse=True)
+            self._index_scores(data)
+            self._scores_stat = stat
 
         except FileNotFoundError:
             logger.error(f"Could not find results file: {result_file}")
@@ -24,7 +24,7 @@ class EvaluationUtils:
 
     async def execute_prompt(self, optimizer: Any, prompt_path: Path) -> dict:
         optimizer.prompt = optimizer.prompt_utils.load_prompt(optimizer.round, prompt_path)
-        executor = QuickExecute(prompt=optimizer.prompt)
+        executor = QuickExecute(prompt=optimizer.prompt, cache=getattr(optimizer, "answer_cache", None))
 
         answers = await executor.prompt_execute()
 
@@ -34,6 +34,36 @@ class EvaluationUtils:
 
         return new_data
 
+    async def compare_prompts(self, samples: dict, new_samples: dict) -> bool:
+        """Whether the answers of `new_samples` beat the ones of `samples`, by the majority of the evaluations"""
+        evaluator = QuickEvaluate()
+        evaluation_results = await asyncio.gather(
+            *(
+                evaluator.prompt_evaluate(samples=samples, new_samples=new_samples)
+                for _ in range(EVALUATION_REPETITION)
+            )
+        )
+
+        logger.info(f"Evaluation Results {evaluation_results}")
+
+        true_count = evaluation_results.count(True)
+        false_count = evaluation_results.count(False)
+        return true_count > false_count
+
+    async def run_tournament(self, candidates: List[dict]) -> dict:
+        """
+        Picks the best of the candidate samples by a single-elimination tournament, the matches of a stage being
+        evaluated concurrently. A candidate without an opponent advances to the next stage.
+        """
+        while len(candidates) > 1:
+            pairs = [candidates[i : i + 2] for i in range(0, len(candidates) - 1, 2)]
+            new_wins = await asyncio.gather(*(self.compare_prompts(a, b) for a, b in pairs))
+            winners = [b if new_win else a for (a, b), new_win in zip(pairs, new_wins)]
+            if len(candidates) % 2:
+                winners.append(candidates[-1])
+            candidates = winners
+        return candidates[0]
+
     async def evaluate_prompt(
         self,
         optimizer: Any,
@@ -43,28 +73,12 @@ class EvaluationUtils:
         data: List[dict],
         initial: bool = False,
     ) -> Tuple[bool, dict]:
-        evaluator = QuickEvaluate()
         new_token = count_tokens(new_samples)
 
         if initial is True:
             succeed = True
         else:
-            evaluation_results = []
-
-            evaluation_results.extend(
-                await asyncio.gather(
-                    *(
-                        evaluator.prompt_evaluate(samples=samples, new_samples=new_samples)
-                        for _ in range(EVALUATION_REPETITION)
-                    )
-                )
-            )
-
-            logger.info(f"Evaluation Results {evaluation_results}")
-
-            true_count = evaluation_results.count(True)
-            false_count = evaluation_results.count(False)
-            succeed = true_count > false_count
+            succeed = await self.compare_prompts(samples, new_samples)
 
         new_data = optimizer.data_utils.create_result_data(
             new_samples["round"], new_samples["answers"], new_samples["prompt"], succeed, new_token
@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # @Desc   : StanfordTown Action
+import asyncio
 import json
-import time
 from abc import abstractmethod
 from pathlib import Path
 from typing import Any, Optional, Union
@@ -11,6 +11,15 @@ from metagpt.actions.action import Action
 from metagpt.ext.stanford_town.utils.const import PROMPTS_DIR
 from metagpt.logs import logger
 
+# the cap of the concurrent LLM calls of all the roles, as the roles of a step run concurrently
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def set_llm_concurrency(max_concurrency: int):
+    """Caps the number of concurrent LLM calls of the STActions, 0 means no cap."""
+    global _llm_semaphore
+    _llm_semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
 
 class STAction(Action):
     name: str = "STAction"
@@ -56,7 +65,10 @@ class STAction(Action):
         return prompt.strip()
 
     async def _aask(self, prompt: str) -> str:
-        return await self.llm.aask(prompt)
+        if _llm_semaphore is None:
+            return await self.llm.aask(prompt)
+        async with _llm_semaphore:
+            return await self.llm.aask(prompt)
 
     async def _run_gpt35_max_tokens(self, prompt: str, max_tokens: int = 50, retry: int = 3):
         for idx in range(retry):
@@ -73,7 +85,7 @@ class STAction(Action):
                     return self._func_cleanup(llm_resp, prompt)
             except Exception as exp:
                 logger.warning(f"Action: {self.cls_name} _run_gpt35_max_tokens exp: {exp}")
-                time.sleep(5)
+                await asyncio.sleep(5)
         return self.fail_default_resp
 
     async def _run_gpt35(
@@ -97,7 +109,7 @@ class STAction(Action):
                     return self._func_cleanup(llm_resp, prompt)
             except Exception as exp:
                 logger.warning(f"Action: {self.cls_name} _run_gpt35 exp: {exp}")
-                time.sleep(5)  # usually avoid `Rate limit`
+                await asyncio.sleep(5)  # usually avoid `Rate limit`
         return False
 
     async def _run_gpt35_wo_extra_prompt(self, prompt: str, retry: int = 3) -> str:
@@ -110,7 +122,7 @@ class STAction(Action):
                     return self._func_cleanup(llm_resp, prompt)
             except Exception as exp:
                 logger.warning(f"Action: {self.cls_name} _run_gpt35_wo_extra_prompt exp: {exp}")
-                time.sleep(5)  # usually avoid `Rate limit`
+                await asyncio.sleep(5)  # usually avoid `Rate limit`
         return self.fail_default_resp
 
     async def run(self, *args, **kwargs):
@@ -2,12 +2,16 @@
 # -*- coding: utf-8 -*-
 # @Desc   : BasicMemory,AgentMemory实现
 
+from collections.abc import Sequence
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import Field, field_serializer, model_validator
+import numpy as np
+from pydantic import Field, PrivateAttr, field_serializer, model_validator
 
+from metagpt.ext.stanford_town.memory import memory_storage
+from metagpt.ext.stanford_town.utils.embedding import embedding_service
 from metagpt.logs import logger
 from metagpt.memory.memory import Memory
 from metagpt.schema import Message
@@ -92,19 +96,58 @@ class BasicMemory(Message):
         return memory_dict
 
 
+class MemoryLogView(Sequence):
+    """
+    按从新到旧的顺序只读访问一个追加写入的记忆日志，索引与切片均不复制整个日志
+    """
+
+    def __init__(self, log: list[BasicMemory]):
+        self._log = log
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def __getitem__(self, index):
+        size = len(self._log)
+        if isinstance(index, slice):
+            return [self._log[size - 1 - i] for i in range(size)[index]]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("memory log index out of range")
+        return self._log[size - 1 - index]
+
+    def __iter__(self):
+        return reversed(self._log)
+
+    def __reversed__(self):
+        return iter(self._log)
+
+    def __add__(self, other) -> list[BasicMemory]:
+        return list(self) + list(other)
+
+    def __radd__(self, other) -> list[BasicMemory]:
+        return list(other) + list(self)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Sequence) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
 class AgentMemory(Memory):
     """
     GA中主要存储三种JSON
     1. embedding.json (Dict embedding_key:embedding)
     2. Node.json (Dict Node_id:Node)
     3. kw_strength.json
+    存储时使用列存格式 nodes.db + embeddings.npy，见memory_storage
     """
 
     storage: list[BasicMemory] = []  # 重写Storage，存储BasicMemory所有节点
-    event_list: list[BasicMemory] = []  # 存储event记忆
-    thought_list: list[BasicMemory] = []  # 存储thought记忆
-    chat_list: list[BasicMemory] = []  # chat-related memory
 
+    # keyword -> 记忆列表，按加入顺序追加，最新的在最后
     event_keywords: dict[str, list[BasicMemory]] = dict()  # 存储keywords
     thought_keywords: dict[str, list[BasicMemory]] = dict()
     chat_keywords: dict[str, list[BasicMemory]] = dict()
@@ -113,7 +156,38 @@ class AgentMemory(Memory):
     kw_strength_thought: dict[str, int] = dict()
 
     memory_saved: Optional[Path] = Field(default=None)
-    embeddings: dict[str, list[float]] = dict()
+    # embedding_key -> embedding, a list of floats, or a read-only np.memmap row of embeddings.npy once loaded from
+    # the columnar format; the rows are dumped as lists by `serialize_embeddings`
+    embeddings: dict[str, Any] = dict()
+
+    _retrieval_index: Any = None  # columnar index maintained by `retrieve.get_retrieval_index`
+    _id_index: dict[str, BasicMemory] = PrivateAttr(default_factory=dict)  # memory_id -> BasicMemory
+    # 各类记忆的追加日志，最新的在最后，通过 event_list 等属性按从新到旧的顺序访问
+    _event_log: list[BasicMemory] = PrivateAttr(default_factory=list)
+    _thought_log: list[BasicMemory] = PrivateAttr(default_factory=list)
+    _chat_log: list[BasicMemory] = PrivateAttr(default_factory=list)
+
+    @property
+    def event_list(self) -> MemoryLogView:
+        """event记忆，从新到旧"""
+        return MemoryLogView(self._event_log)
+
+    @property
+    def thought_list(self) -> MemoryLogView:
+        """thought记忆，从新到旧"""
+        return MemoryLogView(self._thought_log)
+
+    @property
+    def chat_list(self) -> MemoryLogView:
+        """chat-related memory, newest first"""
+        return MemoryLogView(self._chat_log)
+
+    @field_serializer("embeddings")
+    def serialize_embeddings(self, embeddings: dict[str, Any]) -> dict[str, list[float]]:
+        return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in embeddings.items()}
+
+    def get_by_id(self, memory_id: str) -> Optional[BasicMemory]:
+        return self._id_index.get(memory_id)
 
     def set_mem_path(self, memory_saved: Path):
         self.memory_saved = memory_saved
@@ -121,17 +195,27 @@ class AgentMemory(Memory):
 
     def save(self, memory_saved: Path):
         """
-        将MemoryBasic类存储为Nodes.json形式。复现GA中的Kw Strength.json形式
-        这里添加一个路径即可
-        TODO 这里在存储时候进行倒序存储，之后需要验证（test_memory通过）
+        将记忆增量存储为列存格式：节点元数据存于SQLite(nodes.db)，embedding存于可内存映射的embeddings.npy
+        只写入上次存储之后新增的节点
+        """
+        memory_storage.save(
+            memory_saved,
+            self.storage,
+            self.embeddings,
+            {"event": self.kw_strength_event, "thought": self.kw_strength_thought},
+        )
+
+    def save_json(self, memory_saved: Path):
+        """
+        导出为GA的JSON格式(nodes.json, embeddings.json, kw_strength.json)，供GA的工具读取，节点倒序存储
+        列存格式不会更新这些文件，避免同目录下遗留过期的JSON
         """
         memory_json = dict()
-        for i in range(len(self.storage)):
-            memory_node = self.storage[len(self.storage) - i - 1]
-            memory_node = memory_node.save_to_dict()
-            memory_json.update(memory_node)
+        for memory_node in reversed(self.storage):
+            memory_json.update(memory_node.save_to_dict())
         write_json_file(memory_saved.joinpath("nodes.json"), memory_json)
-        write_json_file(memory_saved.joinpath("embeddings.json"), self.embeddings)
+        embeddings = {key: np.asarray(val).tolist() for key, val in self.embeddings.items()}
+        write_json_file(memory_saved.joinpath("embeddings.json"), embeddings)
 
         strength_json = dict()
         strength_json["kw_strength_event"] = self.kw_strength_event
@@ -139,6 +223,49 @@ class AgentMemory(Memory):
         write_json_file(memory_saved.joinpath("kw_strength.json"), strength_json)
 
     def load(self, memory_saved: Path):
+        """
+        优先加载列存格式，embedding以只读内存映射方式加载，不进行拷贝；不存在时兼容GA的JSON格式
+        """
+        if memory_storage.exists(memory_saved):
+            self._load_columnar(memory_saved)
+        else:
+            self._load_json(memory_saved)
+        embedding_service.warm(self.embeddings)
+
+    def _load_columnar(self, memory_saved: Path):
+        nodes, self.embeddings, kw_strength = memory_storage.load(memory_saved)
+        self.add_nodes(nodes)
+
+        if kw_strength.get("event"):
+            self.kw_strength_event = kw_strength["event"]
+        if kw_strength.get("thought"):
+            self.kw_strength_thought = kw_strength["thought"]
+
+    def add_nodes(self, nodes: list[dict]):
+        """
+        按顺序重新加入`memory_storage`格式的节点，其embedding需已在self.embeddings中
+        """
+        for node in nodes:
+            args = (
+                node["created"],
+                node["expiration"],
+                node["subject"],
+                node["predicate"],
+                node["object"],
+                node["description"],
+                node["keywords"],
+                node["poignancy"],
+                (node["embedding_key"], self.embeddings[node["embedding_key"]]),
+                node["filling"],
+            )
+            if node["memory_type"] == "thought":
+                self.add_thought(*args)
+            if node["memory_type"] == "event":
+                self.add_event(*args)
+            if node["memory_type"] == "chat":
+                self.add_chat(*args, cause_by=node["cause_by"] or "")
+
+    def _load_json(self, memory_saved: Path):
         """
         将GA的JSON解析，填充到AgentMemory类之中
         """
@@ -182,17 +309,18 @@ class AgentMemory(Memory):
         Add a new message to storage, while updating the index
         重写add方法，修改原有的Message类为BasicMemory类，并添加不同的记忆类型添加方式
         """
-        if memory_basic.memory_id in self.storage:
+        if memory_basic.memory_id in self._id_index:
             return
         self.storage.append(memory_basic)
+        self._id_index[memory_basic.memory_id] = memory_basic
         if memory_basic.memory_type == "chat":
-            self.chat_list[0:0] = [memory_basic]
+            self._chat_log.append(memory_basic)
             return
         if memory_basic.memory_type == "thought":
-            self.thought_list[0:0] = [memory_basic]
+            self._thought_log.append(memory_basic)
             return
         if memory_basic.memory_type == "event":
-            self.event_list[0:0] = [memory_basic]
+            self._event_log.append(memory_basic)
             return
 
     def add_chat(
@@ -228,10 +356,7 @@ class AgentMemory(Memory):
 
         keywords = [i.lower() for i in keywords]
         for kw in keywords:
-            if kw in self.chat_keywords:
-                self.chat_keywords[kw][0:0] = [memory_node]
-            else:
-                self.chat_keywords[kw] = [memory_node]
+            self.chat_keywords.setdefault(kw, []).append(memory_node)
 
         self.add(memory_node)
 
@@ -250,7 +375,7 @@ class AgentMemory(Memory):
 
         try:
             if filling:
-                depth_list = [memory_node.depth for memory_node in self.storage if memory_node.memory_id in filling]
+                depth_list = [self._id_index[i].depth for i in filling if i in self._id_index]
                 depth += max(depth_list)
         except Exception as exp:
             logger.warning(f"filling init occur {exp}")
@@ -276,10 +401,7 @@ class AgentMemory(Memory):
 
         keywords = [i.lower() for i in keywords]
         for kw in keywords:
-            if kw in self.thought_keywords:
-                self.thought_keywords[kw][0:0] = [memory_node]
-            else:
-                self.thought_keywords[kw] = [memory_node]
+            self.thought_keywords.setdefault(kw, []).append(memory_node)
 
         self.add(memory_node)
 
@@ -326,10 +448,7 @@ class AgentMemory(Memory):
 
         keywords = [i.lower() for i in keywords]
         for kw in keywords:
-            if kw in self.event_keywords:
-                self.event_keywords[kw][0:0] = [memory_node]
-            else:
-                self.event_keywords[kw] = [memory_node]
+            self.event_keywords.setdefault(kw, []).append(memory_node)
 
         self.add(memory_node)
 
@@ -344,35 +463,22 @@ class AgentMemory(Memory):
         return memory_node
 
     def get_summarized_latest_events(self, retention):
-        ret_set = set()
-        for e_node in self.event_list[:retention]:
-            ret_set.add(e_node.summary())
-        return ret_set
+        return {e_node.summary() for e_node in self._event_log[-retention:]} if retention > 0 else set()
 
     def get_last_chat(self, target_role_name: str):
         if target_role_name.lower() in self.chat_keywords:
-            return self.chat_keywords[target_role_name.lower()][0]
+            return self.chat_keywords[target_role_name.lower()][-1]
         else:
             return False
 
     def retrieve_relevant_thoughts(self, s_content: str, p_content: str, o_content: str) -> set:
-        contents = [s_content, p_content, o_content]
-
-        ret = []
-        for i in contents:
-            if i in self.thought_keywords:
-                ret += self.thought_keywords[i.lower()]
-
-        ret = set(ret)
+        ret = set()
+        for i in [s_content, p_content, o_content]:
+            ret.update(self.thought_keywords.get(i, []))
         return ret
 
     def retrieve_relevant_events(self, s_content: str, p_content: str, o_content: str) -> set:
-        contents = [s_content, p_content, o_content]
-
-        ret = []
-        for i in contents:
-            if i in self.event_keywords:
-                ret += self.event_keywords[i]
-
-        ret = set(ret)
+        ret = set()
+        for i in [s_content, p_content, o_content]:
+            ret.update(self.event_keywords.get(i, []))
         return ret
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : delta checkpoints of the StanfordTown roles, a base snapshot plus the changes of every checkpoint since
+
+import asyncio
+import copy
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from metagpt.ext.stanford_town.memory import memory_storage
+from metagpt.ext.stanford_town.memory.agent_memory import AgentMemory
+from metagpt.ext.stanford_town.memory.scratch import Scratch
+from metagpt.ext.stanford_town.memory.spatial_memory import MemoryTree
+from metagpt.ext.stanford_town.utils.const import STORAGE_PATH
+from metagpt.logs import logger
+from metagpt.utils.common import read_json_file, write_json_file
+
+MANIFEST_FILENAME = "manifest.json"
+TIME_FORMAT = "%B %d, %Y, %H:%M:%S"
+
+
+class RoleCheckpointState:
+    """What a role had at its last checkpoint, the next delta holds the changes since."""
+
+    def __init__(self, role: "STRole"):
+        memory = role.rc.memory
+        self.memory_count = len(memory.storage)
+        self.kw_strength = {"event": dict(memory.kw_strength_event), "thought": dict(memory.kw_strength_thought)}
+        self.scratch = role.rc.scratch.model_dump(mode="json")
+        role.rc.spatial_memory.pop_added_tiles()
+
+
+class SimCheckpointer:
+    """
+    Delta checkpoints of the roles of a simulation under `storage/{sim_code}/checkpoints`:
+        manifest.json           the base snapshot and the deltas on top of it, in order
+        base_{step}/{role}/     a full snapshot, as `associative_memory`, `spatial_memory.json`, `scratch.json` and
+                                `role.json`
+        delta_{step}.json.gz    the new memory nodes, the changed keyword strengths and scratch fields, the added
+                                spatial tiles and the step state of every role since the previous checkpoint
+
+    A checkpoint is captured between two steps, when the roles do not change, and written by a background thread while
+    the next step runs. The manifest is only updated after a file is complete, so a crash loses the pending checkpoint
+    at most. After `max_deltas` deltas the next checkpoint writes a new base snapshot instead.
+
+    The checkpoints of a previous run which is not resumed are moved aside as `checkpoints.{time}`, of which the latest
+    `max_rotated` are kept.
+    """
+
+    def __init__(self, sim_code: str, max_deltas: int = 100, max_rotated: int = 3):
+        self.sim_code = sim_code
+        self.max_deltas = max_deltas
+        self.max_rotated = max_rotated
+        self.checkpoint_path = STORAGE_PATH.joinpath(f"{sim_code}/checkpoints")
+        self.manifest: Optional[dict] = None
+        self._states: dict[str, RoleCheckpointState] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self._write_failed = False  # a checkpoint is lost, the next one writes a new base
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.checkpoint_path.joinpath(MANIFEST_FILENAME)
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    async def start(self, roles: list["STRole"]):
+        """Starts to track the roles, a base snapshot is written unless the roles were restored from one."""
+        if self.manifest is None:
+            if self.checkpoint_path.exists():
+                # the checkpoints of a previous run which is not resumed, kept aside instead of being overwritten
+                rotated_path = self.checkpoint_path.with_name(
+                    f"{self.checkpoint_path.name}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+                )
+                self.checkpoint_path.rename(rotated_path)
+                logger.warning(f"the checkpoints of a previous run are moved to {rotated_path}")
+                await asyncio.to_thread(self._prune_rotated)
+            await self._write_base(roles)
+        elif not self._states:
+            self._states = {role.name: RoleCheckpointState(role) for role in roles}
+
+    def _prune_rotated(self):
+        """Removes the rotated checkpoints except the latest `max_rotated`, the names sort by time."""
+        rotated_paths = sorted(self.checkpoint_path.parent.glob(f"{self.checkpoint_path.name}.*"))
+        for path in rotated_paths[: max(len(rotated_paths) - self.max_rotated, 0)]:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"remove the rotated checkpoints {path}")
+
+    async def checkpoint(self, roles: list["STRole"]):
+        """Captures the changes of the roles since the last checkpoint, and writes them in the background."""
+        if self.manifest is None:
+            await self.start(roles)
+            return
+        if len(self.manifest["deltas"]) >= self.max_deltas or self._write_failed:
+            await self._write_base(roles)
+            return
+
+        step = max(role.step for role in roles)
+        delta = {"step": step, "roles": {role.name: self._capture(role) for role in roles}}
+        self.manifest = {**self.manifest, "deltas": self.manifest["deltas"] + [_delta_filename(step)]}
+        self._write_later(self._write_delta, delta, self.manifest)
+
+    async def wait(self):
+        """Waits for the pending writes."""
+        if self._write_task is not None:
+            await self._write_task
+
+    def restore(self, roles: list["STRole"]):
+        """Rebuilds the state of the roles from the base snapshot and the deltas of the manifest."""
+        self.manifest = read_json_file(self.manifest_path)
+        base_path = self.checkpoint_path.joinpath(self.manifest["base"])
+        for role in roles:
+            _load_role(role, base_path.joinpath(role.name))
+
+        roles_by_name = {role.name: role for role in roles}
+        for delta_filename in self.manifest["deltas"]:
+            with gzip.open(self.checkpoint_path.joinpath(delta_filename), "rt", encoding="utf-8") as f:
+                delta = json.load(f)
+            for name, role_delta in delta["roles"].items():
+                if name in roles_by_name:
+                    _apply_delta(roles_by_name[name], role_delta)
+        logger.info(
+            f"restore {len(roles)} roles from {self.manifest['base']} and {len(self.manifest['deltas'])} deltas "
+            f"under {self.checkpoint_path}"
+        )
+
+    def _capture(self, role: "STRole") -> dict:
+        state = self._states.get(role.name)
+        if state is None:
+            state = self._states[role.name] = RoleCheckpointState(role)
+        memory = role.rc.memory
+        new_nodes = memory.storage[state.memory_count :]
+        kw_strength = {"event": memory.kw_strength_event, "thought": memory.kw_strength_thought}
+        scratch = role.rc.scratch.model_dump(mode="json")
+
+        role_delta = {
+            "nodes": [memory_storage.node_to_row(i) for i in new_nodes],
+            "embeddings": {i.embedding_key: np.asarray(memory.embeddings[i.embedding_key]).tolist() for i in new_nodes},
+            "kw_strength": {key: _get_changes(state.kw_strength[key], val) for key, val in kw_strength.items()},
+            "scratch": _get_changes(state.scratch, scratch),
+            "spatial_tiles": role.rc.spatial_memory.pop_added_tiles(),
+            "role": _dump_role_state(role),
+        }
+
+        state.memory_count = len(memory.storage)
+        for memory_type, kws in role_delta["kw_strength"].items():
+            state.kw_strength[memory_type].update(kws)
+        state.scratch = scratch
+        return role_delta
+
+    async def _write_base(self, roles: list["STRole"]):
+        """Captures a full snapshot of the roles as a new base, and writes it in the background."""
+        await self.wait()  # the pending deltas decide whether the checkpoints on disk are intact
+        step = max(role.step for role in roles)
+        base = f"base_{step:06d}"
+        role_dumps = {role.name: _dump_role(role) for role in roles}
+        self._states = {role.name: RoleCheckpointState(role) for role in roles}
+        self.manifest = {"base": base, "deltas": []}
+        self._write_failed = False
+        self._write_later(self._write_base_files, step, role_dumps, self.manifest)
+
+    def _write_base_files(self, step: int, role_dumps: dict[str, dict], manifest: dict):
+        """Writes the base snapshot, and drops the previous base and its deltas once the manifest points to it."""
+        base_path = self.checkpoint_path.joinpath(manifest["base"])
+        prev_manifest = read_json_file(self.manifest_path) if self.manifest_path.exists() else None
+        if not prev_manifest or prev_manifest["base"] != manifest["base"]:
+            shutil.rmtree(base_path, ignore_errors=True)
+        if prev_manifest and prev_manifest["base"] != manifest["base"]:
+            # start from a copy of the previous base, so that only the new memory nodes are written
+            shutil.copytree(self.checkpoint_path.joinpath(prev_manifest["base"]), base_path)
+        for name, role_dump in role_dumps.items():
+            _write_role(role_dump, base_path.joinpath(name))
+
+        _write_json_atomic(self.manifest_path, manifest)
+        for path in self.checkpoint_path.iterdir():
+            if not path.name.startswith(("base_", "delta_")) or path.name == manifest["base"]:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+        logger.info(f"save checkpoint base at step: {step}")
+
+    def _write_later(self, func, *args):
+        prev_task = self._write_task
+
+        async def _write():
+            if prev_task is not None:
+                await prev_task
+            if self._write_failed:
+                return
+            try:
+                await asyncio.to_thread(func, *args)
+            except Exception as exp:
+                logger.error(f"save checkpoint under {self.checkpoint_path} failed, exp: {exp}")
+                self._write_failed = True
+
+        self._write_task = asyncio.create_task(_write())
+
+    def _write_delta(self, delta: dict, manifest: dict):
+        delta_path = self.checkpoint_path.joinpath(_delta_filename(delta["step"]))
+        tmp_path = delta_path.with_name(f".{delta_path.name}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(delta, f, ensure_ascii=False)
+        os.replace(tmp_path, delta_path)
+        _write_json_atomic(self.manifest_path, manifest)
+        logger.info(f"save checkpoint delta at step: {delta['step']}")
+
+
+def _get_changes(prev: dict, curr: dict) -> dict:
+    return {key: val for key, val in curr.items() if key not in prev or prev[key] != val}
+
+
+def _delta_filename(step: int) -> str:
+    return f"delta_{step:06d}.json.gz"
+
+
+def _dump_role(role: "STRole") -> dict:
+    """What `_write_role` writes of the role, copied so that the next step can run while it is written."""
+    memory = role.rc.memory
+    return {
+        # the saved columns of the memory nodes and the embeddings do not change once added
+        "storage": list(memory.storage),
+        "embeddings": dict(memory.embeddings),
+        "kw_strength": {"event": dict(memory.kw_strength_event), "thought": dict(memory.kw_strength_thought)},
+        "spatial_memory": copy.deepcopy(role.rc.spatial_memory.tree),
+        "scratch": role.rc.scratch.model_dump(),
+        "role": _dump_role_state(role),
+    }
+
+
+def _write_role(role_dump: dict, role_path: Path):
+    memory_storage.save(
+        role_path.joinpath("associative_memory"),
+        role_dump["storage"],
+        role_dump["embeddings"],
+        role_dump["kw_strength"],
+    )
+    write_json_file(role_path.joinpath("spatial_memory.json"), role_dump["spatial_memory"])
+    write_json_file(role_path.joinpath("scratch.json"), role_dump["scratch"], encoding="utf-8")
+    write_json_file(role_path.joinpath("role.json"), role_dump["role"])
+
+
+def _load_role(role: "STRole", role_path: Path):
+    role.rc.memory = AgentMemory()
+    role.rc.memory.set_mem_path(role_path.joinpath("associative_memory"))
+    role.rc.spatial_memory = MemoryTree()
+    role.rc.spatial_memory.set_mem_path(f_saved=role_path.joinpath("spatial_memory.json"))
+    role.rc.scratch = Scratch.init_scratch_from_path(f_saved=role_path.joinpath("scratch.json"))
+    _load_role_state(role, read_json_file(role_path.joinpath("role.json")))
+
+
+def _apply_delta(role: "STRole", role_delta: dict):
+    memory = role.rc.memory
+    for key, embedding in role_delta["embeddings"].items():
+        memory.embeddings.setdefault(key, embedding)
+    nodes = [memory_storage.row_to_node(i) for i in role_delta["nodes"]]
+    memory.add_nodes([i for i in nodes if i["memory_count"] > len(memory.storage)])
+    memory.kw_strength_event.update(role_delta["kw_strength"]["event"])
+    memory.kw_strength_thought.update(role_delta["kw_strength"]["thought"])
+
+    if role_delta["scratch"]:
+        role.rc.scratch = Scratch(**{**role.rc.scratch.model_dump(mode="json"), **role_delta["scratch"]})
+    role.rc.spatial_memory.add_tiles(role_delta["spatial_tiles"])
+    role.rc.spatial_memory.pop_added_tiles()
+    _load_role_state(role, role_delta["role"])
+
+
+def _dump_role_state(role: "STRole") -> dict:
+    return {
+        "step": role.step,
+        "curr_time": role.curr_time.strftime(TIME_FORMAT) if role.curr_time else None,
+        "inner_voice": role.inner_voice,
+        "game_obj_cleanup": [[list(event), list(tile)] for event, tile in role.game_obj_cleanup.items()],
+    }
+
+
+def _load_role_state(role: "STRole", role_state: dict):
+    role.step = role_state["step"]
+    role.curr_time = datetime.strptime(role_state["curr_time"], TIME_FORMAT) if role_state["curr_time"] else None
+    role.inner_voice = role_state["inner_voice"]
+    role.game_obj_cleanup = {tuple(event): tuple(tile) for event, tile in role_state["game_obj_cleanup"]}
+
+
+def _write_json_atomic(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=4), encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : columnar persistence of AgentMemory, node metadata in SQLite and embeddings in a memory-mapped `.npy`
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+NODES_DB = "nodes.db"
+EMBEDDINGS_NPY = "embeddings.npy"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# fixed length of the `.npy` header, so that the shape can be rewritten in place when rows are appended
+NPY_HEADER_LEN = 128
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    memory_count INTEGER PRIMARY KEY,
+    memory_id TEXT,
+    memory_type TEXT,
+    type_count INTEGER,
+    depth INTEGER,
+    created TEXT,
+    expiration TEXT,
+    subject TEXT,
+    predicate TEXT,
+    object TEXT,
+    description TEXT,
+    embedding_key TEXT,
+    poignancy INTEGER,
+    keywords TEXT,
+    filling TEXT,
+    cause_by TEXT
+);
+CREATE TABLE IF NOT EXISTS embeddings (row INTEGER PRIMARY KEY, key TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS kw_strength (
+    memory_type TEXT,
+    keyword TEXT,
+    strength INTEGER,
+    PRIMARY KEY (memory_type, keyword)
+);
+"""
+
+NODE_COLUMNS = [
+    "memory_count",
+    "memory_id",
+    "memory_type",
+    "type_count",
+    "depth",
+    "created",
+    "expiration",
+    "subject",
+    "predicate",
+    "object",
+    "description",
+    "embedding_key",
+    "poignancy",
+    "keywords",
+    "filling",
+    "cause_by",
+]
+
+
+# the columns which tell apart the nodes of different memories, `memory_id` alone is the same "node_{count}" in all
+IDENTITY_COLUMNS = ["memory_id", "memory_type", "created", "description", "embedding_key"]
+
+
+def exists(memory_saved: Path) -> bool:
+    return memory_saved.joinpath(NODES_DB).exists()
+
+
+def save(memory_saved: Path, storage: list, embeddings: dict, kw_strength: dict[str, dict[str, int]]):
+    """
+    Saves the memory incrementally, only the nodes and the embeddings that are not in `memory_saved` yet are written.
+    The saved columns of a node do not change once it is added (`last_accessed` is not saved), so the saved rows are
+    kept as they are. If the first or the last saved node is not the one of `storage`, e.g. the memory of another
+    persona or a fork of the memory was saved here, the directory is written again from scratch, with a new `.npy`
+    which replaces the previous one only after the transaction is committed.
+
+    Args:
+        memory_saved: The directory of the memory.
+        storage: All the `BasicMemory` nodes, in the order they were added.
+        embeddings: The embedding of every `embedding_key`.
+        kw_strength: The keyword strengths by memory type, e.g. {"event": {...}, "thought": {...}}.
+    """
+    memory_saved.mkdir(parents=True, exist_ok=True)
+    npy_path = memory_saved.joinpath(EMBEDDINGS_NPY)
+    new_npy_path = None
+    with closing(sqlite3.connect(memory_saved.joinpath(NODES_DB))) as conn:
+        conn.executescript(SCHEMA)
+        n_saved = conn.execute("SELECT COALESCE(MAX(memory_count), 0) FROM nodes").fetchone()[0]
+        if n_saved and not _is_saved_prefix(conn, storage, n_saved):
+            # another memory was saved here before, start over, the saved rows still match the `.npy` until committed
+            conn.execute("DELETE FROM nodes")
+            conn.execute("DELETE FROM embeddings")
+            conn.execute("DELETE FROM kw_strength")
+            new_npy_path = npy_path.with_name(f".{npy_path.name}.tmp")
+            new_npy_path.unlink(missing_ok=True)
+            n_saved = 0
+
+        new_nodes = [i for i in storage if i.memory_count > n_saved]
+        conn.executemany(
+            f"INSERT OR REPLACE INTO nodes ({', '.join(NODE_COLUMNS)}) VALUES ({', '.join('?' * len(NODE_COLUMNS))})",
+            [node_to_row(i) for i in new_nodes],
+        )
+
+        saved_keys = {key for (key,) in conn.execute("SELECT key FROM embeddings")}
+        new_keys = list(dict.fromkeys(i.embedding_key for i in new_nodes if i.embedding_key not in saved_keys))
+        if new_keys:
+            _append_embeddings(new_npy_path or npy_path, len(saved_keys), [embeddings[key] for key in new_keys])
+            conn.executemany(
+                "INSERT INTO embeddings (row, key) VALUES (?, ?)",
+                [(len(saved_keys) + idx, key) for idx, key in enumerate(new_keys)],
+            )
+
+        conn.execute("DELETE FROM kw_strength")
+        conn.executemany(
+            "INSERT INTO kw_strength (memory_type, keyword, strength) VALUES (?, ?, ?)",
+            [(memory_type, kw, strength) for memory_type, kws in kw_strength.items() for kw, strength in kws.items()],
+        )
+        conn.commit()
+
+    if new_npy_path is not None:
+        if new_npy_path.exists():
+            os.replace(new_npy_path, npy_path)
+        else:
+            npy_path.unlink(missing_ok=True)  # no embeddings are saved
+
+
+def _is_saved_prefix(conn: sqlite3.Connection, storage: list, n_saved: int) -> bool:
+    """Whether the `n_saved` saved nodes are the first nodes of `storage`, by their first and last node."""
+    nodes = {i.memory_count: i for i in storage if i.memory_count in (1, n_saved)}
+    for memory_count in {1, n_saved}:
+        row = conn.execute(
+            f"SELECT {', '.join(IDENTITY_COLUMNS)} FROM nodes WHERE memory_count = ?", (memory_count,)
+        ).fetchone()
+        node = nodes.get(memory_count)
+        if row is None or node is None:
+            return False
+        node_row = dict(zip(NODE_COLUMNS, node_to_row(node)))
+        if tuple(node_row[column] for column in IDENTITY_COLUMNS) != tuple(row):
+            return False
+    return True
+
+
+def load(memory_saved: Path) -> tuple[list[dict], dict[str, np.ndarray], dict[str, dict[str, int]]]:
+    """
+    Loads the memory saved by `save`. The embeddings are rows of a read-only memory map, so they are not copied.
+
+    Returns:
+        The node dicts in the order they were added, the embeddings by key and the keyword strengths by memory type.
+    """
+    with closing(sqlite3.connect(memory_saved.joinpath(NODES_DB))) as conn:
+        rows = conn.execute(f"SELECT {', '.join(NODE_COLUMNS)} FROM nodes ORDER BY memory_count").fetchall()
+        keys = [key for (key,) in conn.execute("SELECT key FROM embeddings ORDER BY row")]
+        kw_strength = {}
+        for memory_type, kw, strength in conn.execute("SELECT memory_type, keyword, strength FROM kw_strength"):
+            kw_strength.setdefault(memory_type, {})[kw] = strength
+
+    embeddings = {}
+    if keys:
+        matrix = np.load(memory_saved.joinpath(EMBEDDINGS_NPY), mmap_mode="r")
+        embeddings = dict(zip(keys, matrix))
+    return [row_to_node(row) for row in rows], embeddings, kw_strength
+
+
+def node_to_row(memory_node) -> tuple:
+    return (
+        memory_node.memory_count,
+        memory_node.memory_id,
+        memory_node.memory_type,
+        memory_node.type_count,
+        memory_node.depth,
+        _format_time(memory_node.created),
+        _format_time(memory_node.expiration),
+        memory_node.subject,
+        memory_node.predicate,
+        memory_node.object,
+        memory_node.description,
+        memory_node.embedding_key,
+        memory_node.poignancy,
+        json.dumps(list(memory_node.keywords)),
+        json.dumps(memory_node.filling or []),
+        memory_node.cause_by,
+    )
+
+
+def row_to_node(row: tuple) -> dict:
+    node = dict(zip(NODE_COLUMNS, row))
+    node["created"] = _parse_time(node["created"])
+    node["expiration"] = _parse_time(node["expiration"])
+    node["keywords"] = set(json.loads(node["keywords"]))
+    node["filling"] = json.loads(node["filling"])
+    return node
+
+
+def _format_time(time: Optional[datetime]) -> Optional[str]:
+    return time.strftime(TIME_FORMAT) if time else None
+
+
+def _parse_time(time: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(time, TIME_FORMAT) if time else None
+
+
+def _append_embeddings(npy_path: Path, n_saved: int, vectors: list):
+    """Writes `vectors` after the first `n_saved` rows of the float32 `.npy` file and updates its shape in place."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    mode = "r+b" if npy_path.exists() and n_saved else "wb"
+    with open(npy_path, mode) as f:
+        f.seek(NPY_HEADER_LEN + n_saved * vectors.shape[1] * vectors.itemsize)
+        f.write(vectors.tobytes())
+        f.truncate()
+        f.seek(0)
+        f.write(_npy_header(n_saved + len(vectors), vectors.shape[1]))
+
+
+def _npy_header(rows: int, dim: int) -> bytes:
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": (rows, dim)}).encode("latin1")
+    header = header.ljust(NPY_HEADER_LEN - len(NPY_MAGIC) - 2 - 1) + b"\n"
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
@@ -3,83 +3,182 @@
 # @Desc   : Retrieve函数实现
 
 import datetime
+from typing import Optional
 
+import numpy as np
 from numpy import dot
 from numpy.linalg import norm
 
 from metagpt.ext.stanford_town.memory.agent_memory import BasicMemory
+from metagpt.ext.stanford_town.utils.embedding import aget_embedding, embedding_service
 from metagpt.ext.stanford_town.utils.utils import get_embedding
 
 
-def agent_retrieve(
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class RetrievalIndex:
+    """
+    Columnar view of memory nodes for retrieval.
+    Embeddings are kept in a contiguous float32 matrix with precomputed norms, poignancy, creation time and last
+    access time in arrays, so that all the nodes are scored for all the queries at once.
+    """
+
+    def __init__(self):
+        self.nodes: list[BasicMemory] = []
+        self.node_ids: dict[str, int] = {}  # memory_id -> row
+        self.n_synced = 0  # number of `AgentMemory.storage` nodes already visited by `sync`
+        self._size = 0
+        self._embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._poignancy = np.zeros(0, dtype=np.float32)
+        self._created = np.zeros(0, dtype=np.float64)  # seconds since EPOCH
+        self._last_accessed = np.zeros(0, dtype=np.float64)  # seconds since EPOCH
+
+    @classmethod
+    def from_nodes(cls, nodes: list[BasicMemory], embeddings: dict[str, list[float]]) -> "RetrievalIndex":
+        index = cls()
+        index.add_nodes(nodes, embeddings)
+        return index
+
+    def sync(self, agent_memory) -> "RetrievalIndex":
+        """Incrementally indexes the event and thought nodes added to `agent_memory` since the last sync."""
+        storage = agent_memory.storage
+        new_nodes = [
+            i
+            for i in storage[self.n_synced :]
+            if i.memory_type in ("event", "thought") and "idle" not in i.embedding_key
+        ]
+        self.n_synced = len(storage)
+        self.add_nodes(new_nodes, agent_memory.embeddings)
+        return self
+
+    def add_nodes(self, nodes: list[BasicMemory], embeddings: dict[str, list[float]]):
+        if not nodes:
+            return
+        vectors = np.asarray([embeddings[i.embedding_key] for i in nodes], dtype=np.float32)
+        self._reserve(self._size + len(nodes), vectors.shape[1])
+        rows = slice(self._size, self._size + len(nodes))
+        self._embeddings[rows] = vectors
+        self._norms[rows] = np.linalg.norm(vectors, axis=1)
+        self._poignancy[rows] = [i.poignancy for i in nodes]
+        self._created[rows] = [_to_seconds(i.created) for i in nodes]
+        self._last_accessed[rows] = [_to_seconds(i.last_accessed) for i in nodes]
+        for i in nodes:
+            self.node_ids[i.memory_id] = len(self.nodes)
+            self.nodes.append(i)
+        self._size += len(nodes)
+
+    def score(
+        self, query_embeddings: list[list[float]], curr_time: datetime.datetime, memory_forget: float
+    ) -> np.ndarray:
+        """
+        Scores all the nodes for all the queries, importance, recency and relevance are each normalized to [0, 1].
+
+        Returns:
+            The (queries, nodes) matrix of the total scores.
+        """
+        size = self._size
+        poignancy = self._poignancy[:size]
+        importance = normalize_array_floats(poignancy, 0, 1)
+
+        day_count = np.floor((_to_seconds(curr_time) - self._created[:size]) / 86400)
+        recency = normalize_array_floats(np.power(memory_forget, day_count), 0, 1)
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        query_norms = np.linalg.norm(queries, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relevance = (queries @ self._embeddings[:size].T) / np.outer(query_norms, self._norms[:size])
+        relevance = normalize_array_floats(np.nan_to_num(relevance), 0, 1)
+
+        gw = [1, 1, 1]  # 三个因素的权重,重要性,近因性,相关性,
+        return importance * gw[0] + recency * gw[1] + relevance * gw[2]
+
+    def top_k(self, scores: np.ndarray, k: int) -> list[int]:
+        """Returns the rows of the `k` highest `scores`, the more recently accessed first on ties."""
+        if k <= 0 or not len(scores):
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        order = np.lexsort((-self._last_accessed[candidates], -scores[candidates]))
+        return candidates[order].tolist()
+
+    def touch(self, row: int, curr_time: datetime.datetime):
+        self.nodes[row].last_accessed = curr_time
+        self._last_accessed[row] = _to_seconds(curr_time)
+
+    def _reserve(self, capacity: int, dim: int):
+        """Grows the arrays geometrically, so that appending nodes is amortized O(1) per node."""
+        if capacity <= len(self._norms) and self._embeddings.shape[1] == dim:
+            return
+        new_capacity = max(capacity, 2 * len(self._norms), 64)
+        embeddings = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self._size:
+            embeddings[: self._size] = self._embeddings[: self._size]
+        self._embeddings = embeddings
+        self._norms = _grow(self._norms, new_capacity)
+        self._poignancy = _grow(self._poignancy, new_capacity)
+        self._created = _grow(self._created, new_capacity)
+        self._last_accessed = _grow(self._last_accessed, new_capacity)
+
+
+def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+    grown = np.zeros(capacity, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def _to_seconds(time: Optional[datetime.datetime]) -> float:
+    return (time - EPOCH).total_seconds() if time else 0.0
+
+
+def get_retrieval_index(agent_memory) -> RetrievalIndex:
+    """Returns the retrieval index of `agent_memory`, synced with its storage."""
+    index = agent_memory._retrieval_index
+    if index is None or index.n_synced > len(agent_memory.storage):
+        index = agent_memory._retrieval_index = RetrievalIndex()
+    return index.sync(agent_memory)
+
+
+async def agent_retrieve(
     agent_memory,
     curr_time: datetime.datetime,
     memory_forget: float,
     query: str,
     nodes: list[BasicMemory],
     topk: int = 4,
-) -> list[BasicMemory]:
+) -> list[str]:
     """
     Retrieve需要集合Role使用,原因在于Role才具有AgentMemory,scratch
     逻辑:Role调用该函数,self.rc.AgentMemory,self.rc.scratch.curr_time,self.rc.scratch.memory_forget
-    输入希望查询的内容与希望回顾的条数,返回TopK条高分记忆，即List[BasicMemory]
-
-    Score_lists示例
-    {
-        "memory": memories[i],             BasicMemory类
-        "importance": memories[i].poignancy
-        "recency": 衰减因子计算结果
-        "relevance": 搜索结果
-    }
-    """
-    memories = nodes
-    agent_memory_embedding = agent_memory.embeddings
-    memories = sorted(memories, key=lambda memory_node: memory_node.last_accessed, reverse=True)
-
-    score_list = []
-    score_list = extract_importance(memories, score_list)
-    score_list = extract_recency(curr_time, memory_forget, score_list)
-    score_list = extract_relevance(agent_memory_embedding, query, score_list)
-    score_list = normalize_score_floats(score_list, 0, 1)
-
-    total_dict = {}
-    gw = [1, 1, 1]  # 三个因素的权重,重要性,近因性,相关性,
-    for i in range(len(score_list)):
-        total_score = (
-            score_list[i]["importance"] * gw[0] + score_list[i]["recency"] * gw[1] + score_list[i]["relevance"] * gw[2]
-        )
-        total_dict[score_list[i]["memory"].memory_id] = total_score
-
-    result = top_highest_x_values(total_dict, topk)
+    输入希望查询的内容与希望回顾的条数,返回TopK条高分记忆的memory_id
 
-    return result  # 返回的是一个BasicMemory列表
+    总分 = 重要性(poignancy) + 近因性(衰减因子计算结果) + 相关性(余弦相似度)，三者分别归一化
+    """
+    index = RetrievalIndex.from_nodes(nodes, agent_memory.embeddings)
+    if not index.nodes:
+        return []
+    scores = index.score([await aget_embedding(query)], curr_time, memory_forget)[0]
+    return [index.nodes[i].memory_id for i in index.top_k(scores, topk)]
 
 
-def new_agent_retrieve(role, focus_points: list, n_count=30) -> dict:
+async def new_agent_retrieve(role, focus_points: list, n_count=30) -> dict:
     """
     输入为role，关注点列表,返回记忆数量
     输出为字典，键为focus_point，值为对应的记忆列表
+    所有关注点通过一次矩阵乘法完成打分
     """
-    retrieved = dict()
-    for focal_pt in focus_points:
-        nodes = [
-            [i.last_accessed, i]
-            for i in role.memory.event_list + role.memory.thought_list
-            if "idle" not in i.embedding_key
-        ]
-        nodes = sorted(nodes, key=lambda x: x[0])
-        nodes = [i for created, i in nodes]
-        results = agent_retrieve(
-            role.memory, role.scratch.curr_time, role.scratch.recency_decay, focal_pt, nodes, n_count
-        )
-        final_result = []
-        for n in results:
-            for i in role.memory.storage:
-                if i.memory_id == n:
-                    i.last_accessed = role.scratch.curr_time
-                    final_result.append(i)
-
-        retrieved[focal_pt] = final_result
+    retrieved = {focal_pt: [] for focal_pt in focus_points}
+    index = get_retrieval_index(role.memory)
+    if not index.nodes or not focus_points:
+        return retrieved
+
+    query_embeddings = await embedding_service.aget_embeddings(focus_points)
+    scores = index.score(query_embeddings, role.scratch.curr_time, role.scratch.recency_decay)
+    for focal_pt, focal_scores in zip(focus_points, scores):
+        rows = index.top_k(focal_scores, n_count)
+        for row in rows:
+            index.touch(row, role.scratch.curr_time)
+        retrieved[focal_pt] = [index.nodes[row] for row in rows]
 
     return retrieved
 
@@ -178,3 +277,14 @@ def normalize_score_floats(score_list, target_min, target_max):
         score_list[i]["recency"] = recency_list[i]
 
     return score_list
+
+
+def normalize_array_floats(array: np.ndarray, target_min, target_max) -> np.ndarray:
+    """
+    按最后一维归一化，与 normalize_list_floats 一致：取值全部相同时归一化为区间的一半
+    """
+    min_val = array.min(axis=-1, keepdims=True)
+    range_val = array.max(axis=-1, keepdims=True) - min_val
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = (array - min_val) * (target_max - target_min) / range_val + target_min
+    return np.where(range_val == 0, (target_max - target_min) / 2, normalized)
@@ -7,15 +7,19 @@ memory that aids in grounding their behavior in the game world.
 """
 from pathlib import Path
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from metagpt.logs import logger
 from metagpt.utils.common import read_json_file, write_json_file
 
+TILE_INFO_KEYS = ["world", "sector", "arena", "game_object"]
+
 
 class MemoryTree(BaseModel):
     tree: dict = Field(default=dict)
 
+    _added_tiles: list[tuple] = PrivateAttr(default_factory=list)  # tile infos which changed the tree, in order
+
     def set_mem_path(self, f_saved: Path):
         self.tree = read_json_file(f_saved)
 
@@ -102,15 +106,31 @@ class MemoryTree(BaseModel):
         return x
 
     def add_tile_info(self, tile_info: dict) -> None:
+        changed = False
         if tile_info["world"]:
             if tile_info["world"] not in self.tree:
                 self.tree[tile_info["world"]] = {}
+                changed = True
         if tile_info["sector"]:
             if tile_info["sector"] not in self.tree[tile_info["world"]]:
                 self.tree[tile_info["world"]][tile_info["sector"]] = {}
+                changed = True
         if tile_info["arena"]:
             if tile_info["arena"] not in self.tree[tile_info["world"]][tile_info["sector"]]:
                 self.tree[tile_info["world"]][tile_info["sector"]][tile_info["arena"]] = []
+                changed = True
         if tile_info["game_object"]:
             if tile_info["game_object"] not in self.tree[tile_info["world"]][tile_info["sector"]][tile_info["arena"]]:
                 self.tree[tile_info["world"]][tile_info["sector"]][tile_info["arena"]] += [tile_info["game_object"]]
+                changed = True
+        if changed:
+            self._added_tiles.append(tuple(tile_info[i] for i in TILE_INFO_KEYS))
+
+    def pop_added_tiles(self) -> list[tuple]:
+        """Returns the (world, sector, arena, game_object) of the tiles which changed the tree since the last call."""
+        added_tiles, self._added_tiles = self._added_tiles, []
+        return added_tiles
+
+    def add_tiles(self, tiles: list[tuple]) -> None:
+        for tile in tiles:
+            self.add_tile_info(dict(zip(TILE_INFO_KEYS, tile)))
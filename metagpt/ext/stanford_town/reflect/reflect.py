@@ -2,8 +2,8 @@
 # -*- coding: utf-8 -*-
 # @Desc   : Reflect function
 
+import asyncio
 import datetime
-import time
 
 from metagpt.ext.stanford_town.actions.run_reflect_action import (
     AgentChatPoignancy,
@@ -15,7 +15,7 @@ from metagpt.ext.stanford_town.actions.run_reflect_action import (
     AgentPlanThoughtOnConvo,
 )
 from metagpt.ext.stanford_town.memory.retrieve import new_agent_retrieve
-from metagpt.ext.stanford_town.utils.utils import get_embedding
+from metagpt.ext.stanford_town.utils.embedding import aget_embedding
 from metagpt.logs import logger
 
 
@@ -80,6 +80,16 @@ async def generate_poig_score(role: "STRole", event_type: str, description: str)
         return await run_chat_poignancy.run(role, role.scratch.act_description)
 
 
+async def generate_thought_details(role: "STRole", thought: str, act_desp: str = None) -> tuple:
+    """Generates the (s, p, o) triple, the poignancy and the embedding of a thought concurrently."""
+    (s, p, o), thought_poignancy, thought_embedding = await asyncio.gather(
+        generate_action_event_triple(act_desp or thought, role),
+        generate_poig_score(role, "thought", thought),
+        aget_embedding(thought),
+    )
+    return s, p, o, thought_poignancy, (thought, thought_embedding)
+
+
 async def generate_planning_thought_on_convo(role: "STRole", all_utt: str):
     run_planning_on_convo = AgentPlanThoughtOnConvo()
     return await run_planning_on_convo.run(role, all_utt)
@@ -105,30 +115,32 @@ async def run_reflect(role: "STRole"):
     focal_points = await generate_focal_points(role, 3)
     # Retrieve the relevant Nodesobject for each of the focal points.
     # <retrieved> has keys of focal points, and values of the associated Nodes.
-    retrieved = new_agent_retrieve(role, focal_points)
+    retrieved = await new_agent_retrieve(role, focal_points)
 
     # For each of the focal points, generate thoughts and save it in the
-    # agent's memory.
+    # agent's memory. The focal points and the thoughts are generated concurrently,
+    # and saved in their original order.
     for focal_pt, nodes in retrieved.items():
         xx = [i.embedding_key for i in nodes]
         for xxx in xx:
             logger.info(f"Nodes retrieved for `{focal_pt}` are `{xxx}`.")
-
-        thoughts = await generate_insights_and_evidence(role, nodes, 5)
-        # 生成的是字典类型
-        for thought, evidence in thoughts.items():
-            created = role.scratch.curr_time
-            expiration = created + datetime.timedelta(days=30)
-            s, p, o = await generate_action_event_triple("(" + thought + ")", role)
-            keywords = set([s, p, o])
-            thought_poignancy = await generate_poig_score(role, "thought", thought)
-            thought_embedding_pair = (thought, get_embedding(thought))
-
-            role.memory.add_thought(
-                created, expiration, s, p, o, thought, keywords, thought_poignancy, thought_embedding_pair, evidence
-            )
-            logger.info(f"add thought memory: {thought}, evidence: {evidence}")
-            time.sleep(2)  # avoid Rate limit
+    focal_thoughts = await asyncio.gather(
+        *[generate_insights_and_evidence(role, nodes, 5) for nodes in retrieved.values()]
+    )
+    # 生成的是字典类型
+    thoughts = [(thought, evidence) for i in focal_thoughts for thought, evidence in i.items()]
+    thought_details = await asyncio.gather(
+        *[generate_thought_details(role, thought, "(" + thought + ")") for thought, _ in thoughts]
+    )
+
+    created = role.scratch.curr_time
+    expiration = created + datetime.timedelta(days=30)
+    for (thought, evidence), (s, p, o, thought_poignancy, thought_embedding_pair) in zip(thoughts, thought_details):
+        keywords = set([s, p, o])
+        role.memory.add_thought(
+            created, expiration, s, p, o, thought, keywords, thought_poignancy, thought_embedding_pair, evidence
+        )
+        logger.info(f"add thought memory: {thought}, evidence: {evidence}")
 
 
 def reflection_trigger(role: "STRole"):
@@ -147,7 +159,7 @@ def reflection_trigger(role: "STRole"):
     """
     logger.info(f"{role.scratch.name} role.scratch.importance_trigger_curr:: {role.scratch.importance_trigger_curr}"),
 
-    if role.scratch.importance_trigger_curr <= 0 and [] != role.memory.event_list + role.memory.thought_list:
+    if role.scratch.importance_trigger_curr <= 0 and (role.memory.event_list or role.memory.thought_list):
         return True
     return False
 
@@ -197,49 +209,31 @@ async def role_reflect(role: "STRole"):
                 logger.info(f"Role: {role.name} get_last_chat: {last_chat}")
                 return
 
-            planning_thought = await generate_planning_thought_on_convo(role, all_utt)
+            planning_thought, memo_thought = await asyncio.gather(
+                generate_planning_thought_on_convo(role, all_utt), generate_memo_on_convo(role, all_utt)
+            )
             planning_thought = f"For {role.scratch.name}'s planning: {planning_thought}"
             logger.info(f"Role: {role.name} planning_thought: {planning_thought}")
-
-            created = role.scratch.curr_time
-            expiration = created + datetime.timedelta(days=30)
-            s, p, o = await generate_action_event_triple(planning_thought, role)
-            keywords = set([s, p, o])
-            thought_poignancy = await generate_poig_score(role, "thought", planning_thought)
-            thought_embedding_pair = (planning_thought, get_embedding(planning_thought))
-
-            role.memory.add_thought(
-                created,
-                expiration,
-                s,
-                p,
-                o,
-                planning_thought,
-                keywords,
-                thought_poignancy,
-                thought_embedding_pair,
-                evidence,
-            )
-
-            memo_thought = await generate_memo_on_convo(role, all_utt)
             memo_thought = f"{role.scratch.name} {memo_thought}"
 
             created = role.scratch.curr_time
             expiration = created + datetime.timedelta(days=30)
-            s, p, o = await generate_action_event_triple(memo_thought, role)
-            keywords = set([s, p, o])
-            thought_poignancy = await generate_poig_score(role, "thought", memo_thought)
-            thought_embedding_pair = (memo_thought, get_embedding(memo_thought))
-
-            role.memory.add_thought(
-                created,
-                expiration,
-                s,
-                p,
-                o,
-                memo_thought,
-                keywords,
-                thought_poignancy,
-                thought_embedding_pair,
-                evidence,
+            thought_details = await asyncio.gather(
+                generate_thought_details(role, planning_thought), generate_thought_details(role, memo_thought)
             )
+            for thought, (s, p, o, thought_poignancy, thought_embedding_pair) in zip(
+                [planning_thought, memo_thought], thought_details
+            ):
+                keywords = set([s, p, o])
+                role.memory.add_thought(
+                    created,
+                    expiration,
+                    s,
+                    p,
+                    o,
+                    thought,
+                    keywords,
+                    thought_poignancy,
+                    thought_embedding_pair,
+                    evidence,
+                )
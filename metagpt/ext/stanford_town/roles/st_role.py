@@ -10,9 +10,11 @@ Do the steps following:
 - reflect, do the High-level thinking based on memories and re-add into the memory
 - execute, move or else in the Maze
 """
+import asyncio
 import math
 import random
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from operator import itemgetter
 from pathlib import Path
@@ -39,12 +41,14 @@ from metagpt.ext.stanford_town.memory.spatial_memory import MemoryTree
 from metagpt.ext.stanford_town.plan.st_plan import plan
 from metagpt.ext.stanford_town.reflect.reflect import generate_poig_score, role_reflect
 from metagpt.ext.stanford_town.utils.const import STORAGE_PATH, collision_block_id
+from metagpt.ext.stanford_town.utils.embedding import aget_embedding
 from metagpt.ext.stanford_town.utils.mg_ga_transform import (
     get_role_environment,
     save_environment,
     save_movement,
 )
-from metagpt.ext.stanford_town.utils.utils import get_embedding, path_finder
+from metagpt.ext.stanford_town.utils.path_finder import get_path_finder
+from metagpt.ext.stanford_town.utils.utils import path_finder
 from metagpt.logs import logger
 from metagpt.roles.role import Role, RoleContext
 from metagpt.schema import Message
@@ -79,6 +83,7 @@ class STRole(Role):
     has_inner_voice: bool = Field(default=False)
 
     role_storage_path: Optional[Path] = Field(default=None)
+    step_timings: dict[str, float] = Field(default_factory=dict, exclude=True)  # seconds of each phase of last step
 
     @field_validator("curr_time", mode="before")
     @classmethod
@@ -107,8 +112,13 @@ class STRole(Role):
     async def init_curr_tile(self):
         # init role
         role_env: dict = get_role_environment(self.sim_code, self.name, self.step)
-        pt_x = role_env["x"]
-        pt_y = role_env["y"]
+        if role_env:
+            pt_x, pt_y = role_env["x"], role_env["y"]
+        elif self.rc.scratch.curr_tile:
+            # restored from a checkpoint without the environment file of the step
+            pt_x, pt_y = self.rc.scratch.curr_tile
+        else:
+            raise ValueError(f"No environment of {self.name} at step {self.step} under {self.sim_code}")
         self.rc.scratch.curr_tile = (pt_x, pt_y)
 
         self.rc.env.step(
@@ -160,6 +170,7 @@ class STRole(Role):
         """
         memory_saved = self.role_storage_path.joinpath("bootstrap_memory/associative_memory")
         self.rc.memory.save(memory_saved)
+        self.rc.memory.save_json(memory_saved)  # keep the GA json of the memory up to date
 
         sp_mem_saved = self.role_storage_path.joinpath("bootstrap_memory/spatial_memory.json")
         self.rc.spatial_memory.save(sp_mem_saved)
@@ -205,7 +216,7 @@ class STRole(Role):
         s, p, o = await run_event_triple.run(thought, self)
         keywords = set([s, p, o])
         thought_poignancy = await generate_poig_score(self, "event", whisper)
-        thought_embedding_pair = (thought, get_embedding(thought))
+        thought_embedding_pair = (thought, await aget_embedding(thought))
         self.rc.memory.add_thought(
             created, expiration, s, p, o, thought, keywords, thought_poignancy, thought_embedding_pair, None
         )
@@ -227,25 +238,28 @@ class STRole(Role):
         """
         # PERCEIVE SPACE
         # We get the nearby tiles given our current tile and the persona's vision
-        # radius.
-        nearby_tiles = self.rc.env.observe(
+        # radius, and store the perceived space. Note that the s_mem of the persona
+        # is in the form of a tree constructed using dictionaries.
+        nearby_tiles_detail = self.rc.env.observe(
             EnvObsParams(
-                obs_type=EnvObsType.TILE_NBR, coord=self.rc.scratch.curr_tile, vision_radius=self.rc.scratch.vision_r
+                obs_type=EnvObsType.TILE_NBR_DETAIL,
+                coord=self.rc.scratch.curr_tile,
+                vision_radius=self.rc.scratch.vision_r,
             )
         )
-
-        # We then store the perceived space. Note that the s_mem of the persona is
-        # in the form of a tree constructed using dictionaries.
-        for tile in nearby_tiles:
-            tile_info = self.rc.env.observe(EnvObsParams(obs_type=EnvObsType.GET_TITLE, coord=tile))
+        for tile_info in nearby_tiles_detail:
             self.rc.spatial_memory.add_tile_info(tile_info)
 
         # PERCEIVE EVENTS.
         # We will perceive events that take place in the same arena as the
-        # persona's current arena.
-
-        curr_arena_path = self.rc.env.observe(
-            EnvObsParams(obs_type=EnvObsType.TILE_PATH, coord=self.rc.scratch.curr_tile, level="arena")
+        # persona's current arena. The env only visits the nearby tiles with events.
+        nearby_events = self.rc.env.observe(
+            EnvObsParams(
+                obs_type=EnvObsType.NBR_EVENTS,
+                coord=self.rc.scratch.curr_tile,
+                vision_radius=self.rc.scratch.vision_r,
+                level="arena",
+            )
         )
 
         # We do not perceive the same event twice (this can happen if an object is
@@ -256,22 +270,15 @@ class STRole(Role):
         percept_events_list = []
         # First, we put all events that are occurring in the nearby tiles into the
         # percept_events_list
-        for tile in nearby_tiles:
-            tile_details = self.rc.env.observe(EnvObsParams(obs_type=EnvObsType.GET_TITLE, coord=tile))
-            if tile_details["events"]:
-                tmp_arena_path = self.rc.env.observe(
-                    EnvObsParams(obs_type=EnvObsType.TILE_PATH, coord=tile, level="arena")
-                )
-
-                if tmp_arena_path == curr_arena_path:
-                    # This calculates the distance between the persona's current tile,
-                    # and the target tile.
-                    dist = math.dist([tile[0], tile[1]], [self.rc.scratch.curr_tile[0], self.rc.scratch.curr_tile[1]])
-                    # Add any relevant events to our temp set/list with the distant info.
-                    for event in tile_details["events"]:
-                        if event not in percept_events_set:
-                            percept_events_list += [[dist, event]]
-                            percept_events_set.add(event)
+        for tile, tile_events in nearby_events:
+            # This calculates the distance between the persona's current tile,
+            # and the target tile.
+            dist = math.dist([tile[0], tile[1]], [self.rc.scratch.curr_tile[0], self.rc.scratch.curr_tile[1]])
+            # Add any relevant events to our temp set/list with the distant info.
+            for event in tile_events:
+                if event not in percept_events_set:
+                    percept_events_list += [[dist, event]]
+                    percept_events_set.add(event)
 
         # We sort, and perceive only self.rc.scratch.att_bandwidth of the closest
         # events. If the bandwidth is larger, then it means the persona can perceive
@@ -314,14 +321,11 @@ class STRole(Role):
                 desc_embedding_in = desc
                 if "(" in desc:
                     desc_embedding_in = desc_embedding_in.split("(")[1].split(")")[0].strip()
-                if desc_embedding_in in self.rc.memory.embeddings:
-                    event_embedding = self.rc.memory.embeddings[desc_embedding_in]
-                else:
-                    event_embedding = get_embedding(desc_embedding_in)
+                # Get event embedding and poignancy concurrently.
+                event_embedding, event_poignancy = await asyncio.gather(
+                    self._get_embedding(desc_embedding_in), generate_poig_score(self, "event", desc_embedding_in)
+                )
                 event_embedding_pair = (desc_embedding_in, event_embedding)
-
-                # Get event poignancy.
-                event_poignancy = await generate_poig_score(self, "event", desc_embedding_in)
                 logger.debug(f"Role {self.name} event_poignancy: {event_poignancy}")
 
                 # If we observe the persona's self chat, we include that in the memory
@@ -329,12 +333,11 @@ class STRole(Role):
                 chat_node_ids = []
                 if p_event[0] == f"{self.name}" and p_event[1] == "chat with":
                     curr_event = self.rc.scratch.act_event
-                    if self.rc.scratch.act_description in self.rc.memory.embeddings:
-                        chat_embedding = self.rc.memory.embeddings[self.rc.scratch.act_description]
-                    else:
-                        chat_embedding = get_embedding(self.rc.scratch.act_description)
+                    chat_embedding, chat_poignancy = await asyncio.gather(
+                        self._get_embedding(self.rc.scratch.act_description),
+                        generate_poig_score(self, "chat", self.rc.scratch.act_description),
+                    )
                     chat_embedding_pair = (self.rc.scratch.act_description, chat_embedding)
-                    chat_poignancy = await generate_poig_score(self, "chat", self.rc.scratch.act_description)
                     chat_node = self.rc.memory.add_chat(
                         self.rc.scratch.curr_time,
                         None,
@@ -369,6 +372,11 @@ class STRole(Role):
 
         return ret_events
 
+    async def _get_embedding(self, text: str) -> list[float]:
+        if text in self.rc.memory.embeddings:
+            return self.rc.memory.embeddings[text]
+        return await aget_embedding(text)
+
     def retrieve(self, observed: list) -> dict:
         # TODO retrieve memories from agent_memory
         retrieved = dict()
@@ -495,23 +503,13 @@ class STRole(Role):
             target_tiles = new_target_tiles
 
             # Now that we've identified the target tile, we find the shortest path to
-            # one of the target tiles.
-            curr_tile = self.rc.scratch.curr_tile
-            closest_target_tile = None
-            path = None
-            for i in target_tiles:
-                # path_finder takes a collision_mze and the curr_tile coordinate as
-                # an input, and returns a list of coordinate tuples that becomes the
-                # path.
-                # e.g., [(0, 1), (1, 1), (1, 2), (1, 3), (1, 4)...]
-                collision_maze = self.rc.env.observe()["collision_maze"]
-                curr_path = path_finder(collision_maze, curr_tile, i, collision_block_id)
-                if not closest_target_tile:
-                    closest_target_tile = i
-                    path = curr_path
-                elif len(curr_path) < len(path):
-                    closest_target_tile = i
-                    path = curr_path
+            # one of the target tiles. A single BFS from the curr_tile covers all of them,
+            # and returns a list of coordinate tuples that becomes the path.
+            # e.g., [(0, 1), (1, 1), (1, 2), (1, 3), (1, 4)...]
+            collision_maze = self.rc.env.observe()["collision_maze"]
+            _, path = get_path_finder(collision_maze, collision_block_id).find_closest_path(
+                self.rc.scratch.curr_tile, target_tiles
+            )
 
             # Actually setting the <planned_path> and <act_path_set>. We cut the
             # first element in the planned_path because it includes the curr_tile.
@@ -572,7 +570,7 @@ class STRole(Role):
             self.rc.scratch.curr_tile = new_tile
         else:
             ret = False
-            time.sleep(1)
+            await asyncio.sleep(1)
             logger.warning(
                 f"{self.sim_code}/environment/{self.step}.json not exist or parses failed, " f"sleep 1s and re-check"
             )
@@ -594,18 +592,24 @@ class STRole(Role):
         logger.info(f"Role: {self.name} new_day: {new_day}")
         self.rc.scratch.curr_time = self.curr_time
 
+        self.step_timings = {}
         # get maze_env from self.rc.env, and observe env info
-        observed = await self.observe()
+        with self._step_timer("observe"):
+            observed = await self.observe()
 
         # use self.rc.memory 's retrieve functions
-        retrieved = self.retrieve(observed)
+        with self._step_timer("retrieve"):
+            retrieved = self.retrieve(observed)
 
-        plans = await plan(self, self.rc.env.get_roles(), new_day, retrieved)
+        with self._step_timer("plan"):
+            plans = await plan(self, self.rc.env.get_roles(), new_day, retrieved)
 
-        await self.reflect()
+        with self._step_timer("reflect"):
+            await self.reflect()
 
         # feed-back into maze_env
-        next_tile, pronunciatio, description = await self.execute(plans)
+        with self._step_timer("execute"):
+            next_tile, pronunciatio, description = await self.execute(plans)
         role_move = {
             "movement": next_tile,
             "pronunciatio": pronunciatio,
@@ -621,5 +625,13 @@ class STRole(Role):
         self.curr_time += timedelta(seconds=self.sec_per_step)
         self.inner_voice = False
 
-        time.sleep(0.5)
+        logger.debug(f"Role: {self.name} step timings: {self.step_timings}")
         return DummyMessage()
+
+    @contextmanager
+    def _step_timer(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.step_timings[phase] = time.perf_counter() - start
@@ -2,18 +2,29 @@
 # -*- coding: utf-8 -*-
 # @Desc   : StanfordTown to works like SoftwareCompany
 
+import time
 from typing import Any, Optional
 
+from pydantic import PrivateAttr
+
 from metagpt.context import Context
 from metagpt.environment import StanfordTownEnv
+from metagpt.ext.stanford_town.actions.st_action import set_llm_concurrency
+from metagpt.ext.stanford_town.memory.checkpoint import SimCheckpointer
 from metagpt.ext.stanford_town.roles.st_role import STRole
 from metagpt.ext.stanford_town.utils.const import MAZE_ASSET_PATH
+from metagpt.ext.stanford_town.utils.mg_ga_transform import flush_step_snapshots
 from metagpt.logs import logger
 from metagpt.team import Team
 
 
 class StanfordTown(Team):
     env: Optional[StanfordTownEnv] = None
+    step_log: bool = False  # append the step snapshots to `steps.jsonl.gz` instead of per-step json files
+    max_llm_concurrency: int = 8  # the cap of the concurrent LLM calls of all the roles in a step, 0 means no cap
+    checkpoint_interval: int = 0  # write a delta checkpoint of the roles every n steps, 0 means no checkpoint
+
+    _checkpointer: Optional[SimCheckpointer] = PrivateAttr(default=None)
 
     def __init__(self, context: Context = None, **data: Any):
         super(Team, self).__init__(**data)
@@ -23,19 +34,37 @@ class StanfordTown(Team):
         else:
             self.env.context = ctx  # The `env` object is allocated by deserialization
 
-    async def hire(self, roles: list[STRole]):
+    async def hire(self, roles: list[STRole], resume: bool = False):
+        """
+        Args:
+            roles: The roles of the town.
+            resume: Restore the roles from the checkpoints of their simulation if there are any, see `SimCheckpointer`.
+        """
         logger.warning(f"The Town add {len(roles)} roles, and start to operate.")
+        if roles and (resume or self.checkpoint_interval > 0):
+            self._checkpointer = SimCheckpointer(roles[0].sim_code)
+            if resume and self._checkpointer.exists():
+                self._checkpointer.restore(roles)
         super().hire(roles)
         for role in roles:
             await role.init_curr_tile()
 
     async def run(self, n_round: int = 3):
         """Run company until target round or no money"""
+        set_llm_concurrency(self.max_llm_concurrency)
+        if self._checkpointer and self.checkpoint_interval > 0:
+            await self._checkpointer.start(list(self.env.get_roles().values()))
         while n_round > 0:
             n_round -= 1
             logger.debug(f"{n_round=}")
             self._check_balance()
-            await self.env.run()
+            start = time.perf_counter()
+            await self.env.run()  # the roles of a step run concurrently, and the step ends when all of them end
+            flush_step_snapshots(step_log=self.step_log)
+            self._log_step_timings(time.perf_counter() - start)
+            await self._checkpoint()
+        if self._checkpointer:
+            await self._checkpointer.wait()
 
         # save simulation result including environment and roles after all rounds
         roles = self.env.get_roles()
@@ -43,3 +72,26 @@ class StanfordTown(Team):
             role.save_into()
 
         return self.env.history
+
+    def _log_step_timings(self, elapsed: float):
+        role_timings = {name: role.step_timings for name, role in self.env.get_roles().items() if role.step_timings}
+        phase_timings = {}
+        for timings in role_timings.values():
+            for phase, seconds in timings.items():
+                phase_timings[phase] = max(phase_timings.get(phase, 0), seconds)
+        logger.info(
+            f"Town step took {elapsed:.2f}s, slowest role phases: "
+            + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in phase_timings.items())
+        )
+        for name, timings in role_timings.items():
+            logger.debug(
+                f"Role: {name} step took {sum(timings.values()):.2f}s, "
+                + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in timings.items())
+            )
+
+    async def _checkpoint(self):
+        if not self._checkpointer or self.checkpoint_interval <= 0:
+            return
+        roles = list(self.env.get_roles().values())
+        if max(role.step for role in roles) % self.checkpoint_interval == 0:
+            await self._checkpointer.checkpoint(roles)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : benchmark of the path finding of the persona movement on the_ville maze
+#           usage: python -m metagpt.ext.stanford_town.utils.benchmark_path_finder --steps 200
+
+import argparse
+import csv
+import json
+import random
+import time
+from collections import deque
+
+from metagpt.ext.stanford_town.utils.const import MAZE_ASSET_PATH
+from metagpt.ext.stanford_town.utils.path_finder import PathFinder
+
+COLLISION_BLOCK_ID = "32125"
+
+
+def load_collision_maze() -> list:
+    matrix_path = MAZE_ASSET_PATH.joinpath("matrix")
+    meta_info = json.loads(matrix_path.joinpath("maze_meta_info.json").read_text())
+    with open(matrix_path.joinpath("maze/collision_maze.csv")) as f:
+        tiles = [tile.strip() for tile in next(csv.reader(f))]
+    width = int(meta_info["maze_width"])
+    return [tiles[i : i + width] for i in range(0, len(tiles), width)]
+
+
+def bfs_path_length(maze: list, start: tuple[int, int], end: tuple[int, int]) -> int:
+    """The number of tiles of the shortest path by a plain BFS over the tiles, as the legacy path finder"""
+    height, width = len(maze), len(maze[0])
+    visited = {start: 1}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == end:
+            return visited[end]
+        for i, j in ((x, y - 1), (x - 1, y), (x, y + 1), (x + 1, y)):
+            if 0 <= i < width and 0 <= j < height and (i, j) not in visited and maze[j][i] != COLLISION_BLOCK_ID:
+                visited[(i, j)] = visited[(x, y)] + 1
+                queue.append((i, j))
+    return -1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200, help="the number of movement planning steps")
+    parser.add_argument("--destinations", type=int, default=20, help="the number of frequently visited addresses")
+    parser.add_argument("--candidates", type=int, default=4, help="the candidate tiles of an address")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    maze = load_collision_maze()
+    free = [(x, y) for y, row in enumerate(maze) for x, tile in enumerate(row) if tile != COLLISION_BLOCK_ID]
+    rng = random.Random(args.seed)
+    # each address (e.g. a bed or a cafe counter) has a few tiles, which the personas go to from anywhere
+    addresses = [rng.sample(free, args.candidates) for _ in range(args.destinations)]
+    steps = [(rng.choice(free), rng.choice(addresses)) for _ in range(args.steps)]
+
+    start_time = time.perf_counter()
+    expected = [min(bfs_path_length(maze, start, target) for target in targets) for start, targets in steps]
+    bfs_time = time.perf_counter() - start_time
+
+    path_finder = PathFinder(maze, COLLISION_BLOCK_ID)
+    start_time = time.perf_counter()
+    paths = [path_finder.find_closest_path(start, targets)[1] for start, targets in steps]
+    engine_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for start, targets in steps:
+        path_finder.find_closest_path(start, targets)
+    warm_time = time.perf_counter() - start_time
+
+    mismatches = sum(len(path) != length for path, length in zip(paths, expected) if length > 0)
+    print(f"the_ville {len(maze[0])}x{len(maze)}, {args.steps} steps to {args.destinations} addresses")
+    print(f"plain BFS per candidate:   {bfs_time:.3f}s")
+    print(f"PathFinder (cold cache):   {engine_time:.3f}s ({bfs_time / engine_time:.1f}x)")
+    print(f"PathFinder (warm cache):   {warm_time:.3f}s ({bfs_time / warm_time:.1f}x)")
+    print(f"path length mismatches:    {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
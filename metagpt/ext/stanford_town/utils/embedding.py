@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : async embedding service which batches, caches and de-duplicates the embedding requests of all the roles
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from openai import AsyncOpenAI
+
+from metagpt.config2 import config
+from metagpt.ext.stanford_town.utils.const import STORAGE_PATH
+from metagpt.logs import logger
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_CACHE_FILENAME = "embedding_cache.jsonl"
+
+
+class EmbeddingService:
+    """
+    Shared embedding service of the town.
+
+    Concurrent `aget_embedding` calls are coalesced into batched API calls by a short batching window, texts already
+    being embedded are awaited instead of being requested again, and the results are kept in a text -> vector cache
+    which is warmed from the `embeddings.json` of the loaded roles.
+
+    The embeddings requested from the API are also appended to `cache_path`, a JSON lines file next to the simulation
+    storage which is loaded on the first use, so that the query texts such as the focal points are not embedded again
+    by the next runs. `cache_path=None` keeps the cache in memory only. Under the event loop, the file is loaded and
+    appended by background threads, one append at a time so that the lines of concurrent batches do not interleave.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        max_batch_size: int = 64,
+        batch_window: float = 0.01,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        cache_path: Optional[Union[str, Path]] = STORAGE_PATH / EMBEDDING_CACHE_FILENAME,
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._cache: dict[str, list[float]] = {}
+        self._cache_loaded = False
+        self._load_task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+        self._client: Optional[AsyncOpenAI] = None
+        self._pending: dict[str, asyncio.Future] = {}  # texts waiting for the next batch
+        self._in_flight: dict[str, asyncio.Future] = {}  # texts waiting for a batch or an API call
+        self._flush_task: Optional[asyncio.Task] = None
+        self._batch_tasks: set[asyncio.Task] = set()  # keep references, the event loop only keeps weak ones
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=config.llm.api_key)
+        return self._client
+
+    @property
+    def cache(self) -> dict[str, list[float]]:
+        """The cache, loaded from `cache_path` in place on the first use, `aload_cache` loads it in a thread."""
+        if not self._cache_loaded:
+            self._merge_cache(self._read_cache())
+        return self._cache
+
+    async def aload_cache(self):
+        """Loads `cache_path` into the cache by a background thread, once."""
+        if self._cache_loaded:
+            return
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(asyncio.to_thread(self._read_cache))
+        embeddings = await asyncio.shield(self._load_task)
+        if not self._cache_loaded:
+            self._merge_cache(embeddings)
+
+    def add(self, text: str, embedding: list[float]):
+        """Caches the embedding of the normalized text, and appends it to the cache file."""
+        self.cache[text] = embedding
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._append_cache({text: embedding})  # no event loop to block
+            return
+        task = loop.create_task(asyncio.to_thread(self._append_cache, {text: embedding}))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    def _merge_cache(self, embeddings: dict[str, list[float]]):
+        # the embeddings cached before the load, e.g. by `warm`, are kept
+        self._cache_loaded = True
+        for text, embedding in embeddings.items():
+            self._cache.setdefault(text, embedding)
+
+    def _read_cache(self) -> dict[str, list[float]]:
+        embeddings = {}
+        if self.cache_path is None or not self.cache_path.exists():
+            return embeddings
+        num_broken = 0
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    num_broken += 1  # e.g. the last line of a crashed run
+                    continue
+                if entry.get("model") == self.model:
+                    embeddings.setdefault(entry["text"], entry["embedding"])
+        if num_broken:
+            logger.warning(f"Skipped {num_broken} broken lines of {self.cache_path}")
+        return embeddings
+
+    def _append_cache(self, embeddings: dict[str, list[float]]):
+        if self.cache_path is None:
+            return
+        lines = [
+            json.dumps({"model": self.model, "text": text, "embedding": embedding}) + "\n"
+            for text, embedding in embeddings.items()
+        ]
+        try:
+            with self._write_lock:
+                self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.cache_path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+        except OSError as exp:
+            logger.warning(f"Failed to persist {len(lines)} embeddings to {self.cache_path}: {exp}")
+
+    def warm(self, embeddings: dict[str, list[float]]):
+        """Adds the known embeddings, e.g. the ones of `embeddings.json`, to the cache, without loading `cache_path`."""
+        for text, embedding in embeddings.items():
+            self._cache.setdefault(self.normalize(text), embedding)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        text = text.replace("\n", " ")
+        return text if text else "this is blank"
+
+    async def aget_embedding(self, text: str) -> list[float]:
+        text = self.normalize(text)
+        await self.aload_cache()
+        embedding = self._cache.get(text)
+        if embedding is not None:
+            return embedding
+
+        future = self._in_flight.get(text)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[text] = future
+            self._pending[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+        # shield the shared future, so that a cancelled caller does not fail the other callers of the same text
+        return await asyncio.shield(future)
+
+    async def aget_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return list(await asyncio.gather(*[self.aget_embedding(i) for i in texts]))
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        while self._pending:
+            texts = list(self._pending)[: self.max_batch_size]
+            batch = {text: self._pending.pop(text) for text in texts}
+            task = asyncio.create_task(self._embed_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _embed_batch(self, batch: dict[str, asyncio.Future]):
+        texts = list(batch)
+        try:
+            embeddings = await self._create_embeddings(texts)
+        except Exception as exp:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exp)
+        else:
+            for text, embedding in zip(texts, embeddings):
+                self._cache[text] = embedding
+                if not batch[text].done():
+                    batch[text].set_result(embedding)
+            await asyncio.to_thread(self._append_cache, dict(zip(texts, embeddings)))
+        finally:
+            for text in texts:
+                self._in_flight.pop(text, None)
+
+    async def _create_embeddings(self, texts: list[str]) -> list[list[float]]:
+        for idx in range(self.max_retries):
+            try:
+                rsp = await self.client.embeddings.create(input=texts, model=self.model)
+                return [i.embedding for i in sorted(rsp.data, key=lambda x: x.index)]
+            except Exception as exp:
+                if idx == self.max_retries - 1:
+                    raise ValueError(f"get_embedding failed, exp: {exp}") from exp
+                logger.info(f"get_embedding failed, exp: {exp}, will retry.")
+                await asyncio.sleep(self.retry_delay * 2**idx)
+
+
+embedding_service = EmbeddingService()
+
+
+async def aget_embedding(text: str) -> list[float]:
+    return await embedding_service.aget_embedding(text)
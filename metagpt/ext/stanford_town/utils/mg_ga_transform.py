@@ -2,13 +2,19 @@
 # -*- coding: utf-8 -*-
 # @Desc   : data transform of mg <-> ga under storage
 
+import gzip
+import json
+import os
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from metagpt.ext.stanford_town.utils.const import STORAGE_PATH, TEMP_STORAGE_PATH
 from metagpt.logs import logger
 from metagpt.utils.common import read_json_file, write_json_file
 
+STEP_LOG_FILENAME = "steps.jsonl.gz"
+
 
 def get_reverie_meta(sim_code: str) -> dict:
     meta_file_path = STORAGE_PATH.joinpath(sim_code).joinpath("reverie/meta.json")
@@ -16,45 +22,160 @@ def get_reverie_meta(sim_code: str) -> dict:
     return reverie_meta
 
 
-def save_movement(role_name: str, role_move: dict, step: int, sim_code: str, curr_time: str):
-    movement_path = STORAGE_PATH.joinpath(f"{sim_code}/movement/{step}.json")
-    if not movement_path.parent.exists():
-        movement_path.parent.mkdir(exist_ok=True)
-    if movement_path.exists():
-        movement = read_json_file(movement_path)
-    else:
-        movement = {"persona": dict(), "meta": dict()}
-    movement["persona"][role_name] = role_move
-    movement["meta"]["curr_time"] = curr_time.strftime("%B %d, %Y, %H:%M:%S")
+class StepSnapshotWriter:
+    """
+    Collects the movement and environment snapshots of every role during a step in memory, and flushes each step
+    once, instead of a read-modify-write of `movement/{step}.json` and `environment/{step}.json` per role.
+
+    The snapshots are written atomically as the per-step files which the GA frontend replays, or appended to a single
+    gzip step log `steps.jsonl.gz` of the simulation, which `export_step_log` turns back into the per-step files.
+    """
+
+    def __init__(self):
+        self.movements: dict[tuple[str, int], dict] = {}  # (sim_code, step) -> movement
+        self.environments: dict[tuple[str, int], dict] = {}  # (sim_code, step) -> environment
+        self.latest_environments: dict[str, tuple[int, dict]] = {}  # sim_code -> latest flushed (step, environment)
+
+    def add_movement(self, role_name: str, role_move: dict, step: int, sim_code: str, curr_time: datetime):
+        movement = self.movements.setdefault((sim_code, step), {"persona": dict(), "meta": dict()})
+        movement["persona"][role_name] = role_move
+        movement["meta"]["curr_time"] = curr_time.strftime("%B %d, %Y, %H:%M:%S")
+
+    def add_environment(self, role_name: str, step: int, sim_code: str, movement: list[int]):
+        environment = self.environments.setdefault((sim_code, step), {})
+        environment[role_name] = {"maze": "the_ville", "x": movement[0], "y": movement[1]}
+
+    def get_environment(self, sim_code: str, step: int) -> Optional[dict]:
+        """Returns the environment of the step not persisted as a file yet, None if there is none."""
+        environment = self.environments.get((sim_code, step))
+        if environment is not None:
+            return environment
+        latest = self.latest_environments.get(sim_code)
+        if latest and latest[0] == step:
+            return latest[1]
+        return None
+
+    def flush(self, step_log: bool = False):
+        """
+        Persists the collected snapshots.
+
+        Args:
+            step_log: Append the snapshots to `steps.jsonl.gz` instead of writing the per-step json files.
+        """
+        movements, self.movements = self.movements, {}
+        environments, self.environments = self.environments, {}
+        for (sim_code, step), environment in environments.items():
+            latest = self.latest_environments.get(sim_code)
+            if not latest or latest[0] <= step:
+                self.latest_environments[sim_code] = (step, environment)
+
+        if step_log:
+            self._append_step_logs(movements, environments)
+            return
+
+        for (sim_code, step), movement in movements.items():
+            movement_path = STORAGE_PATH.joinpath(f"{sim_code}/movement/{step}.json")
+            if movement_path.exists():
+                movement["persona"] = {**read_json_file(movement_path)["persona"], **movement["persona"]}
+            _write_json_atomic(movement_path, movement)
+            logger.info(f"save_movement at step: {step}, curr_time: {movement['meta']['curr_time']}")
+        for (sim_code, step), environment in environments.items():
+            environment_path = STORAGE_PATH.joinpath(f"{sim_code}/environment/{step}.json")
+            if environment_path.exists():
+                environment = {**read_json_file(environment_path), **environment}
+            _write_json_atomic(environment_path, environment)
+            logger.info(f"save_environment at step: {step}")
+
+    @staticmethod
+    def _append_step_logs(movements: dict[tuple[str, int], dict], environments: dict[tuple[str, int], dict]):
+        records: dict[str, dict[int, dict]] = {}  # sim_code -> step -> record
+        for key in list(movements) + list(environments):
+            sim_code, step = key
+            records.setdefault(sim_code, {})[step] = {
+                "step": step,
+                "movement": movements.get(key),
+                "environment": environments.get(key),
+            }
+        for sim_code, steps in records.items():
+            step_log_path = STORAGE_PATH.joinpath(f"{sim_code}/{STEP_LOG_FILENAME}")
+            _append_step_log(step_log_path, [steps[i] for i in sorted(steps)])
+            logger.info(f"save step log at steps: {sorted(steps)}")
+
+
+step_snapshot_writer = StepSnapshotWriter()
 
-    write_json_file(movement_path, movement)
-    logger.info(f"save_movement at step: {step}, curr_time: {movement['meta']['curr_time']}")
+
+def save_movement(role_name: str, role_move: dict, step: int, sim_code: str, curr_time: str):
+    """Collects the role movement of the step, which is persisted by `flush_step_snapshots`."""
+    step_snapshot_writer.add_movement(role_name, role_move, step, sim_code, curr_time)
 
 
 def save_environment(role_name: str, step: int, sim_code: str, movement: list[int]):
-    environment_path = STORAGE_PATH.joinpath(f"{sim_code}/environment/{step}.json")
-    if not environment_path.parent.exists():
-        environment_path.parent.mkdir(exist_ok=True)
-    if environment_path.exists():
-        environment = read_json_file(environment_path)
-    else:
-        environment = {}
+    """Collects the role environment of the step, which is persisted by `flush_step_snapshots`."""
+    step_snapshot_writer.add_environment(role_name, step, sim_code, movement)
+
 
-    environment[role_name] = {"maze": "the_ville", "x": movement[0], "y": movement[1]}
-    write_json_file(environment_path, environment)
-    logger.info(f"save_environment at step: {step}")
+def flush_step_snapshots(step_log: bool = False):
+    step_snapshot_writer.flush(step_log=step_log)
 
 
 def get_role_environment(sim_code: str, role_name: str, step: int = 0) -> dict:
+    env_info = step_snapshot_writer.get_environment(sim_code, step)
     env_path = STORAGE_PATH.joinpath(f"{sim_code}/environment/{step}.json")
-    role_env = None
-    if env_path.exists():
+    if env_info is None and env_path.exists():
         env_info = read_json_file(env_path)
-        role_env = env_info.get(role_name, None)
+    if env_info is None:
+        env_info = read_step_log_environment(sim_code, step)
+    role_env = env_info.get(role_name, None) if env_info else None
 
     return role_env
 
 
+def read_step_log(sim_code: str) -> Iterator[dict]:
+    """Yields the step records of `steps.jsonl.gz`, with `step`, `movement` and `environment` keys."""
+    step_log_path = STORAGE_PATH.joinpath(f"{sim_code}/{STEP_LOG_FILENAME}")
+    if not step_log_path.exists():
+        return
+    with gzip.open(step_log_path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_step_log_environment(sim_code: str, step: int) -> Optional[dict]:
+    """Returns the environment of the step in `steps.jsonl.gz`, None if there is none."""
+    environment = None
+    for record in read_step_log(sim_code):
+        if record["step"] == step and record["environment"] is not None:
+            environment = {**(environment or {}), **record["environment"]}
+    return environment
+
+
+def export_step_log(sim_code: str):
+    """Writes the step log as the `movement/{step}.json` and `environment/{step}.json` files the frontend replays."""
+    for record in read_step_log(sim_code):
+        if record["movement"] is not None:
+            _write_json_atomic(STORAGE_PATH.joinpath(f"{sim_code}/movement/{record['step']}.json"), record["movement"])
+        if record["environment"] is not None:
+            environment_path = STORAGE_PATH.joinpath(f"{sim_code}/environment/{record['step']}.json")
+            _write_json_atomic(environment_path, record["environment"])
+
+
+def _append_step_log(step_log_path: Path, records: list[dict]):
+    step_log_path.parent.mkdir(parents=True, exist_ok=True)
+    # every append is a separate gzip member, gzip readers decompress the concatenated members as one stream
+    with gzip.open(step_log_path, "at", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _write_json_atomic(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=4), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
 def write_curr_sim_code(curr_sim_code: dict, temp_storage_path: Optional[Path] = None):
     if temp_storage_path is None:
         temp_storage_path = TEMP_STORAGE_PATH
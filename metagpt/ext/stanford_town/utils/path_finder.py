@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Desc   : BFS path finding over a NumPy occupancy grid of the maze
+
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+DISTANCE_FIELD_CACHE_SIZE = 256  # a field of the_ville is 56KB
+
+
+class PathFinder:
+    """
+    Path finding engine of a collision maze.
+
+    The occupancy grid is built once per maze. Shortest paths are read from BFS distance fields, which are expanded
+    as whole wavefronts with NumPy. As the 4-connected grid is undirected, a field is expanded from the destination
+    and cached per destination tile, so the frequently visited destinations are only expanded once whatever the
+    start tile is. All the coordinates are tiles in (x, y) form.
+    """
+
+    def __init__(self, collision_maze: list, collision_block_char: str, cache_size: int = DISTANCE_FIELD_CACHE_SIZE):
+        self.free = np.asarray(collision_maze) != collision_block_char
+        self.cache_size = cache_size
+        self._fields: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+
+    def distance_field(self, source: tuple[int, int]) -> np.ndarray:
+        """
+        Returns the number of steps from `source` to every tile, -1 for unreachable ones. The source tile itself is
+        always walkable.
+        """
+        source = (int(source[0]), int(source[1]))
+        field = self._fields.get(source)
+        if field is not None:
+            self._fields.move_to_end(source)
+            return field
+
+        free = self.free
+        field = np.full(free.shape, -1, dtype=np.int32)
+        frontier = np.zeros(free.shape, dtype=bool)
+        frontier[source[1], source[0]] = True
+        field[source[1], source[0]] = 0
+        steps = 0
+        while frontier.any():
+            steps += 1
+            expanded = np.zeros_like(frontier)
+            expanded[1:, :] |= frontier[:-1, :]
+            expanded[:-1, :] |= frontier[1:, :]
+            expanded[:, 1:] |= frontier[:, :-1]
+            expanded[:, :-1] |= frontier[:, 1:]
+            frontier = expanded & free & (field < 0)
+            field[frontier] = steps
+
+        self._fields[source] = field
+        if len(self._fields) > self.cache_size:
+            self._fields.popitem(last=False)
+        return field
+
+    def find_path(self, start: tuple[int, int], end: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Returns the shortest path from `start` to `end`, both included. As the legacy path finder, `[end]` is
+        returned if `end` can not be reached.
+        """
+        start = (int(start[0]), int(start[1]))
+        end = (int(end[0]), int(end[1]))
+        if start == end:
+            return [start]
+        if not self.free[end[1], end[0]]:
+            return [end]
+
+        # The grid is undirected, so the distance field of `end` also leads from `start` to `end`.
+        field = self.distance_field(end)
+        steps = self._steps_to_source(field, start)
+        if steps < 0:
+            return [end]
+        return [start] + self._descend(field, start, steps)
+
+    def find_closest_path(
+        self, start: tuple[int, int], targets: list[tuple[int, int]]
+    ) -> tuple[Optional[tuple[int, int]], list[tuple[int, int]]]:
+        """
+        Finds the target with the shortest path from `start`, from the cached distance fields of the targets.
+
+        Returns:
+            The closest target and the path to it. Ties are resolved in the order of `targets`. If no target can be
+            reached, the first target and `[target]` are returned, as the legacy path finder.
+        """
+        if not targets:
+            return None, []
+        start = (int(start[0]), int(start[1]))
+        closest_target, closest_field, closest_steps = None, None, -1
+        for target in targets:
+            target_tile = (int(target[0]), int(target[1]))
+            if target_tile == start:
+                return target, [start]
+            if not self.free[target_tile[1], target_tile[0]]:
+                continue
+            field = self.distance_field(target_tile)
+            steps = self._steps_to_source(field, start)
+            if steps >= 0 and (closest_target is None or steps < closest_steps):
+                closest_target, closest_field, closest_steps = target, field, steps
+        if closest_target is None:
+            return targets[0], [tuple(targets[0])]
+        return closest_target, [start] + self._descend(closest_field, start, closest_steps)
+
+    def _steps_to_source(self, field: np.ndarray, tile: tuple[int, int]) -> int:
+        """The steps from `tile` to the source of the field, -1 if it can not be reached."""
+        steps = field[tile[1], tile[0]]
+        if steps < 0:
+            # `tile` may be a collision tile, step off it through its closest free neighbor.
+            nbr_steps = [field[y, x] for x, y in self._neighbors(tile) if field[y, x] >= 0]
+            if not nbr_steps:
+                return -1
+            steps = min(nbr_steps) + 1
+        return int(steps)
+
+    def _descend(self, field: np.ndarray, tile: tuple[int, int], steps: int) -> list[tuple[int, int]]:
+        """Walks down the distance field from `tile`, which is `steps` away, to the source of the field."""
+        path = []
+        while steps > 0:
+            steps -= 1
+            for x, y in self._neighbors(tile):
+                if field[y, x] == steps:
+                    tile = (x, y)
+                    break
+            path.append(tile)
+        return path
+
+    def _neighbors(self, tile: tuple[int, int]) -> list[tuple[int, int]]:
+        x, y = tile
+        height, width = self.free.shape
+        candidates = [(x, y - 1), (x - 1, y), (x, y + 1), (x + 1, y)]
+        return [(i, j) for i, j in candidates if 0 <= i < width and 0 <= j < height]
+
+
+_path_finders: dict[int, tuple[list, str, PathFinder]] = {}
+
+
+def get_path_finder(collision_maze: list, collision_block_char: str) -> PathFinder:
+    """Returns the path finder of the maze, the occupancy grid and distance fields are reused across calls."""
+    cached = _path_finders.get(id(collision_maze))
+    if cached and cached[0] is collision_maze and cached[1] == collision_block_char:
+        return cached[2]
+    path_finder = PathFinder(collision_maze, collision_block_char)
+    # Keep a reference to the maze so that its id is not reused by another object.
+    _path_finders[id(collision_maze)] = (collision_maze, collision_block_char, path_finder)
+    return path_finder
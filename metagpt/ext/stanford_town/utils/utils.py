@@ -8,12 +8,15 @@ import json
 import os
 import shutil
 import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Union
 
 from openai import OpenAI
 
 from metagpt.config2 import config
+from metagpt.ext.stanford_town.utils.embedding import EMBEDDING_MODEL, embedding_service
+from metagpt.ext.stanford_town.utils.path_finder import get_path_finder
 from metagpt.logs import logger
 
 
@@ -47,21 +50,28 @@ def read_csv_to_list(curr_file: str, header=False, strip_trail=True):
         return analysis_list[0], analysis_list[1:]
 
 
-def get_embedding(text, model: str = "text-embedding-ada-002"):
-    text = text.replace("\n", " ")
-    embedding = None
-    if not text:
-        text = "this is blank"
+@lru_cache(maxsize=1)
+def _get_openai_client() -> OpenAI:
+    return OpenAI(api_key=config.llm.api_key)
+
+
+def get_embedding(text, model: str = EMBEDDING_MODEL):
+    """Blocking version of `embedding.aget_embedding`, prefer the latter under the event loop."""
+    text = embedding_service.normalize(text)
+    embedding = embedding_service.cache.get(text) if model == embedding_service.model else None
+    cached = embedding is not None
     for idx in range(3):
+        if embedding is not None:
+            break
         try:
-            embedding = (
-                OpenAI(api_key=config.llm.api_key).embeddings.create(input=[text], model=model).data[0].embedding
-            )
+            embedding = _get_openai_client().embeddings.create(input=[text], model=model).data[0].embedding
         except Exception as exp:
             logger.info(f"get_embedding failed, exp: {exp}, will retry.")
             time.sleep(5)
-    if not embedding:
+    if embedding is None:
         raise ValueError("get_embedding failed")
+    if not cached and model == embedding_service.model:
+        embedding_service.add(text, embedding)
     return embedding
 
 
@@ -87,87 +97,13 @@ def extract_first_json_dict(data_str: str) -> Union[None, dict]:
 
 
 def path_finder_v2(a, start, end, collision_block_char) -> list[int]:
-    def make_step(m, k):
-        for i in range(len(m)):
-            for j in range(len(m[i])):
-                if m[i][j] == k:
-                    if i > 0 and m[i - 1][j] == 0 and a[i - 1][j] == 0:
-                        m[i - 1][j] = k + 1
-                    if j > 0 and m[i][j - 1] == 0 and a[i][j - 1] == 0:
-                        m[i][j - 1] = k + 1
-                    if i < len(m) - 1 and m[i + 1][j] == 0 and a[i + 1][j] == 0:
-                        m[i + 1][j] = k + 1
-                    if j < len(m[i]) - 1 and m[i][j + 1] == 0 and a[i][j + 1] == 0:
-                        m[i][j + 1] = k + 1
-
-    new_maze = []
-    for row in a:
-        new_row = []
-        for j in row:
-            if j == collision_block_char:
-                new_row += [1]
-            else:
-                new_row += [0]
-        new_maze += [new_row]
-    a = new_maze
-
-    m = []
-    for i in range(len(a)):
-        m.append([])
-        for j in range(len(a[i])):
-            m[-1].append(0)
-    i, j = start
-    m[i][j] = 1
-
-    k = 0
-    except_handle = 150
-    while m[end[0]][end[1]] == 0:
-        k += 1
-        make_step(m, k)
-
-        if except_handle == 0:
-            break
-        except_handle -= 1
-
-    i, j = end
-    k = m[i][j]
-    the_path = [(i, j)]
-    while k > 1:
-        if i > 0 and m[i - 1][j] == k - 1:
-            i, j = i - 1, j
-            the_path.append((i, j))
-            k -= 1
-        elif j > 0 and m[i][j - 1] == k - 1:
-            i, j = i, j - 1
-            the_path.append((i, j))
-            k -= 1
-        elif i < len(m) - 1 and m[i + 1][j] == k - 1:
-            i, j = i + 1, j
-            the_path.append((i, j))
-            k -= 1
-        elif j < len(m[i]) - 1 and m[i][j + 1] == k - 1:
-            i, j = i, j + 1
-            the_path.append((i, j))
-            k -= 1
-
-    the_path.reverse()
-    return the_path
+    """Legacy entry in (row, col) form, see `PathFinder.find_path`."""
+    path = get_path_finder(a, collision_block_char).find_path((start[1], start[0]), (end[1], end[0]))
+    return [(i[1], i[0]) for i in path]
 
 
 def path_finder(collision_maze: list, start: list[int], end: list[int], collision_block_char: str) -> list[int]:
-    # EMERGENCY PATCH
-    start = (start[1], start[0])
-    end = (end[1], end[0])
-    # END EMERGENCY PATCH
-
-    path = path_finder_v2(collision_maze, start, end, collision_block_char)
-
-    new_path = []
-    for i in path:
-        new_path += [(i[1], i[0])]
-    path = new_path
-
-    return path
+    return get_path_finder(collision_maze, collision_block_char).find_path(start, end)
 
 
 def create_folder_if_not_there(curr_path):
@@ -43,6 +43,7 @@ from metagpt.rag.interface import NoEmbedding, RAGObject
 from metagpt.rag.parsers import OmniParse
 from metagpt.rag.retrievers.base import (
     DeletableRAGRetriever,
+    FilterableRAGRetriever,
     ModifiableRAGRetriever,
     PersistableRAGRetriever,
     QueryableRAGRetriever,
@@ -203,6 +204,25 @@ class SimpleEngine(RetrieverQueryEngine):
         self._try_reconstruct_obj(nodes)
         return nodes
 
+    async def aretrieve_with_filters(self, query: QueryType, filters: dict) -> list[NodeWithScore]:
+        """Retrieve only among nodes whose metadata match `filters`, so the top k is not wasted on other nodes."""
+        self._ensure_retriever_filterable()
+
+        query_bundle = QueryBundle(query) if isinstance(query, str) else query
+
+        nodes = await self.retriever.aretrieve_with_filters(query_bundle, filters)
+        nodes = self._apply_node_postprocessors(nodes, query_bundle=query_bundle)
+        self._try_reconstruct_obj(nodes)
+        return nodes
+
+    def get_nodes_by_metadata(self, filters: dict) -> list[NodeWithScore]:
+        """Exact lookup of nodes whose metadata match `filters`, without similarity search."""
+        self._ensure_retriever_filterable()
+
+        nodes = [NodeWithScore(node=node) for node in self.retriever.get_nodes_by_metadata(filters)]
+        self._try_reconstruct_obj(nodes)
+        return nodes
+
     def add_docs(self, input_files: List[Union[str, Path]]):
         """Add docs to retriever. retriever must has add_nodes func."""
         self._ensure_retriever_modifiable()
@@ -339,6 +359,9 @@ class SimpleEngine(RetrieverQueryEngine):
     def _ensure_retriever_deletable(self):
         self._ensure_retriever_of_type(DeletableRAGRetriever)
 
+    def _ensure_retriever_filterable(self):
+        self._ensure_retriever_of_type(FilterableRAGRetriever)
+
     def _ensure_retriever_of_type(self, required_type: BaseRetriever):
         """Ensure that self.retriever is required_type, or at least one of its components, if it's a SimpleHybridRetriever.
 
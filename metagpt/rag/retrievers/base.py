@@ -73,3 +73,21 @@ class DeletableRAGRetriever(RAGRetriever):
     @abstractmethod
     def clear(self, **kwargs) -> int:
         """To support deleting all nodes, must implement this func."""
+
+
+class FilterableRAGRetriever(RAGRetriever):
+    """Support metadata prefiltering."""
+
+    @classmethod
+    def __subclasshook__(cls, C):
+        if cls is FilterableRAGRetriever:
+            return check_methods(C, "aretrieve_with_filters", "get_nodes_by_metadata")
+        return NotImplemented
+
+    @abstractmethod
+    async def aretrieve_with_filters(self, query: QueryType, filters: dict) -> list[NodeWithScore]:
+        """To support similarity search restricted to nodes whose metadata match `filters`, must implement this func."""
+
+    @abstractmethod
+    def get_nodes_by_metadata(self, filters: dict) -> list[BaseNode]:
+        """To support exact lookup of nodes by metadata without similarity search, must implement this func."""
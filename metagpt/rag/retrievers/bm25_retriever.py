@@ -1,11 +1,18 @@
 """BM25 retriever."""
+import heapq
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 from llama_index.core import VectorStoreIndex
 from llama_index.core.callbacks.base import CallbackManager
 from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
-from llama_index.core.schema import BaseNode, IndexNode
+from llama_index.core.schema import (
+    BaseNode,
+    IndexNode,
+    NodeWithScore,
+    QueryBundle,
+    QueryType,
+)
 from llama_index.retrievers.bm25 import BM25Retriever
 from rank_bm25 import BM25Okapi
 
@@ -34,14 +41,20 @@ class DynamicBM25Retriever(BM25Retriever):
             verbose=verbose,
         )
         self._index = index
+        self._metadata_index: dict[str, dict[Any, list[int]]] = {}
 
     def add_nodes(self, nodes: list[BaseNode], **kwargs) -> None:
         """Support add nodes."""
 
+        start = len(self._nodes)
         self._nodes.extend(nodes)
         self._corpus = [self._tokenizer(node.get_content()) for node in self._nodes]
         self.bm25 = BM25Okapi(self._corpus)
 
+        for key, value_positions in self._metadata_index.items():
+            for pos in range(start, len(self._nodes)):
+                self._index_node_metadata(value_positions, key, pos)
+
         if self._index:
             self._index.insert_nodes(nodes, **kwargs)
 
@@ -61,6 +74,69 @@ class DynamicBM25Retriever(BM25Retriever):
 
         self._delete_json_files(kwargs.get("persist_dir"))
         self._nodes = []
+        self._metadata_index = {}
+
+    async def aretrieve_with_filters(self, query: QueryType, filters: dict) -> list[NodeWithScore]:
+        """Support metadata prefiltering, the top k is computed only among the nodes matching `filters`."""
+
+        positions = self._filter_positions(filters)
+        if not positions:
+            return []
+
+        query_str = query.query_str if isinstance(query, QueryBundle) else query
+        scores = self.bm25.get_batch_scores(self._tokenizer(query_str), positions)
+        top = heapq.nlargest(self._similarity_top_k, zip(scores, positions), key=lambda x: x[0])
+
+        return [NodeWithScore(node=self._nodes[pos], score=float(score)) for score, pos in top]
+
+    def get_nodes_by_metadata(self, filters: dict) -> list[BaseNode]:
+        """Support exact lookup by metadata, served from an inverted index instead of a similarity search."""
+
+        return [self._nodes[pos] for pos in self._filter_positions(filters)]
+
+    def backfill_metadata(self, get_metadata: Callable[[dict], dict]) -> int:
+        """Adds the fields `get_metadata(metadata)` returns to the metadata of each node, e.g. the filterable fields
+        missing from nodes persisted before they were introduced. Returns the number of updated nodes."""
+
+        num_updated = 0
+        for node in self._nodes:
+            extra_metadata = get_metadata(node.metadata)
+            if extra_metadata:
+                node.metadata.update(extra_metadata)
+                num_updated += 1
+
+        if num_updated:
+            self._metadata_index = {}
+
+        return num_updated
+
+    def _filter_positions(self, filters: dict) -> list[int]:
+        """Returns the positions of nodes whose metadata match all `filters`, in insertion order."""
+
+        positions = None
+        for key, value in filters.items():
+            matched = set(self._get_value_positions(key).get(value, []))
+            positions = matched if positions is None else positions & matched
+            if not positions:
+                return []
+
+        return sorted(positions) if positions is not None else list(range(len(self._nodes)))
+
+    def _get_value_positions(self, key: str) -> dict[Any, list[int]]:
+        """Lazily builds the inverted index `value -> positions` of one metadata key."""
+
+        if key not in self._metadata_index:
+            value_positions = {}
+            for pos in range(len(self._nodes)):
+                self._index_node_metadata(value_positions, key, pos)
+            self._metadata_index[key] = value_positions
+
+        return self._metadata_index[key]
+
+    def _index_node_metadata(self, value_positions: dict[Any, list[int]], key: str, pos: int):
+        value = self._nodes[pos].metadata.get(key)
+        if value is not None:
+            value_positions.setdefault(value, []).append(pos)
 
     @staticmethod
     def _delete_json_files(directory: str):
@@ -1,7 +1,11 @@
 """Chroma retriever."""
 
+from typing import Callable, Optional
+
 from llama_index.core.retrievers import VectorIndexRetriever
-from llama_index.core.schema import BaseNode
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryType
+from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from llama_index.vector_stores.chroma import ChromaVectorStore
 
 
@@ -32,3 +36,52 @@ class ChromaRetriever(VectorIndexRetriever):
         ids = self.vector_store._collection.get()["ids"]
         if ids:
             self.vector_store._collection.delete(ids=ids)
+
+    async def aretrieve_with_filters(self, query: QueryType, filters: dict) -> list[NodeWithScore]:
+        """Support metadata prefiltering, pushed down to chromadb as a `where` clause of the similarity search."""
+
+        metadata_filters = MetadataFilters(filters=[ExactMatchFilter(key=k, value=v) for k, v in filters.items()])
+        retriever = self._index.as_retriever(similarity_top_k=self._similarity_top_k, filters=metadata_filters)
+
+        return await retriever.aretrieve(query)
+
+    def get_nodes_by_metadata(self, filters: dict) -> list[BaseNode]:
+        """Support exact lookup by metadata, no embedding and no similarity search is involved."""
+
+        result = self.vector_store._collection.get(where=self._to_where(filters))
+
+        nodes = []
+        for metadata, text in zip(result["metadatas"], result["documents"]):
+            node = metadata_dict_to_node(metadata)
+            node.set_content(text)
+            nodes.append(node)
+
+        return nodes
+
+    def backfill_metadata(self, get_metadata: Callable[[dict], dict]) -> int:
+        """Adds the fields `get_metadata(metadata)` returns to the stored metadata of each node, e.g. the filterable
+        fields missing from nodes persisted before they were introduced. Returns the number of updated nodes."""
+
+        result = self.vector_store._collection.get(include=["metadatas"])
+        ids, metadatas = [], []
+        for node_id, metadata in zip(result["ids"], result["metadatas"]):
+            extra_metadata = get_metadata(metadata or {})
+            if extra_metadata:
+                ids.append(node_id)
+                metadatas.append(extra_metadata)
+
+        if ids:
+            # chromadb merges the given keys into the stored metadata
+            self.vector_store._collection.update(ids=ids, metadatas=metadatas)
+
+        return len(ids)
+
+    @staticmethod
+    def _to_where(filters: dict) -> Optional[dict]:
+        """Chromadb requires `$and` to combine more than one condition."""
+
+        conditions = [{k: v} for k, v in filters.items()]
+        if not conditions:
+            return None
+
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
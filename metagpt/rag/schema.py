@@ -214,16 +214,20 @@ class ObjectNode(TextNode):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.excluded_llm_metadata_keys = list(ObjectNodeMetadata.model_fields.keys())
+        obj_keys = list(ObjectNodeMetadata.model_fields.keys())
+        self.excluded_llm_metadata_keys = obj_keys + [k for k in self.metadata if k not in obj_keys]
         self.excluded_embed_metadata_keys = self.excluded_llm_metadata_keys
 
     @staticmethod
     def get_obj_metadata(obj: RAGObject) -> dict:
+        """Objects may implement `rag_metadata` to expose extra filterable fields, e.g. for metadata prefiltering."""
         metadata = ObjectNodeMetadata(
             obj_json=obj.model_dump_json(), obj_cls_name=obj.__class__.__name__, obj_mod_name=obj.__class__.__module__
         )
 
-        return metadata.model_dump()
+        extra_metadata = obj.rag_metadata() if hasattr(obj, "rag_metadata") else {}
+
+        return {**extra_metadata, **metadata.model_dump()}
 
 
 class OmniParseType(str, Enum):
@@ -12,11 +12,15 @@ This script is designed to create a symbols repository from the provided source
 from __future__ import annotations
 
 import ast
+import gzip
+import hashlib
 import json
+import os
 import re
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 from pydantic import BaseModel, Field, field_validator
@@ -46,6 +50,23 @@ class RepoFileInfo(BaseModel):
     page_info: List = Field(default_factory=list)
 
 
+class RepoFileIndexEntry(BaseModel):
+    """
+    Cached symbols of a file in the on-disk symbols index.
+
+    Attributes:
+        mtime_ns (int): The modification time of the file when it was parsed.
+        size (int): The size of the file when it was parsed.
+        digest (str): The content hash of the file when it was parsed.
+        file_info (Dict): The dumped `RepoFileInfo` of the file.
+    """
+
+    mtime_ns: int
+    size: int
+    digest: str
+    file_info: Dict
+
+
 class CodeBlockInfo(BaseModel):
     """
     Repository data element representing information about a code block.
@@ -425,9 +446,14 @@ class RepoParser(BaseModel):
 
     Attributes:
         base_directory (Path): The base directory of the project.
+        index_path (Optional[Path]): The path of the on-disk symbols index. If set, `generate_symbols` only re-parses
+            files changed since the last run.
+        max_workers (Optional[int]): The number of worker processes used to parse files. Default is the CPU count.
     """
 
     base_directory: Path = Field(default=None)
+    index_path: Optional[Path] = None
+    max_workers: Optional[int] = None
 
     @classmethod
     @handle_exception(exception_type=Exception, default_return=[])
@@ -474,23 +500,92 @@ class RepoParser(BaseModel):
         """
         Builds a symbol repository from '.py' and '.js' files in the project directory.
 
+        Files are parsed across a process pool. If `index_path` is set, the symbols of each file are cached keyed by
+        (path, mtime, size, content hash), and only the changed files are re-parsed.
+
         Returns:
             List[RepoFileInfo]: A list of RepoFileInfo objects containing the extracted information.
         """
-        files_classes = []
         directory = self.base_directory
 
         matching_files = []
         extensions = ["*.py"]
         for ext in extensions:
             matching_files += directory.rglob(ext)
+
+        index = self._load_index()
+        new_index: Dict[str, RepoFileIndexEntry] = {}
+        pending: List[Tuple[str, Path, os.stat_result, str]] = []
         for path in matching_files:
-            tree = self._parse_file(path)
-            file_info = self.extract_class_and_function_info(tree, path)
+            key = str(path.relative_to(directory))
+            stat = path.stat()
+            entry = index.get(key)
+            if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                new_index[key] = entry
+                continue
+            digest = hashlib.md5(path.read_bytes()).hexdigest()
+            if entry and entry.digest == digest:
+                new_index[key] = entry.model_copy(update={"mtime_ns": stat.st_mtime_ns, "size": stat.st_size})
+                continue
+            pending.append((key, path, stat, digest))
+
+        for (key, _, stat, digest), file_info in zip(pending, self._parse_files([i[1] for i in pending])):
+            new_index[key] = RepoFileIndexEntry(
+                mtime_ns=stat.st_mtime_ns, size=stat.st_size, digest=digest, file_info=file_info
+            )
+        if pending or len(new_index) != len(index):
+            self._save_index(new_index)
+
+        files_classes = []
+        for path in matching_files:
+            file_info = RepoFileInfo(**new_index[str(path.relative_to(directory))].file_info)
+            file_info.page_info = [CodeBlockInfo(**i) for i in file_info.page_info]
             files_classes.append(file_info)
 
         return files_classes
 
+    def _parse_files(self, paths: List[Path]) -> List[Dict]:
+        """
+        Parses files into dumped `RepoFileInfo` objects, across a process pool when there are enough files.
+
+        Args:
+            paths (List[Path]): The paths of the Python files to be parsed.
+
+        Returns:
+            List[Dict]: The dumped `RepoFileInfo` objects, in the same order as `paths`.
+        """
+        if len(paths) < MIN_FILES_TO_PARSE_IN_PARALLEL or self.max_workers == 1:
+            return [_parse_repo_file(self.base_directory, i) for i in paths]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            chunksize = max(1, len(paths) // ((self.max_workers or os.cpu_count() or 1) * 4))
+            return list(
+                executor.map(_parse_repo_file, [self.base_directory] * len(paths), paths, chunksize=chunksize)
+            )
+
+    @handle_exception(exception_type=Exception, default_return={})
+    def _load_index(self) -> Dict[str, RepoFileIndexEntry]:
+        """Loads the on-disk symbols index. A missing or broken index is treated as empty."""
+        if not self.index_path or not Path(self.index_path).exists():
+            return {}
+        with gzip.open(self.index_path, "rt", encoding="utf-8") as reader:
+            data = json.load(reader)
+        if data.get("version") != SYMBOLS_INDEX_VERSION:
+            return {}
+        return {k: RepoFileIndexEntry(**v) for k, v in data["files"].items()}
+
+    def _save_index(self, index: Dict[str, RepoFileIndexEntry]):
+        """Saves the symbols index as compressed JSON, writing to a temporary file first to keep it consistent."""
+        if not self.index_path:
+            return
+        index_path = Path(self.index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_name(index_path.name + ".tmp")
+        data = {"version": SYMBOLS_INDEX_VERSION, "files": {k: v.model_dump() for k, v in index.items()}}
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as writer:
+            json.dump(data, writer, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+
     def generate_json_structure(self, output_path: Path):
         """
         Generates a JSON file documenting the repository structure.
@@ -1010,6 +1105,26 @@ class RepoParser(BaseModel):
         return "." + full_key[0:ix]
 
 
+SYMBOLS_INDEX_VERSION = 1
+MIN_FILES_TO_PARSE_IN_PARALLEL = 32
+
+
+def _parse_repo_file(base_directory: Path, file_path: Path) -> Dict:
+    """
+    Parses a Python file into a dumped `RepoFileInfo`. Defined at module level so that it can run in worker processes.
+
+    Args:
+        base_directory (Path): The base directory of the project.
+        file_path (Path): The path to the Python file to be parsed.
+
+    Returns:
+        Dict: The dumped `RepoFileInfo` of the file.
+    """
+    parser = RepoParser(base_directory=base_directory)
+    tree = parser._parse_file(file_path)
+    return parser.extract_class_and_function_info(tree, file_path).model_dump()
+
+
 def is_func(node) -> bool:
     """
     Returns True if the given node represents a function.
@@ -19,17 +19,24 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
+import re
 from collections import defaultdict
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import Dict, List, Optional, Set
 
 from pydantic import BaseModel, Field
 
 from metagpt.actions import WriteCode, WriteCodeReview, WriteTasks
 from metagpt.actions.fix_bug import FixBug
 from metagpt.actions.prepare_documents import PrepareDocuments
-from metagpt.actions.project_management_an import REFINED_TASK_LIST, TASK_LIST
+from metagpt.actions.project_management_an import (
+    LOGIC_ANALYSIS,
+    REFINED_LOGIC_ANALYSIS,
+    REFINED_TASK_LIST,
+    TASK_LIST,
+)
 from metagpt.actions.summarize_code import SummarizeCode
 from metagpt.actions.write_code_plan_and_change_an import WriteCodePlanAndChange
 from metagpt.const import (
@@ -81,6 +88,8 @@ class Engineer(Role):
         constraints (str): Constraints for the engineer.
         n_borg (int): Number of borgs.
         use_code_review (bool): Whether to use code review.
+        max_code_workers (int): Maximum number of files written concurrently. Files only wait for the files they
+            depend on.
     """
 
     name: str = "Alex"
@@ -92,6 +101,7 @@ class Engineer(Role):
     )
     n_borg: int = 1
     use_code_review: bool = False
+    max_code_workers: int = 4
     code_todos: list = []
     summarize_todos: list = []
     next_todo_action: str = ""
@@ -115,40 +125,104 @@ class Engineer(Role):
 
     async def _act_sp_with_cr(self, review=False) -> Set[str]:
         changed_files = set()
-        for todo in self.code_todos:
-            """
-            # Select essential information from the historical data to reduce the length of the prompt (summarized from human experience):
-            1. All from Architect
-            2. All from ProjectManager
-            3. Do we need other codes (currently needed)?
-            TODO: The goal is not to need it. After clear task decomposition, based on the design idea, you should be able to write a single file without needing other codes. If you can't, it means you need a clearer definition. This is the key to writing longer code.
-            """
-            coding_context = await todo.run()
-            # Code review
-            if review:
-                action = WriteCodeReview(
-                    i_context=coding_context,
-                    repo=self.repo,
-                    input_args=self.input_args,
-                    context=self.context,
-                    llm=self.llm,
-                )
-                self._init_action(action)
-                coding_context = await action.run()
-
-            dependencies = {coding_context.design_doc.root_relative_path, coding_context.task_doc.root_relative_path}
-            if self.config.inc:
-                dependencies.add(coding_context.code_plan_and_change_doc.root_relative_path)
-            await self.repo.srcs.save(
-                filename=coding_context.filename,
-                dependencies=list(dependencies),
-                content=coding_context.code_doc.content,
-            )
-            changed_files.add(coding_context.code_doc.filename)
+        prerequisites = self._get_code_prerequisites(self.code_todos)
+        finished = {todo.i_context.filename: asyncio.Event() for todo in self.code_todos}
+        semaphore = asyncio.Semaphore(max(1, self.max_code_workers))
+        # `srcs.save` updates the shared dependency file, which is not safe to interleave.
+        save_lock = asyncio.Lock()
+
+        async def _write_code(todo: WriteCode):
+            filename = todo.i_context.filename
+            try:
+                for i in prerequisites[filename]:
+                    await finished[i].wait()
+                async with semaphore:
+                    """
+                    # Select essential information from the historical data to reduce the length of the prompt (summarized from human experience):
+                    1. All from Architect
+                    2. All from ProjectManager
+                    3. Do we need other codes (currently needed)?
+                    TODO: The goal is not to need it. After clear task decomposition, based on the design idea, you should be able to write a single file without needing other codes. If you can't, it means you need a clearer definition. This is the key to writing longer code.
+                    """
+                    coding_context = await todo.run()
+                    # Code review
+                    if review:
+                        action = WriteCodeReview(
+                            i_context=coding_context,
+                            repo=self.repo,
+                            input_args=self.input_args,
+                            context=self.context,
+                            llm=self.llm,
+                        )
+                        self._init_action(action)
+                        coding_context = await action.run()
+
+                dependencies = {
+                    coding_context.design_doc.root_relative_path,
+                    coding_context.task_doc.root_relative_path,
+                }
+                if self.config.inc:
+                    dependencies.add(coding_context.code_plan_and_change_doc.root_relative_path)
+                async with save_lock:
+                    await self.repo.srcs.save(
+                        filename=coding_context.filename,
+                        dependencies=list(dependencies),
+                        content=coding_context.code_doc.content,
+                    )
+                changed_files.add(coding_context.code_doc.filename)
+            finally:
+                finished[filename].set()
+
+        tasks = [asyncio.create_task(_write_code(todo)) for todo in self.code_todos]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
         if not changed_files:
             logger.info("Nothing has changed.")
         return changed_files
 
+    @staticmethod
+    def _get_code_prerequisites(code_todos: List[WriteCode]) -> Dict[str, List[str]]:
+        """Builds the dependency DAG of the files to be written.
+
+        A file depends on the files listed before it in the task list that its logic analysis mentions, e.g.
+        `from game import Game`. Files not found in a task list, e.g. of an empty or non-JSON task doc, conservatively
+        depend on every file before them.
+
+        Args:
+            code_todos (List[WriteCode]): The WriteCode actions, ordered by priority.
+
+        Returns:
+            Dict[str, List[str]]: The filenames each file has to wait for.
+        """
+        filenames = [todo.i_context.filename for todo in code_todos]
+        prerequisites = {}
+        for ix, todo in enumerate(code_todos):
+            filename = filenames[ix]
+            coding_context = CodingContext.loads(todo.i_context.content)
+            try:
+                m = json.loads(coding_context.task_doc.content) if coding_context.task_doc else {}
+            except json.JSONDecodeError:
+                m = {}  # e.g. an empty task doc, the file depends on every file before it
+            if not isinstance(m, dict):
+                m = {}
+            task_list = m.get(TASK_LIST.key) or m.get(REFINED_TASK_LIST.key) or []
+            logic_analysis = m.get(LOGIC_ANALYSIS.key) or m.get(REFINED_LOGIC_ANALYSIS.key) or []
+            analysis = " ".join(str(i[1]) for i in logic_analysis if len(i) > 1 and i[0] == filename)
+            if filename not in task_list or not analysis:
+                prerequisites[filename] = filenames[:ix]
+                continue
+            earlier = set(task_list[: task_list.index(filename)])
+            prerequisites[filename] = [
+                i
+                for i in filenames[:ix]
+                if i in earlier and re.search(rf"\b({re.escape(i)}|{re.escape(Path(i).stem)})\b", analysis)
+            ]
+        return prerequisites
+
     async def _act(self) -> Message | None:
         """Determines the mode of action based on whether code review is used."""
         if self.rc.todo is None: